@@ -2,12 +2,22 @@
 Run the application.
 
 This module is invoked when calling ``python -m bl_predictor``.
+``python -m bl_predictor backfill`` downloads all past seasons instead, see
+bl_predictor.backfill.
 """
-from bl_predictor import gui
+import sys
 
-if __name__ == '__main__':
-    gui.MainWindow(None).show_window()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'backfill':
+        # no gui needed, e.g. on a server
+        from bl_predictor import backfill
+        backfill.main(argv[1:])
+    else:
+        from bl_predictor import gui
+        gui.MainWindow(None).show_window()
 
 
-def main():
-    gui.MainWindow(None).show_window()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+This module contains the atomic file writing shared by the match store, the
+team dictionary, the response cache, the backfill checkpoint and the saved
+models.
+
+A file is written into a temporary file next to it, which then replaces
+the file in one step, so parallel readers (threads or processes) see the
+old or the new file, never half of it.
+"""
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def write(path, mode='wb'):
+    """
+    Opens a temporary file in the directory of path for writing. It
+    replaces path when the block ends, or is removed if the block raises.
+    Missing directories are created.
+
+    :param str path: path of the file
+    :param str mode: 'wb' or 'w', text is written as utf-8
+    :return: the open temporary file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, mode,
+                       encoding=None if 'b' in mode else 'utf-8') \
+                as tmp_file:
+            yield tmp_file
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,205 @@
+"""
+This module contains the historical backfill of the match store.
+
+Seasons are downloaded in parallel, each with a single request, into a
+staging store next to the match store. A checkpoint file records every
+finished season, so an interrupted backfill resumes where it stopped.
+Only when all seasons are staged, they are committed into the match store
+and the staging files are removed.
+
+Usage::
+
+    python -m bl_predictor backfill --league bl2 --first 2010 --workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from bl_predictor import atomic_file
+from bl_predictor import crawler
+from bl_predictor import leagues
+from bl_predictor import match_store
+
+# suffix of the directory of the staged seasons, a sibling of the match
+# store like match_store_backfill
+STAGING = 'backfill'
+# seasons that are staged completely
+CHECKPOINT = 'checkpoint.json'
+
+
+class BackfillError(Exception):
+    """
+    Raised if seasons could not be staged. The staged seasons are kept, a
+    new backfill only downloads the missing ones.
+    """
+
+    def __init__(self, failed):
+        """
+        :param dict failed: season: exception
+        """
+        super().__init__('could not download the seasons '
+                         + ', '.join(str(season) for season in failed))
+        self.failed = failed
+
+
+def backfill(first_season=None, last_season=None, store=None,
+             workers=crawler.CRAWL_WORKERS, progress=None,
+             league=leagues.DEFAULT_LEAGUE):
+    """
+    Downloads all finished matches from first_season until last_season
+    and adds them to the match store at once.
+
+    :param int first_season: first season, default is the first season of
+     the league with complete data in the api
+    :param int last_season: last season, default is the current season
+    :param match_store.MatchStore store: store to fill, default is the
+     shared store of the league
+    :param int workers: maximum number of parallel downloads
+    :param progress: function called with season and number of matches
+     after every staged season
+    :param str league: league shortcut
+    :return: dict with the 'staged' and 'resumed' seasons and the number of
+     committed 'rows'
+    :raises BackfillError: if a season could not be downloaded, nothing is
+     committed then
+    """
+    store = store or match_store.get_store(league)
+    if first_season is None:
+        first_season = leagues.get_league(league).first_season
+    if last_season is None:
+        last_season = crawler.get_current_date(league=league)[1]
+    staging_dir = staging_directory(store)
+    staging = match_store.MatchStore(staging_dir, legacy_csv=None)
+    checkpoint = _read_checkpoint(staging_dir)
+    seasons = list(range(first_season, last_season + 1))
+    resumed = [season for season in seasons if season in checkpoint]
+    missing = [season for season in seasons if season not in checkpoint]
+
+    failed = {}
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(_stage_season, season, staging,
+                                       league): season
+                       for season in missing}
+            for future in as_completed(futures):
+                season = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as error:
+                    # the other seasons are staged anyway
+                    failed[season] = error
+                    continue
+                checkpoint[season] = rows
+                _write_checkpoint(staging_dir, checkpoint)
+                if progress is not None:
+                    progress(season, rows)
+    if failed:
+        raise BackfillError(failed)
+
+    rows = _commit(staging, store, seasons)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    return {'staged': missing, 'resumed': resumed, 'rows': rows}
+
+
+def staging_directory(store):
+    """
+    :param match_store.MatchStore store: store to fill
+    :return: str directory of the staged seasons of the store
+    """
+    return os.path.normpath(store.directory) + '_' + STAGING
+
+
+def _stage_season(season, staging, league):
+    """
+    Downloads a whole season and writes its finished matches into the
+    staging store.
+
+    :return: int number of staged matches
+    """
+    matchdays = leagues.get_league(league).matchdays
+    url = crawler.plan_requests([1, season], [matchdays, season],
+                                league=league).urls[0]
+    responses = crawler.download_json([url], workers=1)
+    matches, _ = crawler.parse_matches([url], responses, with_ids=True)
+    if not matches.empty:
+        staging.upsert(matches)
+    return len(matches)
+
+
+def _commit(staging, store, seasons):
+    """
+    Adds the staged seasons to the store with a single write. Committing
+    twice gives the same store, so a commit that was interrupted is simply
+    done again by the next backfill.
+
+    :return: int number of committed matches
+    """
+    staged = staging.seasons()
+    matches = [staging.read_season_ids(season) for season in seasons
+               if season in staged]
+    if not matches:
+        return 0
+    matches = pd.concat(matches, ignore_index=True)
+    store.upsert(matches)
+    return len(matches)
+
+
+def _read_checkpoint(staging_dir):
+    """
+    :return: dict season: number of staged matches
+    """
+    try:
+        with open(os.path.join(staging_dir, CHECKPOINT),
+                  encoding='utf-8') as checkpoint_file:
+            content = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return {}
+    return {int(season): rows for season, rows in content['seasons'].items()}
+
+
+def _write_checkpoint(staging_dir, checkpoint):
+    """
+    Writes the checkpoint atomically.
+    """
+    with atomic_file.write(os.path.join(staging_dir, CHECKPOINT),
+                           'w') as tmp_file:
+        json.dump({'seasons': {str(season): rows for season, rows
+                               in sorted(checkpoint.items())}}, tmp_file)
+
+
+def main(argv=None):
+    """
+    Runs the backfill from the command line.
+
+    :param list[str] argv: command line arguments, default is sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m bl_predictor backfill',
+        description='Downloads all past seasons into the match store. An '
+                    'interrupted backfill resumes where it stopped.')
+    parser.add_argument('--league', default=leagues.DEFAULT_LEAGUE,
+                        choices=sorted(leagues.LEAGUES),
+                        help='league (default: %(default)s)')
+    parser.add_argument('--first', type=int, default=None,
+                        help='first season (default: first season of the '
+                             'league)')
+    parser.add_argument('--last', type=int, default=None,
+                        help='last season (default: current season)')
+    parser.add_argument('--workers', type=int,
+                        default=crawler.CRAWL_WORKERS,
+                        help='parallel downloads (default: %(default)s)')
+    args = parser.parse_args(argv)
+    try:
+        result = backfill(args.first, args.last, workers=args.workers,
+                          progress=lambda season, rows: print(
+                              'staged season', season, '-', rows,
+                              'matches'),
+                          league=args.league)
+    except BackfillError as error:
+        parser.exit(1, str(error) + ', run the backfill again to resume\n')
+    print('committed', result['rows'], 'matches of',
+          len(result['staged']) + len(result['resumed']), 'seasons')
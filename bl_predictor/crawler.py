@@ -2,100 +2,280 @@
 This module contains code to fetch required data from the internet and convert
 it to a pd.DataFrame.
 """
+import collections
 import datetime
-import json
-
-import os
+import functools
+import threading
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+import numpy as np
 import pandas as pd
+import requests
+
+from bl_predictor import http_client
+from bl_predictor import leagues
+from bl_predictor import match_store
+from bl_predictor import response_cache
+
+
+COLUMNS = match_store.COLUMNS
+# Format of the dates in the api
+API_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# Time zone of matchDateTime and thus of the date_time column
+API_TIMEZONE = 'Europe/Berlin'
 
+# Number of urls crawl_openligadb downloads at the same time
+CRAWL_WORKERS = 8
 
-# Initialize matches dataframe that will be filled and returned
+# Expected duration of a match incl. half time. The current date is
+# remembered until the next unfinished match should be over.
+MATCH_DURATION = datetime.timedelta(hours=2)
+# Wait time before asking again, if a started match has no result yet
+RESOLVE_RETRY = datetime.timedelta(minutes=5)
+# Wait time before asking again, if the season has no unfinished matches
+RESOLVE_IDLE = datetime.timedelta(days=1)
 
+# Matches that can be downloaded in the time of one more round trip.
+# plan_requests fetches a whole season instead of single matchdays, if the
+# round trips of the matchdays cost more than the bigger payload.
+ROUND_TRIP_MATCHES = 50
 
-def fetch_data(start_date, end_date):
+# A matchday with only finished matches that did not change for this long
+# is not checked by sync_matches anymore, unless a full sync is asked for
+SYNC_SETTLED = datetime.timedelta(days=7)
+
+# Seconds between two checks of MatchdayPoller
+POLL_INTERVAL = 60
+
+# Kinds of MatchUpdate
+SCORE_CHANGED = 'score_changed'
+MATCH_FINISHED = 'match_finished'
+
+# league: ([matchday, season], expiry as UTC datetime)
+_current_dates = {}
+_current_date_lock = threading.Lock()
+
+
+def fetch_data(start_date, end_date, sync=False, force_refresh=False,
+               league=leagues.DEFAULT_LEAGUE):
     """
     Query sample data from "the internet"
     and return as pd.DataFrame.
     You can get the unfinished matches of the current season by entering 0
     for both start_date and end_date.
-    Data gets stored into csv file. After download data is taken from here.
+    Data gets stored into the match store. After download data is taken
+    from here.
 
     :param list [int] start_date: [matchday, year]
     :param list [int] end_date: [matchday, year]
+    :param bool sync: also update changed matchdays of the current season
+     in the store, see sync_matches
+    :param bool force_refresh: ask the api again for the current date and
+     the unfinished matches, even if the cached ones are still valid
+    :param str league: league shortcut, see leagues.LEAGUES
     :return: Dataframe that contains all the matches between
         start_date and end_date.
     """
+    store = match_store.get_store(league)
 
-    columns = ['date_time', 'matchday', 'home_team', 'home_score',
-               'guest_score', 'guest_team', 'season']
-    matches_empty = pd.DataFrame([], columns=columns)
-    unfin_m_empty = pd.DataFrame([], columns=columns)
-
-    # get path of csv file
-    crawler_path = os.path.abspath(__file__)
-    directory_path = os.path.dirname(crawler_path)
-    csv_file = os.path.join(directory_path, 'crawled_data.csv')
-
-    current_d = get_current_date()
+    current_d = get_current_date(refresh=force_refresh, league=league)
     if start_date == [0, 0] == end_date:
-        urls = curate_urls([current_d[0] + 1, current_d[1]],
-                           [34, current_d[1]])
-        unfinished_matches = crawl_openligadb(urls, unfin_m_empty,
-                                              matches_empty, csv_file)
-        unfinished_m = convertdf(unfinished_matches)
-        return unfinished_m
+        return fetch_unfinished(current_d, store, force_refresh, league)
     else:
-        incorrect_dates(start_date, end_date, get_current_date()[1])
-        dataframe = fetch_data_helper(start_date, end_date, csv_file,
-                                      current_d)
+        incorrect_dates(start_date, end_date, current_d[1], league)
+        dataframe = fetch_data_helper(start_date, end_date, store,
+                                      current_d, league)
+        if sync and sync_matches(store=store, league=league)['changed']:
+            # read the updated matches again
+            dataframe = fetch_data_helper(start_date, end_date, store,
+                                          current_d, league)
         return dataframe
 
 
-def fetch_data_helper(start_date, end_date, csv_file, current_d):
+def fetch_leagues(start_date, end_date, league_names=None,
+                  workers=len(leagues.LEAGUES), **kwargs):
     """
-    Helps fetch data to get missing data and takes data from the csv
-    file in the correct time range.
+    Runs fetch_data for several leagues at the same time. Every league
+    uses its own store.
+
     :param list [int] start_date: [matchday, year]
     :param list [int] end_date: [matchday, year]
-    :param csv_file: path or going to be to path to the csv file
+    :param list[str] league_names: league shortcuts, default is all of
+     leagues.LEAGUES
+    :param int workers: maximum number of leagues crawled at the same time
+    :param kwargs: further arguments of fetch_data
+    :return: dict league: Dataframe of fetch_data
+    """
+    league_names = list(league_names or leagues.LEAGUES)
+    for league in league_names:
+        leagues.get_league(league)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        frames = executor.map(
+            lambda league: fetch_data(start_date, end_date, league=league,
+                                      **kwargs), league_names)
+        return dict(zip(league_names, frames))
+
+
+def iter_matches(start_date, end_date, workers=CRAWL_WORKERS,
+                 league=leagues.DEFAULT_LEAGUE):
+    """
+    Streaming variant of fetch_data: yields the matches between start_date
+    and end_date season by season, as soon as a season is in the store.
+    Missing seasons are downloaded in the background, up to 'workers'
+    seasons ahead of the consumer, so a consumer can work on the first
+    seasons while later ones are still downloading and only needs to keep
+    one season in memory.
+
+    :param list [int] start_date: [matchday, year]
+    :param list [int] end_date: [matchday, year], a date in the future
+     ends with the current matchday
+    :param int workers: maximum number of seasons downloaded at the same
+     time
+    :param str league: league shortcut
+    :return: generator of Dataframes with COLUMNS, one per season with
+     matches in the range
+    :raises CrawlError: when the first season is reached that could not be
+     downloaded, all seasons before are yielded already and the seasons
+     downloaded ahead are in the response cache
+    """
+    store = match_store.get_store(league)
+    current_d = get_current_date(league=league)
+    incorrect_dates(start_date, end_date, current_d[1], league)
+    start_date, end_date = _crawl_range(start_date, end_date, current_d,
+                                        league)
+    season_urls = collections.defaultdict(list)
+    for url in plan_requests(start_date, end_date, store, league):
+        season_urls[response_cache.parse_matchdata_url(url)[1]].append(url)
+
+    matchdays = leagues.get_league(league).matchdays
+    seasons = list(range(start_date[1], end_date[1] + 1))
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        downloads = collections.deque()
+        for season in seasons[:workers]:
+            downloads.append(executor.submit(_download_urls,
+                                             season_urls[season]))
+        for index, season in enumerate(seasons):
+            urls, responses, failed = downloads.popleft().result()
+            next_index = index + workers
+            if next_index < len(seasons):
+                downloads.append(executor.submit(
+                    _download_urls, season_urls[seasons[next_index]]))
+            _store_responses(urls, responses, failed, store)
+            chunk = take_data(start_date if season == start_date[1]
+                              else [0, season],
+                              end_date if season == end_date[1]
+                              else [matchdays, season], store)
+            if not chunk.empty:
+                yield chunk
+
+
+def _download_urls(urls):
+    """
+    Downloads the urls one after another.
+
+    :return: tuple urls, responses, dict of failed urls
+    """
+    failed = {}
+    return urls, download_json(urls, workers=1, failed=failed), failed
+
+
+def fetch_unfinished(current_d, store, force_refresh=False,
+                     league=leagues.DEFAULT_LEAGUE):
+    """
+    Crawls the matches after the current matchday. The responses are
+    cached until the next kickoff, so repeated calls before any match
+    starts cost no network, also in a new process.
+
+    :param list [int] current_d: current date [matchday, season]
+    :param match_store.MatchStore store: store of the crawled matches
+    :param bool force_refresh: ask the api even if the cache is valid
+    :param str league: league shortcut
+    :return: Dataframe with the unfinished matches after the current
+     matchday
+    """
+    plan = plan_requests([current_d[0] + 1, current_d[1]],
+                         [leagues.get_league(league).matchdays,
+                          current_d[1]], league=league)
+    unfinished = crawl_openligadb(plan.urls, store, refresh=force_refresh)
+    now = _utcnow()
+    valid_for = (_fixtures_expiry(unfinished, now) - now).total_seconds()
+    for url in plan.urls:
+        response_cache.set_expiry(url, time.time() + valid_for)
+    # a whole season also holds postponed matches of past matchdays
+    return unfinished[unfinished['matchday'] > current_d[0]] \
+        .reset_index(drop=True)
+
+
+def _fixtures_expiry(unfinished, now):
+    """
+    Finds the time the given unfinished matches may change: the next
+    kickoff or, while a match is running, a few minutes. Matches that
+    kicked off long ago without result (postponed) are ignored.
+
+    :param unfinished: pd.DataFrame of unfinished matches
+    :param datetime.datetime now: current UTC time
+    :return: datetime.datetime expiry as UTC
+    """
+    kickoffs = pd.DatetimeIndex(unfinished['date_time']).tz_localize(
+        API_TIMEZONE, ambiguous='NaT', nonexistent='shift_forward') \
+        .tz_convert('UTC').tz_localize(None)
+    if ((kickoffs <= now) & (kickoffs > now - MATCH_DURATION)).any():
+        return now + RESOLVE_RETRY
+    upcoming = kickoffs[kickoffs > now]
+    if upcoming.empty:
+        return now + RESOLVE_IDLE
+    return upcoming.min().to_pydatetime()
+
+
+def fetch_data_helper(start_date, end_date, store, current_d,
+                      league=leagues.DEFAULT_LEAGUE):
+    """
+    Helps fetch data to get missing data and takes data from the match
+    store in the correct time range.
+    Only matchdays of the range that are not complete in the store are
+    downloaded, so it does not matter which other matches are stored
+    already (e.g. later seasons or the finished matches of the current
+    season).
+    :param list [int] start_date: [matchday, year]
+    :param list [int] end_date: [matchday, year]
+    :param match_store.MatchStore store: store of the crawled matches
     :param list [int] current_d: current date [matchday, season]
+    :param str league: league shortcut
     :return: Dataframe with matches from start_date until end_date
     """
-    # empty df to fill
-    columns = ['date_time', 'matchday', 'home_team', 'home_score',
-               'guest_score', 'guest_team', 'season']
-    matches_empty = pd.DataFrame([], columns=columns)
-    unfin_m_empty = pd.DataFrame([], columns=columns)
-
-    # last csv date or [1, 2004]
-    csv_last_d = get_csv_last_date(csv_file)
-    # if our end date if before today
-    if is_first_date_later(current_d, end_date):
-        # if our end date is later than the csv file goes
-        if is_first_date_later(end_date, csv_last_d):
-            # get the missing or all data until today and take matches in
-            # our time range
-            urls = curate_urls(csv_last_d, current_d)
-            crawl_openligadb(urls, unfin_m_empty, matches_empty, csv_file)
-        # than take matches in our time range
-        dataframe = take_data(start_date, end_date, csv_file)
-
-    # otherwise our end_date is in the future.
-    else:
-        # is start_date also in the future, than take data until today.
+    start_date, end_date = _crawl_range(start_date, end_date, current_d,
+                                        league)
+    plan = plan_requests(start_date, end_date, store, league)
+    if plan.urls:
+        crawl_openligadb(plan.urls, store)
+    return take_data(start_date, end_date, store)
+
+
+def _crawl_range(start_date, end_date, current_d,
+                 league=leagues.DEFAULT_LEAGUE):
+    """
+    Limits a range to the matches that can be finished: from the first
+    season of the league until the current date.
+
+    :param list [int] start_date: [matchday, year]
+    :param list [int] end_date: [matchday, year]
+    :param list [int] current_d: current date [matchday, season]
+    :param str league: league shortcut
+    :return: tuple start_date, end_date
+    """
+    first_date = [1, leagues.get_league(league).first_season]
+    if is_first_date_later(first_date, start_date):
+        start_date = first_date
+    # is our end date in the future, than take data until today.
+    if is_first_date_later(end_date, current_d):
+        end_date = current_d
+        # is start_date also in the future, the whole current season
         if is_first_date_later(start_date, current_d):
             start_date = [1, current_d[1]]
-        # if today later than our csv file
-        if is_first_date_later(current_d, csv_last_d):
-            # get all missing data
-            url = curate_urls(csv_last_d, current_d)
-            crawl_openligadb(url, unfin_m_empty, matches_empty, csv_file)
-        # and take needed matches
-        dataframe = take_data(start_date, current_d, csv_file)
-    return dataframe
+    return start_date, end_date
 
 
 def is_first_date_later(first_date, second_date):
@@ -105,66 +285,400 @@ def is_first_date_later(first_date, second_date):
     return f_d_is_later
 
 
-def get_current_date():
+def sync_matches(season=None, full=False, store=None,
+                 league=leagues.DEFAULT_LEAGUE):
+    """
+    Brings the stored matches of a season up to date with as little
+    traffic as possible. The api is asked for the last change date of every
+    matchday that is not settled yet (a few bytes each) and only matchdays
+    that changed since the last sync are downloaded again. Their matches
+    replace the stored versions by their matchID, so rescheduled or
+    corrected matches are updated and no match is stored twice.
+
+    :param int season: season to sync, default is the current season
+    :param bool full: also check settled matchdays
+    :param match_store.MatchStore store: store to update, default is the
+     shared store of the league
+    :param str league: league shortcut
+    :return: dict with the 'checked' and 'changed' matchdays and the number
+     of stored 'rows'
+    """
+    store = store or match_store.get_store(league)
+    current_d = get_current_date(league=league)
+    if season is None:
+        season = current_d[1]
+    # later matchdays have no finished matches yet
+    matchdays = leagues.get_league(league).matchdays
+    last_day = matchdays if season < current_d[1] \
+        else min(matchdays, current_d[0] + 1)
+    state = store.sync_state().get(str(season), {})
+    days = [day for day in range(1, last_day + 1)
+            if full or not state.get(str(day), {}).get('settled')]
+    last_changes = download_json(
+        [_matchdata_url(season, day, league).replace(
+            '/getmatchdata/', '/getlastchangedate/') for day in days],
+        get_json=http_client.get_json)
+    changed = [(day, last_change)
+               for day, last_change in zip(days, last_changes)
+               if state.get(str(day), {}).get('last_change') != last_change]
+    urls = [_matchdata_url(season, day, league) for day, _ in changed]
+    responses = download_json(urls, get_json=http_client.get_json)
+    matches, _ = parse_matches(urls, responses, with_ids=True)
+    if not matches.empty:
+        store.upsert(matches)
+
+    settle_before = _utcnow() - SYNC_SETTLED
+    for (day, last_change), games in zip(changed, responses):
+        state[str(day)] = {
+            'last_change': last_change,
+            'settled': bool(games) and bool(last_change)
+            and all(game['matchIsFinished'] for game in games)
+            and _api_datetime(last_change) < settle_before,
+        }
+    store.save_sync_state(season, state)
+    return {'checked': days, 'changed': [day for day, _ in changed],
+            'rows': len(matches)}
+
+
+# A change of a single match seen by MatchdayPoller. kind is SCORE_CHANGED
+# or MATCH_FINISHED, scores are (home, guest) tuples.
+MatchUpdate = collections.namedtuple('MatchUpdate', [
+    'kind', 'match_id', 'season', 'matchday', 'home_team', 'guest_team',
+    'score', 'previous_score'])
+
+
+class MatchdayPoller:
+    """
+    Watches a matchday while it is played. Every poll only asks the api
+    for the last change date of the matchday; the matches are downloaded
+    only if it changed. Changes are sent as MatchUpdate to all subscribers.
+
+    Usage::
+
+        poller = MatchdayPoller(interval=30)
+        poller.subscribe(print)
+        poller.start()
+        ...
+        poller.stop()
+    """
+
+    def __init__(self, season=None, matchday=None, interval=POLL_INTERVAL,
+                 store=None, league=leagues.DEFAULT_LEAGUE):
+        """
+        :param int season: season to watch, default is the current season
+        :param int matchday: matchday to watch, default is the matchday of
+         the next or running match
+        :param float interval: seconds between two polls
+        :param match_store.MatchStore store: store that finished matches
+         are added to, None to only send updates
+        :param str league: league shortcut
+        """
+        self.league = leagues.get_league(league).shortcut
+        self.season = season
+        self.matchday = matchday
+        self.interval = interval
+        self.store = store
+        self.polls = 0
+        self.downloads = 0
+        self.errors = 0
+        self._subscribers = []
+        self._last_change = None
+        # matchID: (score, finished)
+        self._matches = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """
+        Calls callback with every MatchUpdate from now on.
+
+        :param callback: function with a single argument
+        :return: the callback, so subscribe can be used as decorator
+        """
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        """
+        :param callback: function given to subscribe before
+        """
+        self._subscribers.remove(callback)
+
+    def poll(self):
+        """
+        Checks the matchday once. The first poll only learns the current
+        state of the matches and sends no updates.
+
+        :return: list[MatchUpdate] sent to the subscribers
+        """
+        self.polls += 1
+        if self.season is None or self.matchday is None:
+            self._choose_matchday()
+        url = _matchdata_url(self.season, self.matchday, self.league)
+        last_change = http_client.get_json(
+            url.replace('/getmatchdata/', '/getlastchangedate/'))
+        if self._matches is not None and last_change == self._last_change:
+            return []
+        games = http_client.get_json(url)
+        self.downloads += 1
+        self._last_change = last_change
+
+        updates = []
+        matches = {}
+        for game in games:
+            finished = game['matchIsFinished']
+            score = _live_score(game)
+            matches[game['matchID']] = (score, finished)
+            if self._matches is None \
+                    or game['matchID'] not in self._matches:
+                continue
+            previous_score, was_finished = self._matches[game['matchID']]
+            if score != previous_score:
+                updates.append(self._update(SCORE_CHANGED, game, score,
+                                            previous_score))
+            if finished and not was_finished:
+                updates.append(self._update(MATCH_FINISHED, game, score,
+                                            previous_score))
+        self._matches = matches
+
+        if self.store is not None and any(
+                update.kind == MATCH_FINISHED for update in updates):
+            finished_matches, _ = parse_matches([url], [games],
+                                                with_ids=True)
+            self.store.upsert(finished_matches)
+        for update in updates:
+            for callback in list(self._subscribers):
+                callback(update)
+        return updates
+
+    def run(self, max_polls=None):
+        """
+        Polls every interval seconds until stop is called. A poll that
+        fails is warned about and counted in errors, the next poll tries
+        again.
+
+        :param int max_polls: stop after this many polls, None for no limit
+        """
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except (requests.RequestException, ValueError) as error:
+                # e.g. an outage or the open circuit breaker, the next poll
+                # tries again
+                self.errors += 1
+                warnings.warn('polling matchday ' + str(self.matchday)
+                              + ' failed, trying again in '
+                              + str(self.interval) + ' seconds: '
+                              + str(error), category=Warning)
+            if max_polls is not None and self.polls >= max_polls:
+                break
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """
+        Runs the poller in a background thread.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread after the running poll.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _choose_matchday(self):
+        """
+        Watches the matchday of the running or next match of the season.
+        """
+        current_d = get_current_date(league=self.league)
+        if self.season is None:
+            self.season = current_d[1]
+        if self.matchday is None:
+            season_matches = response_cache.get_json(
+                _matchdata_url(self.season, league=self.league))
+            self.matchday = _live_matchday(season_matches, _utcnow()) \
+                or current_d[0]
+
+    def _update(self, kind, game, score, previous_score):
+        return MatchUpdate(kind, game['matchID'], self.season,
+                           game['group']['groupOrderID'],
+                           game['team1']['teamName'],
+                           game['team2']['teamName'], score, previous_score)
+
+
+def _live_score(game):
+    """
+    Returns the score of a match, also while it is played.
+
+    :param dict game: json of a single match
+    :return: tuple (home goals, guest goals)
+    """
+    if game['matchIsFinished'] and game.get('matchResults'):
+        result = game['matchResults'][0]
+        return result['pointsTeam1'], result['pointsTeam2']
+    if game.get('goals'):
+        # goals are sorted, the last one has the current score
+        goal = game['goals'][-1]
+        return goal['scoreTeam1'], goal['scoreTeam2']
+    return 0, 0
+
+
+def _live_matchday(season_matches, now):
+    """
+    Finds the matchday of the running or next match in the matches of a
+    season. Matches that should be over long ago (postponed) are ignored.
+
+    :param list season_matches: json response of a whole season
+    :param datetime.datetime now: current UTC time
+    :return: int matchday or None if no match is left
+    """
+    upcoming = [(_kickoff_utc(game), game['group']['groupOrderID'])
+                for game in season_matches if not game['matchIsFinished']]
+    upcoming = [match for match in upcoming
+                if match[0] > now - MATCH_DURATION]
+    if not upcoming:
+        return None
+    return min(upcoming)[1]
+
+
+def get_current_date(refresh=False, league=leagues.DEFAULT_LEAGUE):
     """
-    Checks if there is data for the current year. If not, the year before is
-    the current season. Exp. any match in 2021 before may is in the season
-    2020.
+    Finds the current [matchday, season] with a single download of the
+    current season. If there is no data for the current year yet, the year
+    before is the current season. Exp. any match in 2021 before may is in
+    the season 2020.
+    The current matchday is the last matchday with a finished match.
+
+    The result is remembered until the next unfinished match should be
+    over, so repeated calls cost no network.
+
+    :param bool refresh: ignore the remembered result and revalidate the
+     cached season
+    :param str league: league shortcut
     :return: current date [day, season]
     """
-    current_seas = datetime.date.today().year
-    current_year_has_no_data = data_not_exist(
-        curate_urls([1, current_seas], [1, current_seas]))
-    if current_year_has_no_data:
-        current_seas = datetime.date.today().year - 1
-    day = 0
-    for day in range(34, 1, -1):
-        if matches_exists(
-                curate_urls([day, current_seas], [day, current_seas])):
-            break
+    now = _utcnow()
+    with _current_date_lock:
+        current_date = _current_dates.get(league)
+        if not refresh and current_date is not None \
+                and now < current_date[1]:
+            return list(current_date[0])
+
+    current_seas = now.year
+    season_matches = response_cache.get_json(
+        _matchdata_url(current_seas, league=league), refresh)
+    if not season_matches:
+        current_seas -= 1
+        season_matches = response_cache.get_json(
+            _matchdata_url(current_seas, league=league), refresh)
+    day, expires = _resolve_matchday(season_matches, now)
+
+    with _current_date_lock:
+        _current_dates[league] = ([day, current_seas], expires)
     return [day, current_seas]
 
 
+def _resolve_matchday(season_matches, now):
+    """
+    Finds the last matchday with a finished match in the matches of a
+    season and the time this matchday may change.
+
+    :param list season_matches: json response of a whole season
+    :param datetime.datetime now: current UTC time
+    :return: tuple matchday, expiry as UTC datetime
+    """
+    day = 0
+    next_kickoff = None
+    for game in season_matches:
+        if game['matchIsFinished']:
+            day = max(day, game['group']['groupOrderID'])
+        else:
+            kickoff = _kickoff_utc(game)
+            if next_kickoff is None or kickoff < next_kickoff:
+                next_kickoff = kickoff
+    if next_kickoff is None:
+        # season is over, only a new season can change the date
+        return day, now + RESOLVE_IDLE
+    expires = next_kickoff + MATCH_DURATION
+    if expires <= now:
+        # a started match has no result yet
+        expires = now + RESOLVE_RETRY
+    return day, expires
+
+
+def _utcnow():
+    """
+    The clock of the crawler, replaced by tests that run against a
+    recorded api.
+
+    :return: current time as naive UTC datetime
+    """
+    return datetime.datetime.utcnow()
+
+
+def _api_datetime(value):
+    """
+    Turns a date of the api into a naive datetime.
+
+    :param str value: date like '2021-02-27T17:20:31.28'
+    :return: datetime.datetime
+    """
+    return datetime.datetime.strptime(value[:19], API_DATE_FORMAT)
+
+
+def _kickoff_utc(game):
+    """
+    Returns the kickoff of a match as naive UTC datetime.
+
+    :param dict game: json of a single match
+    :return: datetime.datetime
+    """
+    # matchDateTime is local german time, only use it if UTC is missing
+    kickoff = game.get('matchDateTimeUTC') or game['matchDateTime']
+    return _api_datetime(kickoff)
+
+
+def _matchdata_url(season, day=None, league=leagues.DEFAULT_LEAGUE):
+    """
+    Builds the api url of a whole season or of a single matchday.
+
+    :param int season: season
+    :param int day: matchday, None for the whole season
+    :param str league: league shortcut
+    :return: str url
+    """
+    url = 'https://api.openligadb.de/getmatchdata/' + league + '/' \
+        + str(season)
+    if day is not None:
+        url += '/' + str(day)
+    return url
+
+
 def get_csv_last_date(csv_file):
     """
-    This function finds the season and matchday of the last match in the csv,
-    if a file exists. If there is no file yet it returns [1, 2004].
+    This function finds the season and matchday of the last match in a
+    legacy csv file, if a file exists. If there is no file yet it returns
+    [1, 2004].
+    Only the end of the file is read, not the whole file.
     :return: [matchday, season]
     """
-    if os.path.exists(csv_file):
-        this_df = pd.read_csv(csv_file)
-        end_date_csv = [int(this_df['matchday'].iloc[-1]),
-                        int(this_df['season'].iloc[-1])]
-    else:
-        first_match = [1, 2004]
-        end_date_csv = first_match
-    return end_date_csv
+    return match_store.csv_last_date(csv_file) or [1, 2004]
 
 
-def take_data(start, end, csv_file):
+def take_data(start, end, store):
     """
-    Takes data from start to end out of the csv file.
-    :param csv_file: path to csv file
+    Takes data from start to end out of the match store.
+    :param match_store.MatchStore store: store of the crawled matches
     :param list[int] start: Starting Date
     :param list[int] end: Ending Date
     :return: Dataframe
     """
-    if os.path.exists(csv_file):
-        dataframe = pd.read_csv(csv_file)
-        dataframe = convertdf(dataframe)
-        # take all data with in these seasons(each included)
-        data = dataframe[(dataframe['season'] >= start[1])
-                         & (dataframe['season'] <= end[1])]
-        # take all except days in the first season, that are
-        # before our first matchday
-        data_correct_start = data[
-            (data['season'] != start[1]) | (data['matchday'] >= start[0])]
-        # same thing with last season, this time all that are after our last
-        # matchday
-        correct_data = data_correct_start[
-            (data_correct_start['season'] != end[1])
-            | (data['matchday'] <= end[0])]
-    return correct_data
+    return store.read_range(start, end)
 
 
 def convertdf(dataframe):
@@ -185,39 +699,45 @@ def convertdf(dataframe):
     return dataframe
 
 
-def incorrect_dates(start_date, end_date, current_seas):
+def incorrect_dates(start_date, end_date, current_seas,
+                    league=leagues.DEFAULT_LEAGUE):
     """
     Checks if the submitted dates are correct.
     :param current_seas: the current season
     :param list [int] start_date: [matchday, year]
     :param list [int] end_date: [matchday, year]
+    :param str league: league shortcut
     :returns: Result whether or not the dates are incorrect as type boolean
     """
     days = [start_date[0], end_date[0]]
     seasons = [start_date[1], end_date[1]]
     statement_day = False
     statement_season = False
+    league = leagues.get_league(league)
     for day in days:
-        # each season has 34 game days
-        statement_day = (day == 0) or (day > 34) or statement_day
+        statement_day = (day == 0) or (day > league.matchdays) \
+            or statement_day
     for season in seasons:
-        first_recorded_bl_year = 2003  # 1964 openliga has only new matches
-        statement_season = (first_recorded_bl_year > season
+        # openligadb has complete data of a league from its first season
+        statement_season = (league.first_season > season
                             or season > current_seas
                             or statement_season)
     if statement_day or statement_season:
-        warnings.warn('there has been no match on this day. Matches are 34 '
-                      'days per season from 1963 to 2020. The prediction '
+        warnings.warn('there has been no match on this day. Matches of the '
+                      + league.name + ' are ' + str(league.matchdays)
+                      + ' days per season from ' + str(league.first_season)
+                      + ' to ' + str(current_seas) + '. The prediction '
                       'will work with the earliest/latest data there is.',
                       category=Warning)
 
 
-def curate_urls(start_date, end_date):
+def curate_urls(start_date, end_date, league=leagues.DEFAULT_LEAGUE):
     """
     A function that curates the urls for the data in the given time range.
 
     :param list [int] start_date: [matchday, year]
     :param list [int] end_date: [matchday, year]
+    :param str league: league shortcut
     :return: List of urls of matches from each game day in the given
      time period
     """
@@ -225,38 +745,103 @@ def curate_urls(start_date, end_date):
     end_season = end_date[1]
     end_day = end_date[0]
     start_day = start_date[0]
+    matchdays = leagues.get_league(league).matchdays
     urls = []
     # dates are in same year
     if end_season == start_season:
         for day in list(range(start_day, end_day + 1)):
-            urls += ['https://api.openligadb.de/getmatchdata/bl1/'
-                     + str(start_season) + '/' + str(day)]
+            urls += [_matchdata_url(start_season, day, league)]
     else:
         # starting date doesn't begin with 1.matchday
         if start_day != 1:
-            for day in list(range(start_day, 35)):
-                urls += ['https://api.openligadb.de/getmatchdata/bl1/'
-                         + str(start_season) + '/' + str(day)]
+            for day in list(range(start_day, matchdays + 1)):
+                urls += [_matchdata_url(start_season, day, league)]
             for season in range(start_season + 1, end_season):
-                urls += ['https://api.openligadb.de/getmatchdata/bl1/'
-                         + str(season)]
+                urls += [_matchdata_url(season, league=league)]
         # if it does start on 1. matchday we take the whole season and add
         # seasons between dates
         else:
             for season in range(start_season, end_season):
-                urls += ['https://api.openligadb.de/getmatchdata/bl1/'
-                         + str(season)]
+                urls += [_matchdata_url(season, league=league)]
         # adding last season we want to look at
-        if end_day != 34:
+        if end_day != matchdays:
             for day in list(range(1, end_day + 1)):
-                urls += ['https://api.openligadb.de/getmatchdata/bl1/'
-                         + str(end_season) + '/' + str(day)]
+                urls += [_matchdata_url(end_season, day, league)]
         else:
-            urls += ['https://api.openligadb.de/getmatchdata/bl1/'
-                     + str(end_season)]
+            urls += [_matchdata_url(end_season, league=league)]
     return urls
 
 
+class FetchPlan:
+    """
+    The urls crawl_openligadb has to download for a time range, each url
+    only once.
+    """
+
+    def __init__(self, urls):
+        """
+        :param list[str] urls: urls of whole seasons and single matchdays
+        """
+        self.urls = urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __iter__(self):
+        return iter(self.urls)
+
+    def __repr__(self):
+        return 'FetchPlan(' + str(self.request_count) + ' requests)'
+
+    @property
+    def request_count(self):
+        """
+        :return: int number of requests of the plan
+        """
+        return len(self.urls)
+
+
+def plan_requests(start_date, end_date, store=None,
+                  league=leagues.DEFAULT_LEAGUE):
+    """
+    Plans the downloads of all matches from start_date until end_date with
+    as few round trips as possible. Matchdays that are complete in the
+    store are not downloaded again. Per season the remaining matchdays are
+    either downloaded one by one or, if that costs more, the whole season
+    is downloaded once. crawl_openligadb stores all finished matches of a
+    downloaded season, also those of matchdays outside the range.
+
+    :param list [int] start_date: [matchday, year]
+    :param list [int] end_date: [matchday, year]
+    :param match_store.MatchStore store: store to skip complete matchdays
+     of, None to plan all matchdays
+    :param str league: league shortcut
+    :return: FetchPlan
+    """
+    league = leagues.get_league(league)
+    matchdays = league.matchdays
+    # cups are always downloaded as a whole, their rounds get smaller
+    per_matchday = league.matches_per_matchday or 1
+    season_cost = ROUND_TRIP_MATCHES + matchdays * per_matchday
+    matchday_cost = ROUND_TRIP_MATCHES + per_matchday
+    urls = []
+    for season in range(start_date[1], end_date[1] + 1):
+        first_day = start_date[0] if season == start_date[1] else 1
+        last_day = end_date[0] if season == end_date[1] else matchdays
+        days = range(max(first_day, 1), min(last_day, matchdays) + 1)
+        if store is not None:
+            counts = store.matchday_counts(season)
+            days = [day for day in days
+                    if counts.get(day, 0) < per_matchday]
+        if league.matches_per_matchday is None and len(days) \
+                or len(days) * matchday_cost > season_cost:
+            urls.append(_matchdata_url(season, league=league.shortcut))
+        else:
+            urls.extend(_matchdata_url(season, day, league.shortcut)
+                        for day in days)
+    return FetchPlan(urls)
+
+
 def data_not_exist(url):
     """
     Checks if data exists for this url.
@@ -268,9 +853,7 @@ def data_not_exist(url):
 
     while to_crawl:
         current_url = to_crawl.pop(0)
-        response = requests.get(current_url)
-        json_response = response.content
-        json_response = json.loads(json_response)
+        json_response = response_cache.get_json(current_url)
 
         if not json_response:
             return True
@@ -288,34 +871,132 @@ def matches_exists(url):
     to_crawl = url
     while to_crawl:
         current_url = to_crawl.pop(0)
-        request = requests.get(current_url)
-        json_response = request.content
-        json_response = json.loads(json_response)
+        json_response = response_cache.get_json(current_url)
         for game in range(len(json_response)):
             if json_response[game]['matchIsFinished']:
                 return True
 
 
-def crawl_openligadb(urls, unfinished_matches, matches, csv_file):
+class CrawlError(Exception):
+    """
+    Raised if urls could not be downloaded. The matches of all other urls
+    are stored already, so crawling the range again only downloads the
+    failed urls.
     """
-    Crawls through the given urls
-    and safes the useful data in the dataframe 'matches'. The Data of an
-    unfinished season is saved in 'unfinished_matches'.
 
-    :param csv_file: path to csv file
-    :param matches: empty dataframe
-    :param unfinished_matches: empty dataframe
+    def __init__(self, failed):
+        """
+        :param dict failed: url: exception
+        """
+        super().__init__('could not download ' + ', '.join(failed))
+        self.failed = failed
+
+
+def download_json(urls, workers=CRAWL_WORKERS, get_json=None, failed=None):
+    """
+    Downloads the json responses of all given urls with up to 'workers'
+    requests at the same time.
+
+    :param list[str] urls: urls to download
+    :param int workers: maximum number of parallel downloads
+    :param get_json: function that downloads a single url, default is
+     response_cache.get_json
+    :param dict failed: if given, urls that could not be downloaded are
+     added to it with their exception and get the response None, instead
+     of raising the first exception
+    :return: List of the decoded responses, in the same order as the urls
+    """
+    get_json = get_json or response_cache.get_json
+    if failed is not None:
+        get_json = functools.partial(_get_json_or_none, get_json, failed)
+    if workers <= 1 or len(urls) <= 1:
+        return [get_json(url) for url in urls]
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as executor:
+        # map keeps the order of the urls, no matter which download
+        # finishes first
+        return list(executor.map(get_json, urls))
+
+
+def _get_json_or_none(get_json, failed, url):
+    """
+    :return: decoded response, None if the download failed
+    """
+    try:
+        return get_json(url)
+    except (requests.RequestException, ValueError) as error:
+        failed[url] = error
+        return None
+
+
+def crawl_openligadb(urls, store, workers=CRAWL_WORKERS, refresh=False):
+    """
+    Crawls through the given urls and adds the finished matches to the
+    match store. The urls are downloaded in parallel, but the matches are
+    always added in the order of the urls. Matches that are stored already
+    are replaced, so crawling a range twice stores no duplicates.
+    If some urls fail, the matches of the others are stored anyway.
+
     :param list[str] urls: List with urls from matches and seasons in our
      time range.
+    :param match_store.MatchStore store: store of the crawled matches
+    :param int workers: maximum number of parallel downloads
+    :param bool refresh: revalidate cached responses even if they are
+     still valid
+    :return: Dataframe with the unfinished matches in the given urls
+    :raises CrawlError: after storing the other matches, if urls could not
+     be downloaded
     """
+    get_json = None
+    if refresh:
+        get_json = functools.partial(response_cache.get_json, refresh=True)
+    failed = {}
+    responses = download_json(urls, workers, get_json, failed)
+    unfinished_matches = _store_responses(urls, responses, failed, store)
+    return unfinished_matches[COLUMNS]
 
-    to_crawl = urls
-    while to_crawl:
-        current_url = to_crawl.pop(0)
-        request = requests.get(current_url)
-        json_response = request.content
-        json_response = json.loads(json_response)
 
+def _store_responses(urls, responses, failed, store):
+    """
+    Adds the finished matches of the downloaded urls to the store.
+
+    :param list[str] urls: urls of the responses
+    :param list responses: decoded json responses
+    :param dict failed: url: exception of the urls that failed
+    :param match_store.MatchStore store: store of the crawled matches
+    :return: Dataframe with the unfinished matches
+    :raises CrawlError: after storing the other matches, if urls failed
+    """
+    downloaded = [(url, response) for url, response in zip(urls, responses)
+                  if url not in failed]
+    matches, unfinished_matches = parse_matches(
+        [url for url, _ in downloaded],
+        [response for _, response in downloaded], with_ids=True)
+    # if matches has been filled in this function
+    if not matches.empty:
+        store.upsert(matches)
+    if failed:
+        raise CrawlError(failed)
+    return unfinished_matches
+
+
+def parse_matches(urls, responses, with_ids=False):
+    """
+    Turns the json responses of the given urls into one DataFrame of
+    finished and one of unfinished matches. All matches are first collected
+    column by column, so each DataFrame is built at once.
+    Unfinished matches have a score of -1.
+
+    :param list[str] urls: urls of the responses
+    :param list responses: decoded json responses
+    :param bool with_ids: add the match_store.ID_COLUMNS (matchID and
+     lastUpdateDateTime of the api)
+    :return: tuple finished matches, unfinished matches as pd.DataFrames
+    """
+    columns_names = COLUMNS + match_store.ID_COLUMNS
+    finished = {column: [] for column in columns_names}
+    unfinished = {column: [] for column in columns_names}
+    for current_url, json_response in zip(urls, responses):
+        season = response_cache.parse_matchdata_url(current_url)[1]
         for game in json_response:  # all matches in scrape
 
             # save_logos(json_response[game]['team1']['teamName'],
@@ -323,37 +1004,53 @@ def crawl_openligadb(urls, unfinished_matches, matches, csv_file):
             # save_logos(json_response[game]['team2']['teamName'],
             #            json_response[game]['team2']['teamIconUrl'])
 
-            # appends response item-array to matches, !ORDER SENSITIVE!
             if game['matchIsFinished']:
-                matches_length = len(matches)
-                matches.loc[matches_length] = [
-                    game['matchDateTime'],  # match_date_time
-                    game['group']["groupOrderID"],  # matchday
-                    game['team1']['teamName'],  # home_t
-                    game['matchResults'][0]['pointsTeam1'],  # h
-                    game['matchResults'][0]['pointsTeam2'],  # g
-                    game['team2']['teamName'],  # guest_t
-                    current_url[43:47]  # season
-                ]
+                columns = finished
+                home_score = game['matchResults'][0]['pointsTeam1']
+                guest_score = game['matchResults'][0]['pointsTeam2']
             else:
-                unfinished_matches_length = len(unfinished_matches)
-                unfinished_matches.loc[unfinished_matches_length] = [
-                    game['matchDateTime'],  # match_date_time
-                    game['group']["groupOrderID"],  # matchday
-                    game['team1']['teamName'],  # home_t
-                    -1,  # h
-                    -1,  # g
-                    game['team2']['teamName'],  # guest_t
-                    current_url[43:47]  # season
-                ]
-    # if matches has been filled in this function
-    if not matches.empty:
-        if os.path.exists(csv_file):
-            matches.to_csv(csv_file, mode='a',
-                           index=False, header=False)
-        else:
-            matches.to_csv(csv_file, index=False)
-    return unfinished_matches
+                columns = unfinished
+                home_score = -1
+                guest_score = -1
+            columns['date_time'].append(game['matchDateTime'])
+            columns['matchday'].append(game['group']['groupOrderID'])
+            columns['home_team'].append(game['team1']['teamName'])
+            columns['home_score'].append(home_score)
+            columns['guest_score'].append(guest_score)
+            columns['guest_team'].append(game['team2']['teamName'])
+            columns['season'].append(season)
+            columns['match_id'].append(game.get('matchID', -1))
+            columns['last_update'].append(game.get('lastUpdateDateTime'))
+    return (_columns_to_df(finished, with_ids),
+            _columns_to_df(unfinished, with_ids))
+
+
+def _columns_to_df(columns, with_ids=False):
+    """
+    Builds a typed DataFrame from lists of column values.
+
+    :param dict columns: list of values per column of COLUMNS and
+     match_store.ID_COLUMNS
+    :param bool with_ids: keep the match_store.ID_COLUMNS
+    :return: pd.DataFrame
+    """
+    dataframe = pd.DataFrame({
+        'date_time': pd.to_datetime(pd.Series(columns['date_time'],
+                                              dtype='object'),
+                                    format=API_DATE_FORMAT, exact=False),
+        'matchday': np.array(columns['matchday'], dtype='int64'),
+        'home_team': pd.Series(columns['home_team'], dtype='object'),
+        'home_score': np.array(columns['home_score'], dtype='int64'),
+        'guest_score': np.array(columns['guest_score'], dtype='int64'),
+        'guest_team': pd.Series(columns['guest_team'], dtype='object'),
+        'season': np.array(columns['season'], dtype='int64'),
+    }, columns=COLUMNS)
+    if with_ids:
+        dataframe['match_id'] = np.array(columns['match_id'], dtype='int64')
+        dataframe['last_update'] = pd.to_datetime(
+            pd.Series(columns['last_update'], dtype='object'),
+            format=API_DATE_FORMAT, exact=False)
+    return dataframe
 
 
 # def save_logos(teamname, teamicon):
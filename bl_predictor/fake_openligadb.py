@@ -0,0 +1,317 @@
+"""
+This module contains a local stand-in for the OpenLigaDB api.
+
+FakeOpenligaDB is a requests transport adapter that answers api urls from
+recorded json files or from a DataFrame of matches, e.g. the packaged
+crawled_data.csv. Latency, errors and payload size can be configured, so
+the crawler can be tested and benchmarked without any network.
+
+Usage::
+
+    api = FakeOpenligaDB.from_legacy_csv(latency=0.05)
+    with offline(api):
+        crawler.fetch_data([1, 2010], [34, 2015])
+    print(len(api.requests), api.max_in_flight)
+"""
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+
+from bl_predictor import crawler
+from bl_predictor import http_client
+from bl_predictor import leagues
+from bl_predictor import match_store
+from bl_predictor import response_cache
+
+API_URL = 'https://api.openligadb.de'
+
+_API_PATH = re.compile(
+    r'/(?P<endpoint>getmatchdata|getlastchangedate)/(?P<league>\w+)/'
+    r'(?P<season>\d{4})(/(?P<day>\d+))?$')
+
+
+class FakeOpenligaDB(BaseAdapter):
+    """
+    Transport adapter that plays the OpenLigaDB api.
+
+    Answers getmatchdata/<league>/<season>[/<day>] and
+    getlastchangedate/<league>/<season>/<day>, supports ETag/If-None-Match
+    and counts all requests.
+    """
+
+    def __init__(self, payloads, today=None, latency=0.0, error_rate=0.0,
+                 padding=0, seed=None):
+        """
+        :param dict payloads: api path (e.g. '/getmatchdata/bl1/2014/3'): list
+         of match dicts
+        :param datetime.datetime today: UTC time the crawler should see while
+         the fake is used offline, default is now
+        :param latency: seconds per request, a number or (min, max) tuple
+        :param float error_rate: share of requests answered with 503
+        :param int padding: bytes of whitespace added to every payload
+        :param seed: seed of the random latency and errors
+        """
+        super().__init__()
+        self.payloads = payloads
+        self.today = today or datetime.datetime.utcnow()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.padding = padding
+        # url: number of requests that still fail with 503
+        self.fail_urls = {}
+        self.requests = []
+        self.bytes_sent = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._next_match_id = 1
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, matches, league=leagues.DEFAULT_LEAGUE, **kwargs):
+        """
+        Builds the api from a DataFrame of matches. Matches with a score of
+        -1 are unfinished.
+
+        :param matches: pd.DataFrame with match_store.COLUMNS
+        :param str league: league shortcut of the matches
+        :param kwargs: arguments of FakeOpenligaDB
+        :return: FakeOpenligaDB
+        """
+        api = cls({}, **kwargs)
+        api.add_matches(matches, league)
+        return api
+
+    @classmethod
+    def from_legacy_csv(cls, csv_file=match_store.LEGACY_CSV, **kwargs):
+        """
+        Builds the api from the packaged crawled_data.csv. The crawler sees
+        the day after the last match in the file as today.
+
+        :param str csv_file: csv file of crawled matches
+        :param kwargs: arguments of FakeOpenligaDB
+        :return: FakeOpenligaDB
+        """
+        matches = pd.read_csv(csv_file)
+        matches['date_time'] = pd.to_datetime(matches['date_time'])
+        kwargs.setdefault('today', (matches['date_time'].max()
+                                    + pd.Timedelta(days=1)).to_pydatetime())
+        return cls.from_frame(matches, **kwargs)
+
+    @classmethod
+    def from_fixtures(cls, directory, **kwargs):
+        """
+        Builds the api from json files written by record.
+
+        :param str directory: directory of the recorded files
+        :param kwargs: arguments of FakeOpenligaDB
+        :return: FakeOpenligaDB
+        """
+        payloads = {}
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                with open(os.path.join(directory, name),
+                          encoding='utf-8') as fixture:
+                    payloads['/' + name[:-len('.json')].replace('__', '/')] \
+                        = json.load(fixture)
+        return cls(payloads, **kwargs)
+
+    def add_matches(self, matches, league=leagues.DEFAULT_LEAGUE):
+        """
+        Serves the given matches in addition, e.g. of another league.
+
+        :param matches: pd.DataFrame with match_store.COLUMNS
+        :param str league: league shortcut of the matches
+        """
+        matches = matches.reset_index(drop=True)
+        for season, season_matches in matches.groupby('season', sort=True):
+            games = [_game_json(row, int(season), self._next_match_id + number)
+                     for number, row in enumerate(
+                         season_matches.itertuples(index=False))]
+            # matchIDs are unique over all leagues, like in the api
+            self._next_match_id += len(games)
+            season_path = '/getmatchdata/' + league + '/' + str(season)
+            self.payloads[season_path] = games
+            for game in games:
+                path = season_path + '/' + str(game['group']['groupOrderID'])
+                self.payloads.setdefault(path, []).append(game)
+
+    def session(self):
+        """
+        :return: requests.Session that sends all api requests to this fake
+        """
+        session = http_client.create_session()
+        session.mount(API_URL, self)
+        return session
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        """
+        Answers a prepared request like the api would.
+
+        :return: requests.Response
+        """
+        with self._lock:
+            self.requests.append(request.url)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            latency = self.latency
+            if isinstance(latency, tuple):
+                latency = self._random.uniform(*latency)
+            failing = self.fail_urls.get(request.url, 0) > 0 \
+                or self._random.random() < self.error_rate
+            if self.fail_urls.get(request.url, 0) > 0:
+                self.fail_urls[request.url] -= 1
+        try:
+            if latency:
+                time.sleep(latency)
+            if failing:
+                return self._response(request, 503, b'')
+            return self._answer(request)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def close(self):
+        pass
+
+    def _answer(self, request):
+        """
+        Builds the response to a request that does not fail.
+        """
+        path = request.path_url.split('?')[0]
+        match = _API_PATH.search(path)
+        if match is None:
+            return self._response(request, 404, b'')
+        if match.group('endpoint') == 'getlastchangedate':
+            games = self.payloads.get(path.replace('/getlastchangedate/',
+                                                   '/getmatchdata/'), [])
+            changes = [game['lastUpdateDateTime'] for game in games
+                       if game.get('lastUpdateDateTime')]
+            body = json.dumps(max(changes, default='0001-01-01T00:00:00'))
+            return self._response(request, 200, body.encode('utf-8'))
+        body = json.dumps(self.payloads.get(path, [])).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            return self._response(request, 304, b'', {'ETag': etag})
+        return self._response(request, 200, body + b' ' * self.padding,
+                              {'ETag': etag})
+
+    def _response(self, request, status_code, body, headers=None):
+        """
+        Wraps a body into a requests.Response.
+        """
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = body
+        response.headers.update(headers or {})
+        response.headers['Content-Type'] = 'application/json'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        with self._lock:
+            self.bytes_sent += len(body)
+        return response
+
+
+def _game_json(row, season, match_id):
+    """
+    Builds the json of a single match like the api sends it.
+
+    :param row: named tuple with match_store.COLUMNS
+    :param int season: season of the match
+    :param int match_id: matchID of the match
+    :return: dict
+    """
+    kickoff = pd.Timestamp(row.date_time)
+    finished = row.home_score >= 0
+    game = {
+        'matchID': match_id,
+        'matchDateTime': kickoff.strftime('%Y-%m-%dT%H:%M:%S'),
+        # the packaged data only knows local german time, close enough
+        'matchDateTimeUTC': kickoff.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'leagueSeason': season,
+        'group': {'groupOrderID': int(row.matchday)},
+        'team1': {'teamName': row.home_team},
+        'team2': {'teamName': row.guest_team},
+        'matchIsFinished': bool(finished),
+        'matchResults': [],
+        'lastUpdateDateTime': None,
+    }
+    if finished:
+        game['matchResults'] = [{'resultTypeID': 2,
+                                 'pointsTeam1': int(row.home_score),
+                                 'pointsTeam2': int(row.guest_score)}]
+        game['lastUpdateDateTime'] = (kickoff + pd.Timedelta(hours=2)) \
+            .strftime('%Y-%m-%dT%H:%M:%S')
+    return game
+
+
+def record(urls, directory):
+    """
+    Downloads the given api urls with the shared client and saves them as
+    fixtures for FakeOpenligaDB.from_fixtures.
+
+    :param list[str] urls: api urls
+    :param str directory: directory of the recorded files
+    """
+    os.makedirs(directory, exist_ok=True)
+    for url in urls:
+        payload = http_client.get_json(url)
+        name = url[len(API_URL) + 1:].replace('/', '__') + '.json'
+        with open(os.path.join(directory, name), 'w',
+                  encoding='utf-8') as fixture:
+            json.dump(payload, fixture, ensure_ascii=False)
+
+
+@contextlib.contextmanager
+def offline(api, store=None):
+    """
+    Lets the crawler talk to the fake api instead of the internet.
+
+    While active, all crawler requests go to 'api', the crawler clock shows
+    api.today and fetch_data uses 'store' for the default league (default:
+    a new, empty store in a temporary directory). The stores of the other
+    leagues are new and empty. Responses are cached in a temporary
+    directory, so the cache of the user is neither used nor filled.
+    Everything is restored afterwards.
+
+    :param FakeOpenligaDB api: fake api
+    :param match_store.MatchStore store: store fetch_data should use
+    """
+    with contextlib.ExitStack() as stack:
+        directory = stack.enter_context(tempfile.TemporaryDirectory())
+        store_directory = os.path.join(directory, 'store')
+        if store is None:
+            store = match_store.MatchStore(store_directory, legacy_csv=None)
+        previous_cache = response_cache.set_cache(
+            response_cache.ResponseCache(os.path.join(directory, 'cache')))
+        previous_session = http_client.set_session(api.session())
+        previous_stores = match_store._stores
+        previous_directory = match_store.DEFAULT_DIRECTORY
+        previous_clock = crawler._utcnow
+        previous_dates = crawler._current_dates
+        match_store._stores = {leagues.DEFAULT_LEAGUE: store}
+        match_store.DEFAULT_DIRECTORY = store_directory
+        crawler._utcnow = lambda: api.today
+        crawler._current_dates = {}
+        try:
+            yield api
+        finally:
+            http_client.set_session(previous_session)
+            response_cache.set_cache(previous_cache)
+            match_store._stores = previous_stores
+            match_store.DEFAULT_DIRECTORY = previous_directory
+            crawler._utcnow = previous_clock
+            crawler._current_dates = previous_dates
@@ -0,0 +1,323 @@
+"""
+This module contains the HTTP client that is shared by all crawler
+functions. It keeps the connections to the OpenLigaDB api alive, so only
+the first request has to pay for the TCP/TLS handshake.
+
+All requests share a token bucket, so the crawler never sends more than
+RATE_LIMIT requests per second, no matter how many threads download.
+Failed requests are retried with jittered exponential backoff, and after
+BREAKER_THRESHOLD failures in a row a circuit breaker lets requests fail
+at once until the api had BREAKER_TIMEOUT seconds to recover.
+"""
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Number of connections kept open per host. Should be at least as big as
+# crawler.CRAWL_WORKERS, otherwise parallel downloads open new connections.
+POOL_SIZE = 8
+# Seconds to wait for (connecting, reading the response)
+TIMEOUT = (5, 30)
+# Requests per second and number of requests that may be sent at once
+RATE_LIMIT = 10
+BURST = 10
+# Retries of a failed request, the n-th retry waits a random time of up
+# to BACKOFF * 2 ** n seconds, at most BACKOFF_MAX
+RETRIES = 3
+BACKOFF = 0.5
+BACKOFF_MAX = 8
+# Status codes of responses that are worth another try
+RETRY_STATUS = frozenset([429, 500, 502, 503, 504])
+# Failures in a row that open the circuit breaker and seconds until it
+# lets a request through again
+BREAKER_THRESHOLD = 5
+BREAKER_TIMEOUT = 30
+
+_session = None
+_session_lock = threading.Lock()
+_limiter = None
+_breaker = None
+_sleep = time.sleep
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of sending a request while the circuit breaker is open.
+    """
+
+
+class RateLimiter:
+    """
+    Token bucket that holds up to 'burst' requests and is refilled with
+    'rate' requests per second. Thread-safe.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, burst=BURST, clock=time.monotonic,
+                 sleep=None):
+        """
+        :param float rate: requests per second, None for no limit
+        :param int burst: number of requests that may be sent at once
+        :param clock: function returning the current time in seconds
+        :param sleep: function waiting the given seconds, default is the
+         sleep of this module
+        """
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token and waits until it is due. Every caller reserves its
+        own token, so waiting threads are let through in turn.
+
+        :return: float seconds waited
+        """
+        if self.rate is None:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens
+                               + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+        if wait:
+            (self._sleep or _sleep)(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """
+    Counts failed requests in a row. At 'threshold' failures the breaker
+    opens and requests fail at once. After 'timeout' seconds a single
+    request is let through: if it succeeds the breaker closes, otherwise
+    it stays open for another 'timeout' seconds.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, timeout=BREAKER_TIMEOUT,
+                 clock=time.monotonic):
+        """
+        :param int threshold: failures in a row that open the breaker
+        :param float timeout: seconds until a request is tried again
+        :param clock: function returning the current time in seconds
+        """
+        self.threshold = threshold
+        self.timeout = timeout
+        self.failures = 0
+        self._clock = clock
+        self._opened = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        :return: 'closed', 'open' or 'half-open'
+        """
+        with self._lock:
+            if self._opened is None:
+                return 'closed'
+            if self._clock() - self._opened < self.timeout:
+                return 'open'
+            return 'half-open'
+
+    def before_request(self, url):
+        """
+        :param str url: url that should be requested
+        :raises CircuitOpenError: if the breaker is open, or half-open and
+         the trial request is on its way already
+        """
+        with self._lock:
+            if self._opened is None:
+                return
+            if self._clock() - self._opened >= self.timeout \
+                    and not self._trial:
+                self._trial = True
+                return
+        raise CircuitOpenError('too many failed requests, not requesting '
+                               + url)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self._opened = self._clock()
+            self._trial = False
+
+
+def create_session(pool_size=POOL_SIZE):
+    """
+    Creates a requests.Session with a keep-alive connection pool of the
+    given size that asks for gzip compressed responses.
+
+    :param int pool_size: number of connections kept open per host
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept': 'application/json',
+                            'Accept-Encoding': 'gzip, deflate'})
+    return session
+
+
+def get_session():
+    """
+    Returns the shared session and creates it on first use.
+
+    :return: requests.Session or the stand-in set with set_session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def set_session(session):
+    """
+    Replaces the shared session, e.g. by a local stand-in in tests.
+    Passing None makes get_session create a new default session.
+
+    :param session: object with a requests.Session compatible get method
+    :return: the session that was used before
+    """
+    global _session, _breaker
+    with _session_lock:
+        previous = _session
+        _session = session
+        # failures of the previous session say nothing about this one
+        _breaker = None
+    return previous
+
+
+def get_rate_limiter():
+    """
+    Returns the shared rate limiter and creates it on first use.
+
+    :return: RateLimiter
+    """
+    global _limiter
+    with _session_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def get_circuit_breaker():
+    """
+    Returns the circuit breaker of the shared session.
+
+    :return: CircuitBreaker
+    """
+    global _breaker
+    with _session_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+        return _breaker
+
+
+def configure(pool_size=None, timeout=None, rate_limit=None, burst=None):
+    """
+    Changes pool size, timeout and/or rate limit of the shared client. A
+    new pool size replaces the shared session by a new one.
+
+    :param int pool_size: number of connections kept open per host
+    :param timeout: seconds as number or (connect, read) tuple
+    :param float rate_limit: requests per second
+    :param int burst: number of requests that may be sent at once
+    """
+    global POOL_SIZE, TIMEOUT, RATE_LIMIT, BURST, _limiter
+    if timeout is not None:
+        TIMEOUT = timeout
+    if rate_limit is not None or burst is not None:
+        with _session_lock:
+            RATE_LIMIT = rate_limit or RATE_LIMIT
+            BURST = burst or BURST
+            _limiter = RateLimiter(RATE_LIMIT, BURST)
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+        previous = set_session(create_session(pool_size))
+        if previous is not None:
+            previous.close()
+
+
+def get(url, headers=None):
+    """
+    Sends a GET request with the shared session. Connection errors,
+    timeouts and the RETRY_STATUS codes are retried up to RETRIES times.
+
+    :param str url: url to request
+    :param dict headers: additional request headers
+    :return: requests.Response, the last one if all tries failed
+    :raises requests.RequestException: if the last try raised, e.g.
+     CircuitOpenError if the circuit breaker is open
+    """
+    breaker = get_circuit_breaker()
+    for attempt in range(RETRIES + 1):
+        breaker.before_request(url)
+        get_rate_limiter().acquire()
+        error = None
+        try:
+            response = get_session().get(url, headers=headers,
+                                         timeout=TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as exception:
+            error = exception
+        except requests.RequestException:
+            # not worth another try, but a failed trial request must open
+            # the breaker again instead of blocking it for good
+            breaker.record_failure()
+            raise
+        else:
+            if response.status_code not in RETRY_STATUS:
+                breaker.record_success()
+                return response
+        breaker.record_failure()
+        if attempt < RETRIES:
+            _sleep(backoff_delay(attempt, None if error is not None
+                                 else response.headers.get('Retry-After')))
+    if error is not None:
+        raise error
+    return response
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to wait before the given retry, a random time between zero and
+    the exponential backoff ("full jitter"), so parallel downloads that
+    failed together do not retry together.
+
+    :param int attempt: number of the failed try, starting at 0
+    :param str retry_after: Retry-After header of the response, if any
+    :return: float seconds
+    """
+    if retry_after is not None and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF * 2 ** attempt))
+
+
+def get_json(url):
+    """
+    Downloads a single url and decodes its json response.
+
+    :param str url: url of a day or season
+    :return: decoded json response
+    """
+    response = get(url)
+    response.raise_for_status()
+    return json.loads(response.content)
@@ -0,0 +1,36 @@
+"""
+This module contains the leagues the crawler knows.
+
+A league is identified by its OpenLigaDB shortcut, which is also part of
+every api url (e.g. getmatchdata/bl2/2020/3). Every league has its own
+match store, so crawling, reading or training on one league never touches
+the data of another one.
+"""
+import collections
+
+# matches_per_matchday is None for cups, their rounds get smaller
+League = collections.namedtuple('League', [
+    'shortcut', 'name', 'matchdays', 'matches_per_matchday',
+    'first_season'])
+
+DEFAULT_LEAGUE = 'bl1'
+
+LEAGUES = {
+    'bl1': League('bl1', '1. Bundesliga', 34, 9, 2004),
+    'bl2': League('bl2', '2. Bundesliga', 34, 9, 2004),
+    'bl3': League('bl3', '3. Liga', 38, 10, 2008),
+    'dfb': League('dfb', 'DFB-Pokal', 6, None, 2004),
+}
+
+
+def get_league(shortcut=DEFAULT_LEAGUE):
+    """
+    :param str shortcut: OpenLigaDB shortcut of the league, e.g. 'bl2'
+    :return: League
+    :raises ValueError: if the league is unknown
+    """
+    try:
+        return LEAGUES[shortcut]
+    except KeyError:
+        raise ValueError('unknown league ' + repr(shortcut) + ', known are '
+                         + ', '.join(sorted(LEAGUES))) from None
@@ -0,0 +1,753 @@
+"""
+This module contains the storage of all crawled matches.
+
+Matches are kept in typed binary NumPy files, one file per season, so
+reading a time range only loads the seasons it needs. Within a season
+matches are sorted by matchday, so any [matchday, season] range is one
+contiguous block of rows. Teams are saved by their IDs in the team
+dictionary of the store (teams.json). Every league has its own store (see
+get_store). Matches crawled with their openligadb
+matchID can be updated in place (upsert), so corrected results replace the
+stored ones instead of adding duplicates.
+
+For worker processes the whole store can be exported into one match array
+with the fixed layout MATCH_DTYPE. Mapped read-only into memory
+(see MatchStore.match_array), any number of processes share one copy in
+the page cache without parsing anything.
+"""
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from bl_predictor import atomic_file
+from bl_predictor import leagues
+from bl_predictor import teams
+
+COLUMNS = ['date_time', 'matchday', 'home_team', 'home_score',
+           'guest_score', 'guest_team', 'season']
+# optional columns with the openligadb matchID and the time of the last
+# change of a match, stored next to COLUMNS but not part of read results
+ID_COLUMNS = ['match_id', 'last_update']
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# store of the default league, other leagues are in sibling directories
+# like match_store_bl2
+DEFAULT_DIRECTORY = os.path.join(_PACKAGE_DIR, 'match_store')
+# matches crawled before the match store existed, migrated on first use
+LEGACY_CSV = os.path.join(_PACKAGE_DIR, 'crawled_data.csv')
+
+# small summary of the store, so questions like "what is the last stored
+# match?" need no season file
+MANIFEST = 'manifest.json'
+# team dictionary of the store
+TEAMS = 'teams.json'
+# last change date of every synced matchday, see crawler.sync_matches
+SYNC_STATE = 'sync.json'
+
+# layout of the match array, packed, 17 bytes per match. kickoff is in
+# nanoseconds since the epoch (local german time like date_time), teams
+# are IDs of the team dictionary of the store.
+MATCH_DTYPE = np.dtype([
+    ('kickoff', '<i8'),
+    ('season', '<i2'),
+    ('matchday', 'i1'),
+    ('home_team', '<i2'),
+    ('guest_team', '<i2'),
+    ('home_score', 'i1'),
+    ('guest_score', 'i1'),
+])
+
+_SEASON_FILE = re.compile(r'season_(\d{4})\.npz$')
+
+_stores = {}  # league: MatchStore
+_store_lock = threading.Lock()
+
+
+class MatchStore:
+    """
+    Season partitioned storage of finished matches.
+
+    Every season file is loaded only once. The loaded matches are kept in
+    memory until the file changes (modification time or size), so repeated
+    reads of the same seasons cost no disk access and no parsing.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, legacy_csv=LEGACY_CSV):
+        """
+        :param str directory: directory of the season files
+        :param str legacy_csv: csv file that is migrated into an empty store,
+         None to start empty
+        """
+        self.directory = directory
+        self.legacy_csv = legacy_csv
+        self.hits = 0
+        self.misses = 0
+        # season: ((modification time, size), loaded matches)
+        self._loaded = {}
+        self._lock = threading.Lock()
+        # only one thread at a time changes files
+        self._write_lock = threading.Lock()
+        self._teams = None
+
+    @property
+    def teams(self):
+        """
+        The team dictionary of the store. Every team of a stored match has
+        an ID in it.
+
+        :return: teams.TeamDictionary
+        """
+        if self._teams is None:
+            self._teams = teams.TeamDictionary.load(
+                os.path.join(self.directory, TEAMS))
+        return self._teams
+
+    def season_path(self, season):
+        """
+        :param int season: season
+        :return: str path of the file of the season
+        """
+        return os.path.join(self.directory,
+                            'season_' + str(season) + '.npz')
+
+    def seasons(self):
+        """
+        :return: list[int] sorted seasons that have stored matches
+        """
+        self._migrate()
+        return self._stored_seasons()
+
+    def last_date(self):
+        """
+        Finds the date of the last stored match in the manifest. A store
+        that did not migrate its legacy csv yet reads only the end of the
+        csv.
+
+        :return: [matchday, season] or None if the store is empty
+        """
+        if self._needs_migration():
+            return csv_last_date(self.legacy_csv)
+        return self.manifest()['last_date']
+
+    def manifest(self):
+        """
+        Reads the manifest of the store. It is rebuilt from the season files
+        if it is missing.
+
+        The manifest holds the date of the last match ('last_date'), the
+        number of matches ('rows'), a hash of all season files ('hash') and
+        rows, last matchday, file size and hash per season ('seasons').
+
+        :return: dict
+        """
+        self._migrate()
+        manifest = self._read_manifest()
+        if manifest is None:
+            with self._write_lock:
+                manifest = self._write_manifest(self._scan_seasons())
+        return manifest
+
+    def read(self, first_season=None, last_season=None):
+        """
+        Reads all matches from first_season until last_season (each
+        included). Only the files of these seasons are loaded.
+
+        :param int first_season: first season, None for the first stored
+        :param int last_season: last season, None for the last stored
+        :return: pd.DataFrame with COLUMNS
+        """
+        seasons = [season for season in self.seasons()
+                   if (first_season is None or season >= first_season)
+                   and (last_season is None or season <= last_season)]
+        if not seasons:
+            return _empty_df()
+        return pd.concat([self.read_season(season) for season in seasons],
+                         ignore_index=True)
+
+    def read_range(self, start, end):
+        """
+        Reads all matches from the start date until the end date (each
+        included). Binary searches find the seasons of the range and, in
+        the first and last season, the rows of the matchdays, so only the
+        files of these seasons are loaded.
+
+        :param list[int] start: [matchday, season]
+        :param list[int] end: [matchday, season]
+        :return: pd.DataFrame with COLUMNS
+        """
+        seasons = np.array(self.seasons(), dtype='int64')
+        first = np.searchsorted(seasons, start[1], side='left')
+        last = np.searchsorted(seasons, end[1], side='right')
+        chunks = []
+        for season in seasons[first:last].tolist():
+            matches = self.read_season(season)
+            matchdays = matches['matchday'].to_numpy()
+            begin = np.searchsorted(matchdays, start[0], side='left') \
+                if season == start[1] else 0
+            stop = np.searchsorted(matchdays, end[0], side='right') \
+                if season == end[1] else len(matchdays)
+            chunks.append(matches.iloc[begin:stop])
+        if not chunks:
+            return _empty_df()
+        return pd.concat(chunks, ignore_index=True)
+
+    def read_season(self, season):
+        """
+        Reads the matches of a single season, from memory if the file did
+        not change since it was loaded.
+
+        :param int season: season
+        :return: pd.DataFrame with COLUMNS, a copy that may be changed
+        """
+        if not os.path.exists(self.season_path(season)):
+            self._migrate()
+        stat = os.stat(self.season_path(season))
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            loaded = self._loaded.get(season)
+            if loaded is not None and loaded[0] == version:
+                self.hits += 1
+                return loaded[1].copy()
+            self.misses += 1
+        matches = self._load_season(season)
+        with self._lock:
+            self._loaded[season] = (version, matches)
+        return matches.copy()
+
+    def matchday_counts(self, season):
+        """
+        Counts the stored matches of every matchday of a season. Only the
+        matchdays of the season file are read.
+
+        :param int season: season
+        :return: dict matchday: number of matches
+        """
+        if not os.path.exists(self.season_path(season)):
+            self._migrate()
+            if not os.path.exists(self.season_path(season)):
+                return {}
+        with np.load(self.season_path(season)) as arrays:
+            counts = np.bincount(arrays['matchday'].astype('int64'))
+        return {int(day): int(count) for day, count in enumerate(counts)
+                if count}
+
+    def cache_info(self):
+        """
+        :return: dict with the number of hits, misses and loaded seasons
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'seasons': len(self._loaded)}
+
+    def clear_cache(self):
+        """
+        Forgets all loaded seasons and resets the counters.
+        """
+        with self._lock:
+            self._loaded.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def array_path(self):
+        """
+        :return: str path of the match array of the current store content
+        """
+        return os.path.join(self.directory, 'matches_'
+                            + self.manifest()['hash'][:16] + '.npy')
+
+    def export_array(self, path=None):
+        """
+        Writes all matches, sorted by season and matchday, as array with
+        MATCH_DTYPE into a .npy file.
+
+        :param str path: file to write, default is array_path()
+        :return: str path of the file
+        """
+        # season files are sorted by matchday
+        array = to_array(self.read(), self.teams)
+        path = path or self.array_path()
+        # processes that mapped an older file keep reading that one
+        with atomic_file.write(path) as tmp_file:
+            np.save(tmp_file, array)
+        return path
+
+    def match_array(self):
+        """
+        Returns all matches as read-only memory map with MATCH_DTYPE. The
+        array is exported only if the store changed since the last export,
+        older exports are removed.
+
+        :return: np.memmap, see open_array
+        """
+        path = self.array_path()
+        if not os.path.exists(path):
+            self.export_array(path)
+            for old_path in glob.glob(os.path.join(self.directory,
+                                                   'matches_*.npy')):
+                if old_path != path:
+                    _remove(old_path)
+        return open_array(path)
+
+    def _load_season(self, season):
+        """
+        Loads the file of a season.
+        """
+        with np.load(self.season_path(season)) as arrays:
+            if max(arrays['home_team'].max(initial=-1),
+                   arrays['guest_team'].max(initial=-1)) \
+                    >= len(self.teams):
+                # another process added teams, read them again
+                self._teams = None
+            home_team = self.teams.decode(arrays['home_team'])
+            guest_team = self.teams.decode(arrays['guest_team'])
+            return pd.DataFrame({
+                'date_time': arrays['date_time'].astype('datetime64[ns]'),
+                'matchday': arrays['matchday'].astype('int64'),
+                'home_team': home_team,
+                'home_score': arrays['home_score'].astype('int64'),
+                'guest_score': arrays['guest_score'].astype('int64'),
+                'guest_team': guest_team,
+                'season': np.full(len(arrays['matchday']), season,
+                                  dtype='int64'),
+            }, columns=COLUMNS)
+
+    def append(self, matches):
+        """
+        Adds finished matches to the files of their seasons.
+
+        :param matches: pd.DataFrame with COLUMNS and optionally ID_COLUMNS
+        """
+        self._migrate()
+        with self._write_lock:
+            self._write_seasons(matches)
+
+    def upsert(self, matches):
+        """
+        Adds finished matches or replaces their stored version. A stored
+        match is replaced by a match with the same openligadb matchID or,
+        if it was stored without ID, by the match of the same home and
+        guest team in the same season (every pairing is played once per
+        season).
+
+        :param matches: pd.DataFrame with COLUMNS and optionally ID_COLUMNS
+        """
+        self._migrate()
+        with self._write_lock:
+            self._write_seasons(matches, replace=True)
+
+    def sync_state(self):
+        """
+        Reads what crawler.sync_matches knows about the stored matchdays.
+
+        :return: dict season: {matchday: {'last_change', 'settled'}}, with
+         str keys
+        """
+        try:
+            with open(os.path.join(self.directory, SYNC_STATE),
+                      encoding='utf-8') as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return {}
+
+    def save_sync_state(self, season, season_state):
+        """
+        Replaces the sync state of a season.
+
+        :param int season: season
+        :param dict season_state: matchday: {'last_change', 'settled'}
+        """
+        with self._write_lock:
+            state = self.sync_state()
+            state[str(season)] = season_state
+            with atomic_file.write(os.path.join(self.directory, SYNC_STATE),
+                                   'w') as tmp_file:
+                json.dump(state, tmp_file)
+
+    def _write_seasons(self, matches, replace=False):
+        """
+        Merges the matches into their season files and updates the
+        manifest.
+
+        :param bool replace: replace stored versions of the matches
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = self._read_manifest()
+        if manifest is None:
+            season_infos = self._scan_seasons()
+        else:
+            season_infos = manifest['seasons']
+        for season, season_matches in matches.groupby('season', sort=True):
+            season = int(season)
+            if replace:
+                season_matches = _latest(season_matches)
+            if os.path.exists(self.season_path(season)):
+                stored = self.read_season_ids(season)
+                if replace:
+                    stored = stored[~_same_matches(stored, season_matches)]
+                season_matches = pd.concat([stored, season_matches],
+                                           ignore_index=True)
+            # stable, so matches of a matchday keep the order of the api
+            season_matches = season_matches.sort_values(
+                'matchday', kind='mergesort')
+            season_infos[str(season)] = self._write_season(season,
+                                                           season_matches)
+        self._write_manifest(season_infos)
+
+    def _write_season(self, season, matches):
+        """
+        Writes the file of a season atomically.
+
+        :return: dict manifest entry of the season
+        """
+        self._add_teams(np.concatenate([matches['home_team'].to_numpy(),
+                                        matches['guest_team'].to_numpy()]))
+        home_ids = self.teams.encode(matches['home_team'])
+        guest_ids = self.teams.encode(matches['guest_team'])
+        date_time = pd.to_datetime(matches['date_time']).to_numpy(
+            dtype='datetime64[ns]')
+        if 'match_id' in matches:
+            match_id = matches['match_id'].fillna(-1).to_numpy(
+                dtype='int32')
+            last_update = pd.to_datetime(matches['last_update']).to_numpy(
+                dtype='datetime64[ns]')
+        else:
+            match_id = np.full(len(matches), -1, dtype='int32')
+            last_update = np.full(len(matches), np.datetime64('NaT'),
+                                  dtype='datetime64[ns]')
+        with atomic_file.write(self.season_path(season)) as tmp_file:
+            np.savez(tmp_file,
+                     date_time=date_time.view('int64'),
+                     matchday=matches['matchday'].to_numpy(dtype='int8'),
+                     home_team=home_ids,
+                     home_score=matches['home_score'].to_numpy(dtype='int8'),
+                     guest_score=matches['guest_score'].to_numpy(
+                         dtype='int8'),
+                     guest_team=guest_ids,
+                     match_id=match_id,
+                     last_update=last_update.view('int64'))
+        return _season_info(self.season_path(season),
+                            matches['matchday'].to_numpy())
+
+    def _add_teams(self, names):
+        """
+        Gives unknown teams an ID and saves the team dictionary, if it
+        changed. Must be called with the write lock.
+
+        :param names: array-like of team names
+        """
+        known_teams = len(self.teams)
+        self.teams.encode(names, add=True)
+        if len(self.teams) != known_teams:
+            # new IDs must be saved before any file refers to them
+            self.teams.save(os.path.join(self.directory, TEAMS))
+
+    def read_season_ids(self, season):
+        """
+        Reads the matches of a season together with their ID_COLUMNS.
+        Matches stored without ID have the ID -1.
+
+        :return: pd.DataFrame with COLUMNS and ID_COLUMNS
+        """
+        matches = self.read_season(season)
+        with np.load(self.season_path(season)) as arrays:
+            matches['match_id'] = arrays['match_id'].astype('int64')
+            matches['last_update'] = arrays['last_update'].astype(
+                'datetime64[ns]')
+        return matches
+
+    def _scan_seasons(self):
+        """
+        Builds the manifest entries of all seasons from their files.
+
+        :return: dict season: manifest entry
+        """
+        season_infos = {}
+        for season in self._stored_seasons():
+            with np.load(self.season_path(season)) as arrays:
+                matchdays = arrays['matchday']
+            season_infos[str(season)] = _season_info(
+                self.season_path(season), matchdays)
+        return season_infos
+
+    def _read_manifest(self):
+        """
+        :return: dict manifest or None if there is none
+        """
+        try:
+            with open(os.path.join(self.directory, MANIFEST),
+                      encoding='utf-8') as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, season_infos):
+        """
+        Writes the manifest for the given season entries atomically.
+
+        :param dict season_infos: season: manifest entry
+        :return: dict manifest
+        """
+        seasons = sorted(season_infos, key=int)
+        content_hash = hashlib.sha1()
+        for season in seasons:
+            content_hash.update(season_infos[season]['sha1'].encode())
+        last_date = None
+        if seasons:
+            last_date = [season_infos[seasons[-1]]['last_matchday'],
+                         int(seasons[-1])]
+        manifest = {
+            'last_date': last_date,
+            'rows': sum(info['rows'] for info in season_infos.values()),
+            'hash': content_hash.hexdigest(),
+            'seasons': {season: season_infos[season] for season in seasons},
+        }
+        if not os.path.isdir(self.directory):
+            return manifest
+        with atomic_file.write(os.path.join(self.directory, MANIFEST),
+                               'w') as tmp_file:
+            json.dump(manifest, tmp_file)
+        return manifest
+
+    def _stored_seasons(self):
+        """
+        :return: list[int] sorted seasons that have a file
+        """
+        seasons = []
+        for path in glob.glob(os.path.join(self.directory, 'season_*.npz')):
+            match = _SEASON_FILE.search(path)
+            if match is not None:
+                seasons.append(int(match.group(1)))
+        return sorted(seasons)
+
+    def _migrate(self):
+        """
+        Moves the matches of the legacy csv file into an empty store. The
+        matches are upserted, so a store that another process migrates at
+        the same time still holds every match once.
+        """
+        if not self._needs_migration():
+            return
+        with self._write_lock:
+            # another thread may have migrated while we waited
+            if not self._needs_migration():
+                return
+            legacy = pd.read_csv(self.legacy_csv)
+            if not legacy.empty:
+                legacy['date_time'] = pd.to_datetime(legacy['date_time'])
+                self._write_seasons(legacy, replace=True)
+
+    def _needs_migration(self):
+        """
+        :return: bool whether the store is empty and has a legacy csv
+        """
+        return self.legacy_csv is not None \
+            and not self._stored_seasons() \
+            and os.path.exists(self.legacy_csv)
+
+
+def csv_last_date(csv_file):
+    """
+    Finds the date of the last match in a csv file with COLUMNS. Only the
+    end of the file is read, not the whole file.
+
+    :param str csv_file: path of the csv file
+    :return: [matchday, season] or None if the file has no matches
+    """
+    if not os.path.exists(csv_file):
+        return None
+    with open(csv_file, 'rb') as legacy_csv:
+        legacy_csv.seek(0, os.SEEK_END)
+        size = legacy_csv.tell()
+        # a row is far below 1kB, but the header may be the only row
+        legacy_csv.seek(max(0, size - 1024))
+        tail = legacy_csv.read().decode('utf-8', errors='ignore')
+    rows = [row for row in tail.splitlines() if row.strip()]
+    if not rows:
+        return None
+    last_row = next(csv.reader([rows[-1]]))
+    if len(last_row) != len(COLUMNS) or not last_row[1].isdigit():
+        return None
+    return [int(last_row[COLUMNS.index('matchday')]),
+            int(last_row[COLUMNS.index('season')])]
+
+
+def _latest(matches):
+    """
+    Keeps only the last version of every match.
+
+    :param matches: pd.DataFrame of a single season
+    :return: pd.DataFrame
+    """
+    duplicated = matches.duplicated(['home_team', 'guest_team'],
+                                    keep='last')
+    return matches[~duplicated]
+
+
+def _same_matches(stored, matches):
+    """
+    Marks the stored matches that are another version of one of the given
+    matches, by matchID or by their teams.
+
+    :param stored: pd.DataFrame of a season with ID_COLUMNS
+    :param matches: pd.DataFrame of the same season
+    :return: np.ndarray of bool, one per stored match
+    """
+    same = np.zeros(len(stored), dtype=bool)
+    if 'match_id' in matches:
+        ids = matches['match_id'].to_numpy()
+        same |= stored['match_id'].isin(ids[ids >= 0]).to_numpy()
+    pairs = pd.MultiIndex.from_arrays([matches['home_team'],
+                                       matches['guest_team']])
+    stored_pairs = pd.MultiIndex.from_arrays([stored['home_team'],
+                                              stored['guest_team']])
+    same |= stored_pairs.isin(pairs)
+    return same
+
+
+def _remove(path):
+    """
+    Removes a file, if it is still there and not in use.
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def to_array(matches, team_dictionary):
+    """
+    Turns matches into an array with MATCH_DTYPE.
+
+    :param matches: pd.DataFrame with COLUMNS
+    :param teams.TeamDictionary team_dictionary: IDs of the teams
+    :return: np.ndarray with MATCH_DTYPE
+    :raises ValueError: if a team has no ID in the dictionary
+    """
+    array = np.empty(len(matches), dtype=MATCH_DTYPE)
+    array['kickoff'] = pd.to_datetime(matches['date_time']).to_numpy(
+        dtype='datetime64[ns]').view('int64')
+    array['season'] = matches['season'].to_numpy()
+    array['matchday'] = matches['matchday'].to_numpy()
+    for column in ['home_team', 'guest_team']:
+        ids = team_dictionary.encode(matches[column])
+        if np.any(ids < 0):
+            raise ValueError('teams without ID: ' + ', '.join(
+                sorted(set(matches[column].to_numpy()[ids < 0]))))
+        array[column] = ids
+    array['home_score'] = matches['home_score'].to_numpy()
+    array['guest_score'] = matches['guest_score'].to_numpy()
+    return array
+
+
+def open_array(path):
+    """
+    Maps a match array written by MatchStore.export_array read-only into
+    memory. Only the pages that are used are read, and all processes that
+    map the same file share them.
+
+    :param str path: path of the .npy file
+    :return: np.memmap with MATCH_DTYPE
+    :raises ValueError: if the file holds no match array
+    """
+    array = np.load(path, mmap_mode='r')
+    if array.dtype != MATCH_DTYPE:
+        raise ValueError(path + ' is no match array')
+    return array
+
+
+def array_to_df(array, team_dictionary):
+    """
+    Turns a match array back into a DataFrame.
+
+    :param array: np.ndarray with MATCH_DTYPE
+    :param teams.TeamDictionary team_dictionary: dictionary of the team IDs
+    :return: pd.DataFrame with COLUMNS
+    """
+    return pd.DataFrame({
+        'date_time': array['kickoff'].astype('datetime64[ns]'),
+        'matchday': array['matchday'].astype('int64'),
+        'home_team': team_dictionary.decode(array['home_team']),
+        'home_score': array['home_score'].astype('int64'),
+        'guest_score': array['guest_score'].astype('int64'),
+        'guest_team': team_dictionary.decode(array['guest_team']),
+        'season': array['season'].astype('int64'),
+    }, columns=COLUMNS)
+
+
+def _season_info(path, matchdays):
+    """
+    Builds the manifest entry of a season file.
+
+    :param str path: path of the season file
+    :param matchdays: matchdays of the matches in the file
+    :return: dict
+    """
+    with open(path, 'rb') as season_file:
+        content = season_file.read()
+    return {'rows': int(len(matchdays)),
+            'last_matchday': int(matchdays[-1]) if len(matchdays) else 0,
+            'size': len(content),
+            'sha1': hashlib.sha1(content).hexdigest()}
+
+
+def _empty_df():
+    """
+    :return: empty pd.DataFrame with typed COLUMNS
+    """
+    return pd.DataFrame({
+        'date_time': np.array([], dtype='datetime64[ns]'),
+        'matchday': np.array([], dtype='int64'),
+        'home_team': np.array([], dtype='object'),
+        'home_score': np.array([], dtype='int64'),
+        'guest_score': np.array([], dtype='int64'),
+        'guest_team': np.array([], dtype='object'),
+        'season': np.array([], dtype='int64'),
+    }, columns=COLUMNS)
+
+
+def league_directory(league=leagues.DEFAULT_LEAGUE):
+    """
+    :param str league: league shortcut
+    :return: str directory of the store of the league
+    """
+    leagues.get_league(league)
+    if league == leagues.DEFAULT_LEAGUE:
+        return DEFAULT_DIRECTORY
+    # a sibling, so no store sees the files of another league
+    return DEFAULT_DIRECTORY + '_' + league
+
+
+def get_store(league=leagues.DEFAULT_LEAGUE):
+    """
+    Returns the match store of a league shared by the whole process and
+    creates it on first use. Only the default league migrates the legacy
+    csv.
+
+    :param str league: league shortcut
+    :return: MatchStore of league_directory(league)
+    """
+    with _store_lock:
+        if league not in _stores:
+            legacy_csv = LEGACY_CSV \
+                if league == leagues.DEFAULT_LEAGUE else None
+            _stores[league] = MatchStore(league_directory(league),
+                                         legacy_csv)
+        return _stores[league]
+
+
+def get_team_dictionary(league=leagues.DEFAULT_LEAGUE):
+    """
+    Returns the team dictionary of the shared match store of a league, the
+    canonical team IDs of all crawled matches of the league.
+
+    :param str league: league shortcut
+    :return: teams.TeamDictionary
+    """
+    return get_store(league).teams
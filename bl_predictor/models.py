@@ -1,12 +1,29 @@
 """
 This module contains code for different prediction models.
+
+Trained models can be saved as a compact .npz artifact and loaded again
+without training (see load_model). Predicting with a loaded model only
+needs NumPy and pandas, statsmodels and scipy are not imported.
 """
+import hashlib
+import json
 
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
-from scipy.stats import poisson
+
+from bl_predictor import atomic_file
+from bl_predictor import leagues
+from bl_predictor import match_store
+from bl_predictor import poisson_glm
+from bl_predictor import teams
+
+# columns of the outcome probabilities returned by predict_many
+OUTCOME_COLUMNS = ['home_win', 'draw', 'guest_win']
+# chance (home win, guest win, draw) the winner of BettingPoissonModel
+# must be ahead, just a guess
+SIGNIFICANCE_THRESHOLD = 0.1
+# version of the layout of saved models
+ARTIFACT_VERSION = 1
 
 
 class PoissonModel:
@@ -21,25 +38,21 @@ class PoissonModel:
     <https://dashee87.github.io/football/python/predicting-football-results-with-statistical-modelling/>`_
     """
 
-    def __init__(self, trainset_df):
+    def __init__(self, trainset_df, outcome_table=False,
+                 league=leagues.DEFAULT_LEAGUE):
         """
         Builds the poisson model and calculates a team ranking based on
         the coefficients obtained from training.
 
         :param trainset_df:
          pd.DataFrame['home_team', 'home_score', 'guest_score', 'guest_team']
+        :param bool outcome_table: calculate the outcome probabilities of
+         all pairs of teams right after training, so every prediction is a
+         lookup, see outcome_table
+        :param str league: league of the trainset, the aliases of its team
+         dictionary merge renamed clubs
         """
-        self.poisson_model = None
-        self.team_ranking_df = None
-
-        # In case of corrupt trainset_df:
-        # Catch internal errors occurring in the smf.glm function
-        # The problem is passed here but will be handled by predict_winner
-        try:
-            self._train_model(trainset_df)
-            self.team_ranking_df = self._calc_team_ranking()
-        except (ValueError, KeyError):
-            pass
+        _init_poisson(self, trainset_df, outcome_table, league)
 
     def _train_model(self, trainset):
         """
@@ -50,52 +63,11 @@ class PoissonModel:
          pd.DataFrame['home_team', 'home_score', 'guest_score', 'guest_team']
         :return: None
         """
-        # Builds two DataFrames with added column "home"
-        # where one has "home"=1 for all rows, and one with "home"=0,
-        # rename their columns according to this new configuration
-        # and concatenate them.
-        goal_model_data = pd.concat([
-            trainset[['home_team',
-                      'guest_team',
-                      'home_score']].assign(home=1).rename(
-                columns={'home_team': 'team',
-                         'guest_team': 'opponent',
-                         'home_score': 'goals'}),
-            trainset[['guest_team',
-                      'home_team',
-                      'guest_score']].assign(home=0).rename(
-                columns={'guest_team': 'team',
-                         'home_team': 'opponent',
-                         'guest_score': 'goals'})])
-
-        # train glm poisson model on "goals"
-        self.poisson_model = smf.glm(
-            formula="goals ~ home + team + opponent",
-            data=goal_model_data,
-            family=sm.families.Poisson()).fit()
-
-    def _simulate_match(self, home_team: str, guest_team: str):
-        """
-        Calculates a combined probability matrix
-        for scoring an exact number of goals for both teams.
-
-        :return: pd.DataFrame Goals probability matrix
-        """
-        home_goals_avg = self.poisson_model.predict(pd.DataFrame(
-            data={'team': home_team,
-                  'opponent': guest_team,
-                  'home': 1},
-            index=[1])).values[0]
-        away_goals_avg = self.poisson_model.predict(pd.DataFrame(
-            data={'team': guest_team,
-                  'opponent': home_team,
-                  'home': 0},
-            index=[1])).values[0]
-        max_goals = 10  # this number is just a guess by eye so far
-        team_pred = [[poisson.pmf(i, team_avg)
-                      for i in range(0, max_goals + 1)]
-                     for team_avg in [home_goals_avg, away_goals_avg]]
-        return np.outer(np.array(team_pred[0]), np.array(team_pred[1]))
+        # every match gives two rows: the goals of the home team (home=1)
+        # and of the guest team (home=0) against the other team
+        self.poisson_model = poisson_glm.fit(
+            trainset,
+            aliases=match_store.get_team_dictionary(self.league).aliases)
 
     def predict_winner(self, home_team: str, guest_team: str):
         """
@@ -110,12 +82,17 @@ class PoissonModel:
         :return: str Predicted winner and corresponding probability
         """
         try:
-            sim_match = self._simulate_match(home_team, guest_team)
-
-            # sum up lower triangle, upper triangle and diagonal probabilities
-            home_team_win_prob = np.round(np.sum(np.tril(sim_match, -1)), 5)
-            guest_team_win_prob = np.round(np.sum(np.triu(sim_match, 1)), 5)
-            draw_prob = np.round(np.sum(np.diag(sim_match)), 5)
+            if self.outcome_table is not None:
+                home_team_win_prob, draw_prob, guest_team_win_prob = \
+                    self.outcome_table[tuple(self.poisson_model.codes(
+                        [home_team, guest_team]))]
+            else:
+                home_team_win_prob, draw_prob, guest_team_win_prob = \
+                    _outcome_probabilities(
+                        self.poisson_model.expected_goals(
+                            [home_team], [guest_team], [1]),
+                        self.poisson_model.expected_goals(
+                            [guest_team], [home_team], [0]))[0]
 
             if home_team_win_prob > guest_team_win_prob and \
                     home_team_win_prob > draw_prob:
@@ -128,6 +105,42 @@ class PoissonModel:
         except AttributeError:
             return 'Prediction failed. Check training DataFrame for errors'
 
+    def predict_many(self, fixtures_df):
+        """
+        Predicts many matches at once. The expected goals of all teams are
+        looked up together and poisson_glm.outcome_probabilities turns them
+        into the outcome probabilities of all matches in one call.
+
+        :param fixtures_df: pd.DataFrame['home_team', 'guest_team']
+        :return: pd.DataFrame['home_team', 'guest_team', 'home_win', 'draw',
+         'guest_win', 'prediction'] with the index of fixtures_df.
+         prediction is the name of the predicted winner or "Draw". Matches
+         of teams that are not in the trainset have no probabilities and
+         the prediction None.
+        """
+        return _poisson_predictions(self, fixtures_df)
+
+    def save(self, path):
+        """
+        Writes the trained model into a .npz file: the coefficients, the
+        teams, the outcome table (if there is one) and the train_info.
+
+        :param str path: path of the file
+        :raises ValueError: if the training failed
+        """
+        _save_poisson(self, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a model written by save.
+
+        :param str path: path of the file
+        :return: the model, ready to predict
+        :raises ValueError: if the file holds another kind of model
+        """
+        return _load_poisson(cls, path)
+
     def _calc_team_ranking(self):
         """
         Uses the the trained coefficients of the model to rank all teams
@@ -140,9 +153,8 @@ class PoissonModel:
 
         :return: pd.DataFrame['home_ranking', 'guest_ranking']
         """
-        # extract model summary as DataFrame and sort by coef value
-        summary_df = pd.read_html(self.poisson_model.summary().tables[1].
-                                  as_html(), header=0, index_col=0)[0]
+        # coefficients rounded like in a model summary, sorted by value
+        summary_df = self.poisson_model.params.round(4).to_frame('coef')
         summary_df = summary_df.sort_values('coef', ascending=False)
 
         # export hometeam and guestteam entries as DataFrames
@@ -188,25 +200,21 @@ class BettingPoissonModel:
     <https://dashee87.github.io/football/python/predicting-football-results-with-statistical-modelling/>`_
     """
 
-    def __init__(self, trainset_df):
+    def __init__(self, trainset_df, outcome_table=False,
+                 league=leagues.DEFAULT_LEAGUE):
         """
         Builds the poisson model and calculates a team ranking based on
         the coefficients obtained from training.
 
         :param trainset_df:
          pd.DataFrame['home_team', 'home_score', 'guest_score', 'guest_team']
+        :param bool outcome_table: calculate the outcome probabilities of
+         all pairs of teams right after training, so every prediction is a
+         lookup, see outcome_table
+        :param str league: league of the trainset, the aliases of its team
+         dictionary merge renamed clubs
         """
-        self.poisson_model = None
-        self.team_ranking_df = None
-
-        # In case of corrupt trainset_df:
-        # Catch internal errors occurring in the smf.glm function
-        # The problem is passed here but will be handled by predict_winner
-        try:
-            self._train_model(trainset_df)
-            self.team_ranking_df = self._calc_team_ranking()
-        except (ValueError, KeyError):
-            pass
+        _init_poisson(self, trainset_df, outcome_table, league)
 
     def _train_model(self, trainset):
         """
@@ -217,52 +225,11 @@ class BettingPoissonModel:
          pd.DataFrame['home_team', 'home_score', 'guest_score', 'guest_team']
         :return: None
         """
-        # Builds two DataFrames with added column "home"
-        # where one has "home"=1 for all rows, and one with "home"=0,
-        # rename their columns according to this new configuration
-        # and concatenate them.
-        goal_model_data = pd.concat([
-            trainset[['home_team',
-                      'guest_team',
-                      'home_score']].assign(home=1).rename(
-                columns={'home_team': 'team',
-                         'guest_team': 'opponent',
-                         'home_score': 'goals'}),
-            trainset[['guest_team',
-                      'home_team',
-                      'guest_score']].assign(home=0).rename(
-                columns={'guest_team': 'team',
-                         'home_team': 'opponent',
-                         'guest_score': 'goals'})])
-
-        # train glm poisson model on "goals"
-        self.poisson_model = smf.glm(
-            formula="goals ~ home + team + opponent",
-            data=goal_model_data,
-            family=sm.families.Poisson()).fit()
-
-    def _simulate_match(self, home_team: str, guest_team: str):
-        """
-        Calculates a combined probability matrix
-        for scoring an exact number of goals for both teams.
-
-        :return: pd.DataFrame Goals probability matrix
-        """
-        home_goals_avg = self.poisson_model.predict(pd.DataFrame(
-            data={'team': home_team,
-                  'opponent': guest_team,
-                  'home': 1},
-            index=[1])).values[0]
-        away_goals_avg = self.poisson_model.predict(pd.DataFrame(
-            data={'team': guest_team,
-                  'opponent': home_team,
-                  'home': 0},
-            index=[1])).values[0]
-        max_goals = 10  # this number is just a guess by eye so far
-        team_pred = [[poisson.pmf(i, team_avg)
-                      for i in range(0, max_goals + 1)]
-                     for team_avg in [home_goals_avg, away_goals_avg]]
-        return np.outer(np.array(team_pred[0]), np.array(team_pred[1]))
+        # every match gives two rows: the goals of the home team (home=1)
+        # and of the guest team (home=0) against the other team
+        self.poisson_model = poisson_glm.fit(
+            trainset,
+            aliases=match_store.get_team_dictionary(self.league).aliases)
 
     def predict_winner(self, home_team: str, guest_team: str):
         """
@@ -277,15 +244,19 @@ class BettingPoissonModel:
         :return: str Predicted winner and corresponding probability
         """
         try:
-            sim_match = self._simulate_match(home_team, guest_team)
-
-            # sum up lower triangle, upper triangle and diagonal probabilities
-            home_team_win_prob = np.round(np.sum(np.tril(sim_match, -1)), 5)
-            guest_team_win_prob = np.round(np.sum(np.triu(sim_match, 1)), 5)
-            draw_prob = np.round(np.sum(np.diag(sim_match)), 5)
-
-            # Threshold is just a guess
-            significance_threshold = 0.1  # chance (home win, guest win, draw)
+            if self.outcome_table is not None:
+                home_team_win_prob, draw_prob, guest_team_win_prob = \
+                    self.outcome_table[tuple(self.poisson_model.codes(
+                        [home_team, guest_team]))]
+            else:
+                home_team_win_prob, draw_prob, guest_team_win_prob = \
+                    _outcome_probabilities(
+                        self.poisson_model.expected_goals(
+                            [home_team], [guest_team], [1]),
+                        self.poisson_model.expected_goals(
+                            [guest_team], [home_team], [0]))[0]
+
+            significance_threshold = SIGNIFICANCE_THRESHOLD
             if home_team_win_prob > guest_team_win_prob and \
                     home_team_win_prob > draw_prob and \
                     (home_team_win_prob - guest_team_win_prob) \
@@ -301,6 +272,42 @@ class BettingPoissonModel:
         except AttributeError:
             return 'Prediction failed. Check training DataFrame for errors'
 
+    def predict_many(self, fixtures_df):
+        """
+        Predicts many matches at once. The expected goals of all teams are
+        looked up together and poisson_glm.outcome_probabilities turns them
+        into the outcome probabilities of all matches in one call.
+
+        :param fixtures_df: pd.DataFrame['home_team', 'guest_team']
+        :return: pd.DataFrame['home_team', 'guest_team', 'home_win', 'draw',
+         'guest_win', 'prediction'] with the index of fixtures_df.
+         prediction is the name of the predicted winner or "Draw". Matches
+         of teams that are not in the trainset have no probabilities and
+         the prediction None.
+        """
+        return _poisson_predictions(self, fixtures_df, SIGNIFICANCE_THRESHOLD)
+
+    def save(self, path):
+        """
+        Writes the trained model into a .npz file: the coefficients, the
+        teams, the outcome table (if there is one) and the train_info.
+
+        :param str path: path of the file
+        :raises ValueError: if the training failed
+        """
+        _save_poisson(self, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a model written by save.
+
+        :param str path: path of the file
+        :return: the model, ready to predict
+        :raises ValueError: if the file holds another kind of model
+        """
+        return _load_poisson(cls, path)
+
     def _calc_team_ranking(self):
         """
         Uses the the trained coefficients of the model to rank all teams
@@ -313,9 +320,8 @@ class BettingPoissonModel:
 
         :return: pd.DataFrame['home_ranking', 'guest_ranking']
         """
-        # extract model summary as DataFrame and sort by coef value
-        summary_df = pd.read_html(self.poisson_model.summary().tables[1].
-                                  as_html(), header=0, index_col=0)[0]
+        # coefficients rounded like in a model summary, sorted by value
+        summary_df = self.poisson_model.params.round(4).to_frame('coef')
         summary_df = summary_df.sort_values('coef', ascending=False)
 
         # export hometeam and guestteam entries as DataFrames
@@ -351,15 +357,44 @@ class FrequencyModel:
     based on the relative frequency of the respective result.
     """
 
-    def __init__(self, trainset_df):
+    def __init__(self, trainset_df, league=leagues.DEFAULT_LEAGUE):
         """
         Builds the frequency model.
 
         :param trainset_df:
          pd.DataFrame['home_team', 'home_score', 'guest_score', 'guest_team']
+        :param str league: league of the trainset, its team dictionary
+         gives the team IDs
         """
         self.all_matches_df = trainset_df
+        self.league = league
+        # size, time range and hash of the trainset
+        self.train_info = _train_info(trainset_df)
         self.matchups_df = None
+        self.teams = None
+        # int team IDs and scores of all matches, built on first use
+        self._home_ids = None
+        self._guest_ids = None
+        self._home_scores = None
+        self._guest_scores = None
+        self._matchup_masks = None
+
+    def _encode_trainset(self):
+        """
+        Looks up the IDs of all teams in the team dictionary of the league
+        (teams it does not know get new IDs in a copy) and keeps the teams
+        and scores of all matches as arrays.
+        """
+        if self._home_ids is not None:
+            return
+        home_teams = self.all_matches_df['home_team']
+        guest_teams = self.all_matches_df['guest_team']
+        self._home_scores = self.all_matches_df['home_score'].to_numpy()
+        self._guest_scores = self.all_matches_df['guest_score'].to_numpy()
+        self.teams = match_store.get_team_dictionary(self.league).extended(
+            np.concatenate([home_teams.to_numpy(), guest_teams.to_numpy()]))
+        self._home_ids = self.teams.encode(home_teams)
+        self._guest_ids = self.teams.encode(guest_teams)
 
     def _matchups(self, home_team, guest_team):
         """
@@ -368,33 +403,141 @@ class FrequencyModel:
 
         :return: pd.DataFrame All matches between given teams
         """
-        matchups_frame = \
-            self.all_matches_df[
-                (self.all_matches_df['home_team'] == home_team)
-                & (self.all_matches_df['guest_team'] == guest_team)]
+        self._encode_trainset()
+        home_id = self.teams.id_of(home_team)
+        guest_id = self.teams.id_of(guest_team)
+        self._matchup_masks = (
+            (self._home_ids == home_id) & (self._guest_ids == guest_id),
+            (self._home_ids == guest_id) & (self._guest_ids == home_id))
+        matchups_frame = self.all_matches_df[self._matchup_masks[0]]
         matchups_frame = matchups_frame.append(
-            self.all_matches_df[
-                (self.all_matches_df['home_team'] == guest_team)
-                & (self.all_matches_df['guest_team'] == home_team)])
+            self.all_matches_df[self._matchup_masks[1]])
         self.matchups_df = matchups_frame
         return matchups_frame
 
     def _wins(self, team):
         """
-        Builds a DataFrame of only rows where
-        the given team won the match and returns it's length
+        Counts the matches of the last _matchups call
+        the given team won
 
         :return: int Number of matches the given team wins
         """
-        wins_frame = \
-            self.matchups_df[(self.matchups_df['home_team'] == team)
-                             & (self.matchups_df['home_score']
-                                > self.matchups_df['guest_score'])]
-        wins_frame = wins_frame.append(
-            self.matchups_df[(self.matchups_df['guest_team'] == team)
-                             & (self.matchups_df['guest_score']
-                                > self.matchups_df['home_score'])])
-        return len(wins_frame.index)
+        team_id = self.teams.id_of(team)
+        home_wins = (self._home_ids == team_id) \
+            & (self._home_scores > self._guest_scores)
+        guest_wins = (self._guest_ids == team_id) \
+            & (self._guest_scores > self._home_scores)
+        return sum(int(np.count_nonzero(mask & home_wins))
+                   + int(np.count_nonzero(mask & guest_wins))
+                   for mask in self._matchup_masks)
+
+    def predict_many(self, fixtures_df):
+        """
+        Predicts many matches at once from the relative frequencies of
+        their results. The matches of every pairing are counted once for
+        all fixtures.
+
+        :param fixtures_df: pd.DataFrame['home_team', 'guest_team']
+        :return: pd.DataFrame['home_team', 'guest_team', 'home_win', 'draw',
+         'guest_win', 'prediction'] with the index of fixtures_df.
+         prediction is the name of the predicted winner or "Draw". Teams
+         that never played each other have no probabilities and the
+         prediction None.
+        """
+        probabilities = np.full((len(fixtures_df), 3), np.nan)
+        try:
+            self._encode_trainset()
+        except KeyError:
+            return _predictions_frame(fixtures_df, probabilities)
+        team_count = len(self.teams)
+        # int16 IDs would overflow in the pair keys of many teams
+        trained_home = self._home_ids.astype('int64')
+        trained_guest = self._guest_ids.astype('int64')
+        # every pairing once, no matter who played at home
+        pairs = np.minimum(trained_home, trained_guest) * team_count \
+            + np.maximum(trained_home, trained_guest)
+        pair_keys, pair_index = np.unique(pairs, return_inverse=True)
+        winners = np.where(self._home_scores > self._guest_scores,
+                           trained_home,
+                           np.where(self._guest_scores > self._home_scores,
+                                    trained_guest, -1))
+        matches = np.bincount(pair_index, minlength=len(pair_keys))
+        lower_wins = np.bincount(
+            pair_index, weights=winners == np.minimum(trained_home,
+                                                      trained_guest),
+            minlength=len(pair_keys))
+        upper_wins = matches - lower_wins - np.bincount(
+            pair_index, weights=winners == -1, minlength=len(pair_keys))
+
+        home_ids = self.teams.encode(fixtures_df['home_team']).astype('int64')
+        guest_ids = self.teams.encode(fixtures_df['guest_team']).astype(
+            'int64')
+        fixture_pairs = np.minimum(home_ids, guest_ids) * team_count \
+            + np.maximum(home_ids, guest_ids)
+        position = np.minimum(np.searchsorted(pair_keys, fixture_pairs),
+                              max(len(pair_keys) - 1, 0))
+        played = (home_ids >= 0) & (guest_ids >= 0) & (len(pair_keys) > 0)
+        played[played] = pair_keys[position[played]] \
+            == fixture_pairs[played]
+        position = position[played]
+        home_is_lower = home_ids[played] <= guest_ids[played]
+        home_wins = np.where(home_is_lower, lower_wins[position],
+                             upper_wins[position])
+        guest_wins = np.where(home_is_lower, upper_wins[position],
+                              lower_wins[position])
+        probabilities[played, 0] = home_wins / matches[position]
+        probabilities[played, 2] = guest_wins / matches[position]
+        probabilities[played, 1] = 1 - (probabilities[played, 0]
+                                        + probabilities[played, 2])
+        return _predictions_frame(fixtures_df, probabilities)
+
+    def save(self, path):
+        """
+        Writes the teams and scores of all matches of the trainset into a
+        .npz file.
+
+        :param str path: path of the file
+        :raises ValueError: if the trainset misses a column
+        """
+        try:
+            self._encode_trainset()
+        except KeyError as error:
+            raise ValueError('the trainset has no column '
+                             + str(error)) from None
+        _save_artifact(path, self, {
+            'teams': np.array(self.teams.names, dtype='str'),
+            'home_ids': self._home_ids,
+            'guest_ids': self._guest_ids,
+            'home_scores': self._home_scores,
+            'guest_scores': self._guest_scores,
+        }, {'league': self.league,
+            'aliases': self.teams.aliases})
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a model written by save.
+
+        :param str path: path of the file
+        :return: FrequencyModel, ready to predict
+        :raises ValueError: if the file holds another kind of model
+        """
+        arrays, metadata = _load_artifact(path, cls)
+        team_dictionary = teams.TeamDictionary(arrays['teams'].tolist(),
+                                               metadata['aliases'])
+        model = cls(pd.DataFrame({
+            'home_team': team_dictionary.decode(arrays['home_ids']),
+            'home_score': arrays['home_scores'],
+            'guest_score': arrays['guest_scores'],
+            'guest_team': team_dictionary.decode(arrays['guest_ids']),
+        }), metadata['league'])
+        model.train_info = metadata['train_info']
+        model.teams = team_dictionary
+        model._home_ids = arrays['home_ids']
+        model._guest_ids = arrays['guest_ids']
+        model._home_scores = arrays['home_scores']
+        model._guest_scores = arrays['guest_scores']
+        return model
 
     def predict_winner(self, home_team, guest_team):
         """
@@ -425,3 +568,283 @@ class FrequencyModel:
         except KeyError:
             # prevents other modules from failing by casting no prediction/draw
             return "Prediction failed. Check training DataFrame for errors"
+
+
+def _init_poisson(model, trainset_df, outcome_table, league):
+    """
+    Trains PoissonModel or BettingPoissonModel and calculates the team
+    ranking and, if asked for, the outcome table.
+
+    :param model: PoissonModel or BettingPoissonModel
+    :param trainset_df:
+     pd.DataFrame['home_team', 'home_score', 'guest_score', 'guest_team']
+    :param bool outcome_table: calculate the outcome table
+    :param str league: league of the trainset
+    """
+    model.league = league
+    model.poisson_model = None
+    model.team_ranking_df = None
+    # home win, draw and guest win probability of every pair of teams,
+    # indexed by the team codes of poisson_model
+    model.outcome_table = None
+    # size, time range and hash of the trainset
+    model.train_info = _train_info(trainset_df)
+
+    # In case of corrupt trainset_df:
+    # Catch errors occurring in poisson_glm.fit
+    # The problem is passed here but will be handled by predict_winner
+    try:
+        model._train_model(trainset_df)
+        model.team_ranking_df = model._calc_team_ranking()
+        if outcome_table:
+            model.outcome_table = _outcome_table(model.poisson_model)
+    except (ValueError, KeyError):
+        pass
+
+
+def _poisson_predictions(model, fixtures_df, threshold=0.0):
+    """
+    predict_many of PoissonModel and BettingPoissonModel.
+
+    :param model: PoissonModel or BettingPoissonModel
+    :param fixtures_df: pd.DataFrame['home_team', 'guest_team']
+    :param float threshold: lead the winner must have over the other team
+    :return: pd.DataFrame of predict_many
+    """
+    return _predictions_frame(
+        fixtures_df, _poisson_outcomes(model.poisson_model, fixtures_df,
+                                       model.outcome_table),
+        threshold)
+
+
+def _save_poisson(model, path):
+    """
+    save of PoissonModel and BettingPoissonModel.
+
+    :param model: PoissonModel or BettingPoissonModel
+    :param str path: path of the file
+    :raises ValueError: if the training failed
+    """
+    if model.poisson_model is None:
+        raise ValueError('the model is not trained')
+    arrays = {'params': model.poisson_model.params.to_numpy(),
+              'param_names': np.array(model.poisson_model.params.index,
+                                      dtype='str'),
+              'teams': np.array(model.poisson_model.teams, dtype='str')}
+    if model.outcome_table is not None:
+        arrays['outcome_table'] = model.outcome_table
+    _save_artifact(path, model, arrays, {
+        'converged': bool(model.poisson_model.converged),
+        'iterations': int(model.poisson_model.iterations),
+        'league': model.league,
+        'aliases': model.poisson_model.aliases})
+
+
+def _load_poisson(cls, path):
+    """
+    load of PoissonModel and BettingPoissonModel.
+
+    :param cls: PoissonModel or BettingPoissonModel
+    :param str path: path of the file
+    :return: the model, ready to predict
+    :raises ValueError: if the file holds another kind of model
+    """
+    arrays, metadata = _load_artifact(path, cls)
+    model = cls.__new__(cls)
+    model.train_info = metadata['train_info']
+    model.league = metadata['league']
+    model.poisson_model = poisson_glm.PoissonGoalModel(
+        arrays['teams'].tolist(),
+        pd.Series(arrays['params'], index=arrays['param_names'].tolist()),
+        metadata['converged'], metadata['iterations'], metadata['aliases'])
+    model.outcome_table = arrays.get('outcome_table')
+    model.team_ranking_df = model._calc_team_ranking()
+    return model
+
+
+def _poisson_outcomes(poisson_model, fixtures_df, outcome_table=None):
+    """
+    Calculates the home win, draw and guest win probabilities of many
+    matches with one lookup of all expected goals, or of all probabilities
+    if there is an outcome table.
+
+    :param poisson_glm.PoissonGoalModel poisson_model: trained model, None
+     if the training failed
+    :param fixtures_df: pd.DataFrame['home_team', 'guest_team']
+    :param np.ndarray outcome_table: table of _outcome_table, if any
+    :return: np.ndarray of shape (matches, 3), NaN for matches that cannot
+     be predicted
+    """
+    probabilities = np.full((len(fixtures_df), 3), np.nan)
+    if poisson_model is None:
+        return probabilities
+    home_teams = poisson_model.canonical(fixtures_df['home_team'])
+    guest_teams = poisson_model.canonical(fixtures_df['guest_team'])
+    known = np.isin(home_teams, poisson_model.teams) \
+        & np.isin(guest_teams, poisson_model.teams)
+    if outcome_table is not None:
+        probabilities[known] = outcome_table[
+            poisson_model.codes(home_teams[known]),
+            poisson_model.codes(guest_teams[known])]
+        return probabilities
+    home_goals = poisson_model.expected_goals(
+        home_teams[known], guest_teams[known], np.ones(known.sum()))
+    guest_goals = poisson_model.expected_goals(
+        guest_teams[known], home_teams[known], np.zeros(known.sum()))
+    probabilities[known] = _outcome_probabilities(home_goals, guest_goals)
+    return probabilities
+
+
+def _outcome_table(poisson_model):
+    """
+    Calculates the outcome probabilities of every pair of teams in one
+    array operation.
+
+    :param poisson_glm.PoissonGoalModel poisson_model: trained model
+    :return: np.ndarray of shape (teams, teams, 3), [home, guest] holds the
+     home win, draw and guest win probability. Indexes are the team codes
+     of poisson_model.
+    """
+    teams = np.asarray(poisson_model.teams, dtype='object')
+    home_teams = np.repeat(teams, len(teams))
+    guest_teams = np.tile(teams, len(teams))
+    home_goals = poisson_model.expected_goals(
+        home_teams, guest_teams, np.ones(len(home_teams)))
+    guest_goals = poisson_model.expected_goals(
+        guest_teams, home_teams, np.zeros(len(home_teams)))
+    return _outcome_probabilities(home_goals, guest_goals).reshape(
+        len(teams), len(teams), 3)
+
+
+def _outcome_probabilities(home_goals, guest_goals):
+    """
+    :param np.ndarray home_goals: expected goals of the home teams
+    :param np.ndarray guest_goals: expected goals of the guest teams
+    :return: np.ndarray of shape (matches, 3) with the home win, draw and
+     guest win probabilities, rounded to five decimals
+    """
+    return np.round(poisson_glm.outcome_probabilities(home_goals,
+                                                      guest_goals), 5)
+
+
+def _predictions_frame(fixtures_df, probabilities, threshold=0.0):
+    """
+    Decides the winner of every match like predict_winner does: the home
+    or guest team, if its win is more likely than the other outcomes (and
+    ahead of the other team by more than threshold), otherwise "Draw".
+
+    :param fixtures_df: pd.DataFrame['home_team', 'guest_team']
+    :param probabilities: np.ndarray of shape (matches, 3) with the home
+     win, draw and guest win probabilities
+    :param float threshold: lead the winner must have over the other team
+    :return: pd.DataFrame of predict_many
+    """
+    home_win, draw, guest_win = probabilities.T
+    with np.errstate(invalid='ignore'):
+        home_wins = (home_win > guest_win) & (home_win > draw) \
+            & (home_win - guest_win > threshold)
+        guest_wins = (guest_win > home_win) & (guest_win > draw) \
+            & (guest_win - home_win > threshold)
+    prediction = np.where(home_wins, fixtures_df['home_team'].to_numpy(),
+                          np.where(guest_wins,
+                                   fixtures_df['guest_team'].to_numpy(),
+                                   'Draw')).astype('object')
+    prediction[np.isnan(home_win)] = None
+    predictions = pd.DataFrame({
+        'home_team': fixtures_df['home_team'].to_numpy(),
+        'guest_team': fixtures_df['guest_team'].to_numpy(),
+    }, index=fixtures_df.index)
+    for column, values in zip(OUTCOME_COLUMNS, probabilities.T):
+        predictions[column] = values
+    predictions['prediction'] = prediction
+    return predictions
+
+
+def load_model(path):
+    """
+    Reads a model written by the save method of any model.
+
+    :param str path: path of the file
+    :return: PoissonModel, BettingPoissonModel or FrequencyModel
+    :raises ValueError: if the file holds no model
+    """
+    with np.load(path, allow_pickle=False) as artifact:
+        metadata = _artifact_metadata(artifact, path)
+    model_class = {model_class.__name__: model_class for model_class in
+                   [PoissonModel, BettingPoissonModel, FrequencyModel]}.get(
+        metadata['model'])
+    if model_class is None:
+        raise ValueError(path + ' holds an unknown model '
+                         + repr(metadata['model']))
+    return model_class.load(path)
+
+
+def _train_info(trainset_df):
+    """
+    Describes a trainset, so a saved model tells what it was trained on.
+
+    :param trainset_df: pd.DataFrame of matches
+    :return: dict with the number of 'matches', the 'first_date' and
+     'last_date' ([matchday, season], None without these columns) and a
+     sha1 'data_hash' of the matches
+    """
+    columns = [column for column in match_store.COLUMNS
+               if column in trainset_df]
+    content_hash = hashlib.sha1()
+    content_hash.update(json.dumps(columns).encode('utf-8'))
+    content_hash.update(pd.util.hash_pandas_object(
+        trainset_df[columns], index=False).to_numpy().tobytes())
+    info = {'matches': len(trainset_df), 'first_date': None,
+            'last_date': None, 'data_hash': content_hash.hexdigest()}
+    if len(trainset_df) and 'season' in trainset_df \
+            and 'matchday' in trainset_df:
+        dates = trainset_df[['season', 'matchday']].astype('int64')
+        first = dates.sort_values(['season', 'matchday']).iloc[0]
+        last = dates.sort_values(['season', 'matchday']).iloc[-1]
+        info['first_date'] = [int(first['matchday']), int(first['season'])]
+        info['last_date'] = [int(last['matchday']), int(last['season'])]
+    return info
+
+
+def _save_artifact(path, model, arrays, metadata):
+    """
+    Writes the arrays of a model and its metadata as json into a .npz file
+    atomically.
+    """
+    metadata = dict(metadata, model=type(model).__name__,
+                    version=ARTIFACT_VERSION, train_info=model.train_info)
+    with atomic_file.write(path) as tmp_file:
+        np.savez(tmp_file, metadata=np.array(json.dumps(metadata)),
+                 **arrays)
+
+
+def _load_artifact(path, model_class):
+    """
+    Reads a .npz file written by _save_artifact.
+
+    :return: tuple dict of the arrays, dict metadata
+    :raises ValueError: if the file holds no model of model_class
+    """
+    with np.load(path, allow_pickle=False) as artifact:
+        metadata = _artifact_metadata(artifact, path)
+        arrays = {name: artifact[name] for name in artifact.files
+                  if name != 'metadata'}
+    if metadata['model'] != model_class.__name__:
+        raise ValueError(path + ' holds a ' + metadata['model']
+                         + ', not a ' + model_class.__name__)
+    return arrays, metadata
+
+
+def _artifact_metadata(artifact, path):
+    """
+    :return: dict metadata of an opened .npz file
+    :raises ValueError: if the file holds no model of a known version
+    """
+    if 'metadata' not in artifact.files:
+        raise ValueError(path + ' holds no model')
+    metadata = json.loads(str(artifact['metadata']))
+    if metadata.get('version') != ARTIFACT_VERSION:
+        raise ValueError(path + ' holds a model of version '
+                         + str(metadata.get('version')) + ', expected '
+                         + str(ARTIFACT_VERSION))
+    return metadata
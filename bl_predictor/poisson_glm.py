@@ -0,0 +1,294 @@
+"""
+This module contains the Poisson regression of the goals of a team on the
+playing teams, the model behind PoissonModel and BettingPoissonModel.
+
+It fits the same model as statsmodels with
+``smf.glm('goals ~ home + team + opponent', family=Poisson())``, but
+builds the design matrix directly as a sparse matrix from integer team
+codes and solves the likelihood with iteratively reweighted least squares
+(IRLS), without formula parsing and without a dense one-hot matrix. Every
+iteration only solves a system of two parameters per team, so the fit
+scales with the number of matches, not with matches times teams.
+The parameters are named and ordered like the ones of statsmodels.
+"""
+import numpy as np
+import pandas as pd
+
+# the defaults of statsmodels GLM.fit
+MAX_ITER = 100
+TOLERANCE = 1e-8
+# default bound of the error of outcome_probabilities
+OUTCOME_TOLERANCE = 1e-10
+
+
+class PoissonGoalModel:
+    """
+    A fitted Poisson regression
+    log(goals) = Intercept + team + opponent + home.
+
+    Teams are treatment coded like patsy does it: the first team in sorted
+    order is the reference and has no parameters. Old names of renamed
+    clubs (aliases) are turned into their current name first.
+    """
+
+    def __init__(self, teams, params, converged=True, iterations=0,
+                 aliases=None):
+        """
+        :param teams: sorted team names, the position is the team code
+        :param params: pd.Series of the parameters, named like statsmodels
+        :param bool converged: whether IRLS converged
+        :param int iterations: number of IRLS iterations
+        :param dict aliases: old name: current name, see teams.ALIASES
+        """
+        self.teams = list(teams)
+        self.params = params
+        self.converged = converged
+        self.iterations = iterations
+        self.aliases = dict(aliases or {})
+        self._codes = {team: code for code, team in enumerate(self.teams)}
+        values = params.to_numpy()
+        count = len(self.teams)
+        self._intercept = values[0]
+        # the reference team has a parameter of 0
+        self._team_params = np.concatenate([[0.0], values[1:count]])
+        self._opponent_params = np.concatenate(
+            [[0.0], values[count:2 * count - 1]])
+        self._home_param = values[-1]
+
+    def canonical(self, teams):
+        """
+        :param teams: array-like of team names or aliases
+        :return: np.ndarray of the current team names
+        """
+        return _canonical(teams, self.aliases)
+
+    def codes(self, teams):
+        """
+        :param teams: array-like of team names or aliases
+        :return: np.ndarray of team codes
+        :raises ValueError: if a team was not in the trainset
+        """
+        try:
+            return np.array([self._codes[team]
+                             for team in self.canonical(teams)],
+                            dtype='int64')
+        except KeyError as error:
+            raise ValueError('team ' + repr(error.args[0])
+                             + ' is not in the trainset') from None
+
+    def expected_goals(self, teams, opponents, home):
+        """
+        Calculates the expected goals of teams against opponents.
+
+        :param teams: array-like of team names
+        :param opponents: array-like of team names
+        :param home: array-like, 1 if the team plays at home, otherwise 0
+        :return: np.ndarray of expected goals
+        """
+        return np.exp(self._intercept
+                      + self._team_params[self.codes(teams)]
+                      + self._opponent_params[self.codes(opponents)]
+                      + self._home_param * np.asarray(home, dtype='float'))
+
+    def predict(self, exog):
+        """
+        Same as the predict of a fitted statsmodels formula model.
+
+        :param exog: pd.DataFrame['team', 'opponent', 'home']
+        :return: pd.Series of expected goals
+        """
+        goals = self.expected_goals(exog['team'], exog['opponent'],
+                                    exog['home'])
+        return pd.Series(goals, index=exog.index)
+
+
+def fit(trainset, max_iter=MAX_ITER, tol=TOLERANCE, aliases=None):
+    """
+    Fits the goals of every team in every match. Each match gives one
+    observation for the home team (home=1) and one for the guest team
+    (home=0).
+
+    :param trainset:
+     pd.DataFrame['home_team', 'home_score', 'guest_score', 'guest_team']
+    :param int max_iter: maximum number of IRLS iterations
+    :param float tol: change of the deviance at which IRLS stops
+    :param dict aliases: old name: current name of renamed clubs, matches
+     under both names count for the same team
+    :return: PoissonGoalModel
+    :raises ValueError: if the trainset is empty or has negative or missing
+     scores
+    :raises KeyError: if a column is missing
+    """
+    home_teams = _canonical(trainset['home_team'], aliases)
+    guest_teams = _canonical(trainset['guest_team'], aliases)
+    goals = np.concatenate([trainset['home_score'].to_numpy(dtype='float'),
+                            trainset['guest_score'].to_numpy(dtype='float')])
+    if len(goals) == 0:
+        raise ValueError('the trainset has no matches')
+    if not np.all(goals >= 0):
+        raise ValueError('goals must be non-negative numbers')
+
+    teams, codes = np.unique(np.concatenate([home_teams, guest_teams]),
+                             return_inverse=True)
+    team_codes = codes
+    opponent_codes = np.concatenate([codes[len(home_teams):],
+                                     codes[:len(home_teams)]])
+    home = np.repeat([1.0, 0.0], len(home_teams))
+    design = _design_matrix(team_codes, opponent_codes, home, len(teams))
+    params, converged, iterations = _irls(design, goals, max_iter, tol)
+
+    names = ['Intercept'] \
+        + ['team[T.' + str(team) + ']' for team in teams[1:]] \
+        + ['opponent[T.' + str(team) + ']' for team in teams[1:]] \
+        + ['home']
+    return PoissonGoalModel(teams, pd.Series(params, index=names),
+                            converged, iterations, aliases)
+
+
+def _canonical(teams, aliases):
+    """
+    :param teams: array-like of team names
+    :param dict aliases: old name: current name, may be None
+    :return: np.ndarray of the current names
+    """
+    teams = np.asarray(teams, dtype='object')
+    if not aliases:
+        return teams
+    return np.array([aliases.get(team, team) for team in teams],
+                    dtype='object')
+
+
+def _design_matrix(team_codes, opponent_codes, home, team_count):
+    """
+    Builds the treatment coded design matrix
+    [Intercept, team[T.x]..., opponent[T.x]..., home].
+
+    :return: scipy.sparse.csr_matrix with at most four entries per row
+    """
+    # only needed for training, loaded models predict without scipy
+    from scipy import sparse
+
+    rows = np.arange(len(team_codes))
+    team_rows = team_codes > 0
+    opponent_rows = opponent_codes > 0
+    home_rows = home != 0
+    row_index = np.concatenate([rows, rows[team_rows], rows[opponent_rows],
+                                rows[home_rows]])
+    column_index = np.concatenate([
+        np.zeros(len(rows), dtype='int64'),
+        team_codes[team_rows],
+        team_count - 1 + opponent_codes[opponent_rows],
+        np.full(np.count_nonzero(home_rows), 2 * team_count - 1)])
+    values = np.concatenate([np.ones(len(rows) + np.count_nonzero(team_rows)
+                                     + np.count_nonzero(opponent_rows)),
+                             home[home_rows]])
+    return sparse.csr_matrix((values, (row_index, column_index)),
+                             shape=(len(rows), 2 * team_count))
+
+
+def _irls(design, goals, max_iter, tol):
+    """
+    Maximizes the Poisson likelihood with the log link by iteratively
+    reweighted least squares, started and stopped like statsmodels does.
+    Singular systems (e.g. only two teams) get the minimum norm solution,
+    like the pseudo inverse of statsmodels gives.
+
+    :return: tuple parameters, converged, number of iterations
+    """
+    from scipy import sparse
+
+    mu = (goals + goals.mean()) / 2
+    linear = np.log(mu)
+    deviance = _deviance(goals, mu)
+    params = np.zeros(design.shape[1])
+    converged = False
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        # the weights of the log link are mu
+        working = linear + (goals - mu) / mu
+        weighted = design.T @ sparse.diags(mu)
+        params = np.linalg.lstsq((weighted @ design).toarray(),
+                                 weighted @ working, rcond=None)[0]
+        linear = design @ params
+        mu = np.exp(linear)
+        previous, deviance = deviance, _deviance(goals, mu)
+        if abs(deviance - previous) <= tol:
+            converged = True
+            break
+    return params, converged, iteration
+
+
+def _deviance(goals, mu):
+    """
+    :return: float Poisson deviance of the expected goals mu
+    """
+    mu = np.maximum(mu, np.finfo(float).eps)
+    ratio = np.where(goals > 0, goals / mu, 1.0)
+    return 2 * np.sum(goals * np.log(ratio) - (goals - mu))
+
+
+def outcome_probabilities(home_goals, guest_goals, tol=OUTCOME_TOLERANCE):
+    """
+    Calculates the probabilities of a home win, a draw and a guest win for
+    pairs of independent Poisson distributed goal counts, i.e. the
+    Skellam distribution of the goal difference at > 0, 0 and < 0.
+
+    Both goal distributions are truncated after the number of goals at
+    which the remaining tail of the highest rate is below tol / 2, so every
+    probability is off by at most tol. The pmfs are evaluated in log space
+    for all pairs at once and the outcomes are summed with cumulative sums,
+    so the cost grows linearly with the number of goals.
+
+    :param home_goals: array-like of expected goals of the home teams
+    :param guest_goals: array-like of expected goals of the guest teams
+    :param float tol: maximum error of each probability
+    :return: np.ndarray of shape (pairs, 3)
+    """
+    home_goals = np.atleast_1d(np.asarray(home_goals, dtype='float'))
+    guest_goals = np.atleast_1d(np.asarray(guest_goals, dtype='float'))
+    if len(home_goals) == 0:
+        return np.empty((0, 3))
+    goals = np.arange(_truncation(max(home_goals.max(), guest_goals.max()),
+                                  tol / 2) + 1)
+    home_pmf = _poisson_pmf(goals, home_goals)
+    guest_pmf = _poisson_pmf(goals, guest_goals)
+    # probability of fewer than k goals, for k = 0, 1, ...
+    home_below = np.cumsum(home_pmf, axis=1) - home_pmf
+    guest_below = np.cumsum(guest_pmf, axis=1) - guest_pmf
+    return np.stack([np.sum(home_pmf * guest_below, axis=1),
+                     np.sum(home_pmf * guest_pmf, axis=1),
+                     np.sum(guest_pmf * home_below, axis=1)], axis=1)
+
+
+def _poisson_pmf(goals, rates):
+    """
+    :param np.ndarray goals: 0, 1, ... n
+    :param np.ndarray rates: expected goals
+    :return: np.ndarray of shape (rates, goals) with the pmf of each rate
+    """
+    log_factorials = np.concatenate(
+        [[0.0], np.cumsum(np.log(goals[1:], dtype='float'))])
+    # a rate of 0 gives no goals for sure, the pmf of more goals underflows
+    log_rates = np.log(np.maximum(rates, np.finfo(float).tiny))
+    return np.exp(goals * log_rates[:, np.newaxis] - rates[:, np.newaxis]
+                  - log_factorials)
+
+
+def _truncation(rate, tol):
+    """
+    Finds the number of goals after which the Poisson distribution with
+    the given rate has less than tol probability left. Behind the mode the
+    pmf falls faster than a geometric series, which bounds the tail.
+
+    :return: int highest number of goals that has to be counted
+    """
+    goals = int(np.floor(rate)) + 1
+    log_pmf = goals * np.log(rate) - rate - np.sum(np.log(
+        np.arange(1, goals + 1))) if rate > 0 else -np.inf
+    while True:
+        ratio = rate / (goals + 1)
+        # pmf(goals) * (1 + ratio + ratio ** 2 + ...) bounds P(X >= goals)
+        if log_pmf - np.log1p(-ratio) < np.log(tol):
+            return goals - 1
+        goals += 1
+        log_pmf += np.log(ratio)
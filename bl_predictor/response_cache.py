@@ -0,0 +1,347 @@
+"""
+This module contains an on-disk cache for OpenLigaDB responses.
+
+Cached responses are served without any request as long as they are
+younger than the time to live of their kind of url, or until an expiry
+set for the url (e.g. the next kickoff of its matches). Older responses are
+revalidated: matchdays by asking the api for their last change date,
+everything else by a conditional request (ETag/Last-Modified). Only
+changed data is downloaded again.
+"""
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from bl_predictor import atomic_file
+from bl_predictor import http_client
+
+# Seconds a cached response is used without asking the api, per url kind
+DEFAULT_TTLS = {
+    'finished_season': 30 * 24 * 3600,  # results do not change anymore
+    'current_season': 5 * 60,  # current matchday may change any minute
+    'other': 60,
+}
+# Size limit of all cached response bodies, oldest are evicted first
+MAX_BYTES = 50 * 1024 * 1024
+
+_MATCHDATA_URL = re.compile(
+    r'/getmatchdata/(?P<league>\w+)/(?P<season>\d{4})(/(?P<day>\d+))?$')
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def user_cache_dir():
+    """
+    Returns the directory for cached responses of the current user.
+    Can be changed with the environment variable BL_PREDICTOR_CACHE_DIR.
+
+    :return: str path
+    """
+    if os.environ.get('BL_PREDICTOR_CACHE_DIR'):
+        return os.environ['BL_PREDICTOR_CACHE_DIR']
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        base = os.environ['LOCALAPPDATA']
+    else:
+        base = os.environ.get('XDG_CACHE_HOME',
+                              os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'bl-predictor')
+
+
+def parse_matchdata_url(url):
+    """
+    Splits a getmatchdata url into its league, season and matchday.
+
+    :param str url: api url
+    :return: tuple (str league, int season, int matchday or None) or None
+     if the url is no getmatchdata url
+    """
+    match = _MATCHDATA_URL.search(url)
+    if match is None:
+        return None
+    day = match.group('day')
+    return (match.group('league'), int(match.group('season')),
+            None if day is None else int(day))
+
+
+def url_kind(url, today=None):
+    """
+    Sorts a url into one of the kinds of DEFAULT_TTLS. A season counts as
+    finished from July of the following year on.
+
+    :param str url: api url
+    :param datetime.date today: date to compare with, default is today
+    :return: str 'finished_season', 'current_season' or 'other'
+    """
+    parsed = parse_matchdata_url(url)
+    if parsed is None:
+        return 'other'
+    today = today or datetime.date.today()
+    season_end = datetime.date(parsed[1] + 1, 7, 1)
+    if today >= season_end:
+        return 'finished_season'
+    return 'current_season'
+
+
+def last_change_url(url):
+    """
+    Returns the url of the last change date of a matchday url, or None
+    if the url is not the url of a single matchday.
+
+    :param str url: api url
+    :return: str or None
+    """
+    parsed = parse_matchdata_url(url)
+    if parsed is None or parsed[2] is None:
+        return None
+    return url.replace('/getmatchdata/', '/getlastchangedate/')
+
+
+class ResponseCache:
+    """
+    An on-disk cache of decoded json responses, keyed by url.
+
+    Every entry consists of the response body (<key>.json) and its
+    metadata (<key>.meta.json) with ETag, Last-Modified, the last change
+    date of the api and the time it was last validated.
+    """
+
+    def __init__(self, directory=None, ttls=None, max_bytes=MAX_BYTES):
+        """
+        :param str directory: cache directory, default is user_cache_dir()
+        :param dict ttls: overrides for DEFAULT_TTLS
+        :param int max_bytes: size limit of all cached response bodies
+        """
+        self.directory = directory or os.path.join(user_cache_dir(),
+                                                   'responses')
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def get_json(self, url, refresh=False):
+        """
+        Returns the decoded response of the url, from the cache if it is
+        still valid, otherwise from the api.
+
+        :param str url: api url
+        :param bool refresh: revalidate the cached response even if it is
+         still valid
+        :return: decoded json response
+        """
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        meta = self._read_meta(key)
+        if meta is not None and not refresh:
+            if meta.get('expires') is not None:
+                fresh = time.time() < meta['expires']
+            else:
+                fresh = time.time() - meta['validated'] \
+                    < self.ttls[url_kind(url)]
+            if fresh:
+                return self._read_body(key)
+
+        headers = {}
+        last_change = None
+        if meta is not None:
+            change_url = last_change_url(url)
+            if change_url is not None:
+                last_change = http_client.get_json(change_url)
+                if last_change and last_change == meta.get('last_change'):
+                    return self._revalidated(key, meta)
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = http_client.get(url, headers=headers or None)
+        if response.status_code == 304 and meta is not None:
+            meta['last_change'] = last_change or meta.get('last_change')
+            return self._revalidated(key, meta)
+        response.raise_for_status()
+        self._store(key, response.content, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'last_change': last_change,
+            'validated': time.time(),
+        })
+        return json.loads(response.content)
+
+    def set_expiry(self, url, expires):
+        """
+        Keeps the cached response of the url valid until the given time,
+        instead of its time to live. The expiry ends with the next
+        revalidation.
+
+        :param str url: api url
+        :param float expires: time as returned by time.time()
+        :return: bool whether the url is cached
+        """
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        meta = self._read_meta(key)
+        if meta is None:
+            return False
+        meta['expires'] = expires
+        self._write(key + '.meta.json', json.dumps(meta).encode('utf-8'))
+        return True
+
+    def clear(self):
+        """
+        Removes all cached responses.
+        """
+        for name in self._entries():
+            _remove(os.path.join(self.directory, name))
+            _remove(os.path.join(self.directory,
+                                 name[:-len('.json')] + '.meta.json'))
+
+    def size(self):
+        """
+        :return: int size of all cached response bodies in bytes
+        """
+        return sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in self._entries())
+
+    def _revalidated(self, key, meta):
+        """
+        Marks an entry as validated now and returns its body.
+        """
+        meta['validated'] = time.time()
+        meta.pop('expires', None)
+        self._write(key + '.meta.json', json.dumps(meta).encode('utf-8'))
+        return self._read_body(key)
+
+    def _read_meta(self, key):
+        """
+        Returns the metadata of an entry or None if it is not cached.
+        """
+        try:
+            with open(os.path.join(self.directory, key + '.meta.json'),
+                      encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(os.path.join(self.directory, key + '.json')):
+            return None
+        return meta
+
+    def _read_body(self, key):
+        """
+        Returns the decoded body of a cached entry.
+        """
+        path = os.path.join(self.directory, key + '.json')
+        with open(path, 'rb') as body_file:
+            body = body_file.read()
+        # the modification time is used to evict the least recently used
+        os.utime(path)
+        return json.loads(body)
+
+    def _store(self, key, body, meta):
+        """
+        Writes body and metadata of an entry and evicts the least recently
+        used entries, if the cache grew too big.
+        """
+        self._write(key + '.json', body)
+        self._write(key + '.meta.json', json.dumps(meta).encode('utf-8'))
+        with self._lock:
+            self._evict()
+
+    def _write(self, name, content):
+        """
+        Writes a file atomically, so parallel readers never see half of it.
+        """
+        with atomic_file.write(os.path.join(self.directory, name)) \
+                as tmp_file:
+            tmp_file.write(content)
+
+    def _entries(self):
+        """
+        Returns the file names of all cached response bodies.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return [name for name in os.listdir(self.directory)
+                if name.endswith('.json')
+                and not name.endswith('.meta.json')]
+
+    def _evict(self):
+        """
+        Removes least recently used entries until the cache fits into
+        max_bytes.
+        """
+        entries = []
+        for name in self._entries():
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove(os.path.join(self.directory, name))
+            _remove(os.path.join(self.directory,
+                                 name[:-len('.json')] + '.meta.json'))
+            total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_cache():
+    """
+    Returns the shared cache and creates it on first use.
+
+    :return: ResponseCache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def set_cache(cache):
+    """
+    Replaces the shared cache. Passing None makes get_cache create a new
+    default cache.
+
+    :param ResponseCache cache: new cache
+    :return: the cache that was used before
+    """
+    global _cache
+    with _cache_lock:
+        previous = _cache
+        _cache = cache
+    return previous
+
+
+def get_json(url, refresh=False):
+    """
+    Returns the decoded response of the url using the shared cache.
+
+    :param str url: api url
+    :param bool refresh: revalidate the cached response even if it is
+     still valid
+    :return: decoded json response
+    """
+    return get_cache().get_json(url, refresh)
+
+
+def set_expiry(url, expires):
+    """
+    Keeps the response of the url in the shared cache valid until the
+    given time.
+
+    :param str url: api url
+    :param float expires: time as returned by time.time()
+    :return: bool whether the url is cached
+    """
+    return get_cache().set_expiry(url, expires)
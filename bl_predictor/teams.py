@@ -0,0 +1,143 @@
+"""
+This module contains the dictionary of team names.
+
+Every team gets a stable integer ID the first time it is seen. The match
+store saves matches with these IDs and the models compare and count
+teams by their IDs, so names are only needed to show results.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from bl_predictor import atomic_file
+
+# Old name: current name of clubs that were renamed. Matches under the old
+# name get the ID of the current name.
+ALIASES = {}
+
+
+class TeamDictionary:
+    """
+    Maps team names to stable integer IDs and back.
+    """
+
+    def __init__(self, names=(), aliases=None):
+        """
+        :param names: team names in the order of their IDs
+        :param dict aliases: old name: current name, default is ALIASES
+        """
+        self.aliases = dict(ALIASES if aliases is None else aliases)
+        self._names = []
+        self._ids = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return self.canonical(name) in self._ids
+
+    @property
+    def names(self):
+        """
+        :return: list[str] team names, the position is the ID
+        """
+        return list(self._names)
+
+    def canonical(self, name):
+        """
+        :param str name: team name or alias
+        :return: str current name of the team
+        """
+        return self.aliases.get(name, name)
+
+    def add(self, name):
+        """
+        Adds a team, if it is not known yet.
+
+        :param str name: team name or alias
+        :return: int ID of the team
+        """
+        name = self.canonical(name)
+        if name not in self._ids:
+            self._ids[name] = len(self._names)
+            self._names.append(name)
+        return self._ids[name]
+
+    def id_of(self, name):
+        """
+        :param str name: team name or alias
+        :return: int ID of the team or -1 if it is unknown
+        """
+        return self._ids.get(self.canonical(name), -1)
+
+    def encode(self, names, add=False):
+        """
+        Turns team names into IDs. Every distinct name is looked up once.
+
+        :param names: array-like of team names
+        :param bool add: add unknown teams, otherwise their ID is -1
+        :return: np.ndarray of int16 IDs
+        """
+        inverse, uniques = pd.factorize(pd.Series(names, dtype='object'))
+        if add:
+            ids = [self.add(name) for name in uniques]
+        else:
+            ids = [self.id_of(name) for name in uniques]
+        lookup = np.array(ids + [-1], dtype='int16')
+        # factorize marks missing names with -1, the last lookup entry
+        return lookup[inverse]
+
+    def decode(self, ids):
+        """
+        Turns IDs into team names.
+
+        :param ids: array-like of IDs
+        :return: np.ndarray of str (object) names
+        :raises ValueError: if an ID is negative, e.g. the -1 of an unknown
+         team
+        """
+        ids = np.asarray(ids)
+        if ids.size and ids.min() < 0:
+            raise ValueError('team ID ' + str(ids.min()) + ' is unknown')
+        return np.array(self._names, dtype='object')[ids]
+
+    def extended(self, names):
+        """
+        Returns a copy that also knows the given teams. The dictionary
+        itself does not change.
+
+        :param names: array-like of team names
+        :return: TeamDictionary
+        """
+        copy = TeamDictionary(self._names, self.aliases)
+        copy.encode(names, add=True)
+        return copy
+
+    def save(self, path):
+        """
+        Writes the dictionary as json file atomically.
+
+        :param str path: path of the file
+        """
+        with atomic_file.write(path, 'w') as tmp_file:
+            json.dump({'names': self._names, 'aliases': self.aliases},
+                      tmp_file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a dictionary written by save. A missing file gives an empty
+        dictionary.
+
+        :param str path: path of the file
+        :return: TeamDictionary
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as dictionary_file:
+            content = json.load(dictionary_file)
+        return cls(content['names'], content.get('aliases'))
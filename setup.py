@@ -27,6 +27,7 @@ setuptools.setup(
     entry_points={
         'console_scripts': [
             'bl-predictor-gui = bl_predictor.__main__:main',
+            'bl-predictor-backfill = bl_predictor.backfill:main',
         ],
     },
     include_package_data=True,
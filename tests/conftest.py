@@ -0,0 +1,36 @@
+"""
+Fixtures shared by all test files
+"""
+import pytest
+
+from bl_predictor import fake_openligadb
+from bl_predictor import http_client
+from bl_predictor import response_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_response_cache(tmp_path_factory):
+    """Keeps tests from reading or filling the cache of the user."""
+    cache = response_cache.ResponseCache(
+        str(tmp_path_factory.mktemp('response_cache')))
+    previous = response_cache.set_cache(cache)
+    yield cache
+    response_cache.set_cache(previous)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """Lets retries go on without waiting and lifts the rate limit."""
+    waits = []
+    monkeypatch.setattr(http_client, '_sleep', waits.append)
+    monkeypatch.setattr(http_client, '_limiter',
+                        http_client.RateLimiter(rate=None))
+    return waits
+
+
+@pytest.fixture
+def fake_api():
+    """Runs the crawler against the packaged matches instead of the api."""
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    with fake_openligadb.offline(api):
+        yield api
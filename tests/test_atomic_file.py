@@ -0,0 +1,38 @@
+"""
+This file is used for testing the atomic file writing
+"""
+import os
+
+import pytest
+
+from bl_predictor import atomic_file
+
+
+@pytest.mark.parametrize(
+    "mode, content",
+    [
+        ('w', 'Bayern München'),
+        ('wb', b'\x00\x01'),
+    ])
+def test_write_replaces_file(tmp_path, mode, content):
+    path = os.path.join(tmp_path, 'new', 'file')
+    for _ in range(2):
+        with atomic_file.write(path, mode) as tmp_file:
+            tmp_file.write(content)
+    with open(path, 'r' + mode[1:],
+              encoding=None if 'b' in mode else 'utf-8') as written:
+        assert written.read() == content
+    assert os.listdir(os.path.dirname(path)) == ['file']
+
+
+def test_failed_write_keeps_file(tmp_path):
+    path = os.path.join(tmp_path, 'file')
+    with atomic_file.write(path, 'w') as tmp_file:
+        tmp_file.write('old')
+    with pytest.raises(RuntimeError):
+        with atomic_file.write(path, 'w') as tmp_file:
+            tmp_file.write('half')
+            raise RuntimeError
+    with open(path, encoding='utf-8') as written:
+        assert written.read() == 'old'
+    assert os.listdir(tmp_path) == ['file']
@@ -0,0 +1,61 @@
+"""
+This file is used for testing the resumable backfill of the match store
+"""
+import os
+
+import pytest
+
+from bl_predictor import backfill
+from bl_predictor import fake_openligadb
+from bl_predictor import http_client
+from bl_predictor import match_store
+
+URL = 'https://api.openligadb.de/getmatchdata/bl1/'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return match_store.MatchStore(str(tmp_path), legacy_csv=None)
+
+
+def test_backfill_fills_store(store):
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    staged = []
+    with fake_openligadb.offline(api, store):
+        result = backfill.backfill(2016, workers=4,
+                                   progress=lambda season, rows:
+                                   staged.append((season, rows)))
+    assert sorted(result['staged']) == [2016, 2017, 2018, 2019, 2020]
+    assert result['rows'] == 4 * 306 + 198
+    assert sorted(staged)[0] == (2016, 306)
+    assert store.seasons() == [2016, 2017, 2018, 2019, 2020]
+    assert store.last_date() == [23, 2020]
+    # one request per season
+    assert len([url for url in api.requests if '/2016' in url]) == 1
+    assert not os.path.exists(backfill.staging_directory(store))
+
+
+def test_backfill_resumes(store):
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    api.fail_urls[URL + '2018'] = http_client.RETRIES + 1
+    with fake_openligadb.offline(api, store):
+        with pytest.raises(backfill.BackfillError) as error:
+            backfill.backfill(2016, 2019, workers=4)
+        assert list(error.value.failed) == [2018]
+        # nothing is committed before all seasons are staged
+        assert store.seasons() == []
+
+        api.requests.clear()
+        result = backfill.backfill(2016, 2019, workers=4)
+    assert result['staged'] == [2018]
+    assert result['resumed'] == [2016, 2017, 2019]
+    assert api.requests == [URL + '2018']
+    assert store.manifest()['rows'] == 4 * 306
+
+
+def test_commit_twice_keeps_rows(store):
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    with fake_openligadb.offline(api, store):
+        backfill.backfill(2019, 2019)
+        backfill.backfill(2019, 2019)
+    assert store.manifest()['rows'] == 306
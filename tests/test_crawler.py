@@ -1,11 +1,21 @@
 # Use this file to test your crawler.
+import datetime
+import json
+
 import pandas as pd
 import pandas.api.types as ptypes
 import pytest
+import requests
 
 import os
-from pathlib import Path
+import time
 from bl_predictor import crawler
+from bl_predictor import fake_openligadb
+from bl_predictor import http_client
+from bl_predictor import match_store
+
+# current date of the fake api, the day after the last packaged match
+CURRENT_DATE = [23, 2020]
 
 
 @pytest.mark.parametrize(
@@ -16,13 +26,13 @@ from bl_predictor import crawler
         ([32, 2019], [34, 2019], [32, 2019], [34, 2019], "yes"),
         ([17, 2020], [1, 2021], [17, 2020], [18, 2020], "yes"),
     ])
-def test_fetch_data(start, end, exp_start, exp_end, remove):
-    dir_path = Path(__file__).parents[1]
-    csv_file = os.path.join(dir_path, "bl_predictor/crawled_data.csv")
-    if remove == "yes":
-        os.remove(csv_file)
-
-    data = crawler.fetch_data(start, end)
+def test_fetch_data(start, end, exp_start, exp_end, remove, tmp_path):
+    # "no" starts from the packaged matches, "yes" crawls everything again
+    legacy_csv = None if remove == "yes" else match_store.LEGACY_CSV
+    store = match_store.MatchStore(str(tmp_path), legacy_csv=legacy_csv)
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    with fake_openligadb.offline(api, store):
+        data = crawler.fetch_data(start, end)
 
     assert isinstance(data, pd.DataFrame)
     assert all(ptypes.is_numeric_dtype(data[col])
@@ -41,7 +51,7 @@ def test_fetch_data(start, end, exp_start, exp_end, remove):
     assert (len(data) != 0)
 
 
-def test_fetch_data_exc():
+def test_fetch_data_exc(fake_api):
     pytest.warns(Warning, crawler.fetch_data, [0, 2014], [2, 2014])
     pytest.warns(Warning, crawler.fetch_data, [1, 1997], [8, 2004])
 
@@ -69,6 +79,24 @@ def test_fetch_data_exc():
 #     assert (len(test_next_day) != 0)
 
 
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (None, [1, 2004]),
+        ("date_time,matchday,home_team,home_score,guest_score,guest_team,"
+         "season\n", [1, 2004]),
+        ("date_time,matchday,home_team,home_score,guest_score,guest_team,"
+         "season\n2021-02-26T20:30:00,23,Werder Bremen,2,1,"
+         "Eintracht Frankfurt,2020\n", [23, 2020]),
+    ])
+def test_get_csv_last_date(tmp_path, content, expected):
+    csv_file = os.path.join(tmp_path, 'crawled_data.csv')
+    if content is not None:
+        with open(csv_file, 'w', encoding='utf-8') as legacy_csv:
+            legacy_csv.write(content)
+    assert crawler.get_csv_last_date(csv_file) == expected
+
+
 @pytest.mark.parametrize(
     "start_date, end_date, index_of_url, expected",
     [  # curate urls tests
@@ -88,13 +116,71 @@ def test_test_curate_urls(start_date, end_date, index_of_url, expected):
         assert urls == expected
 
 
+@pytest.mark.parametrize(
+    "start_date, end_date, expected",
+    [
+        ([17, 2014], [34, 2014], ['2014']),
+        ([1, 2014], [2, 2014], ['2014/1', '2014/2']),
+        ([29, 2014], [34, 2014], ['2014/' + str(day)
+                                  for day in range(29, 35)]),
+        ([34, 2014], [8, 2016], ['2014/34', '2015', '2016']),
+        ([34, 2014], [6, 2016], ['2014/34', '2015'] + [
+            '2016/' + str(day) for day in range(1, 7)]),
+        ([3, 2014], [2, 2014], []),
+    ])
+def test_plan_requests(start_date, end_date, expected):
+    plan = crawler.plan_requests(start_date, end_date)
+    assert plan.urls == ['https://api.openligadb.de/getmatchdata/bl1/'
+                         + url for url in expected]
+    assert plan.request_count == len(expected)
+
+
+@pytest.mark.parametrize(
+    "league, start_date, end_date, expected",
+    [
+        ('bl2', [1, 2014], [2, 2014], ['bl2/2014/1', 'bl2/2014/2']),
+        ('bl3', [36, 2014], [38, 2014], ['bl3/2014/36', 'bl3/2014/37',
+                                         'bl3/2014/38']),
+        ('bl3', [1, 2014], [38, 2014], ['bl3/2014']),
+        # cups are always downloaded as a whole
+        ('dfb', [5, 2014], [6, 2014], ['dfb/2014']),
+    ])
+def test_plan_requests_of_leagues(league, start_date, end_date, expected):
+    plan = crawler.plan_requests(start_date, end_date, league=league)
+    assert plan.urls == ['https://api.openligadb.de/getmatchdata/'
+                         + url for url in expected]
+
+
+def test_curate_urls_of_league():
+    assert crawler.curate_urls([38, 2014], [1, 2015], 'bl3') == [
+        'https://api.openligadb.de/getmatchdata/bl3/2014/38',
+        'https://api.openligadb.de/getmatchdata/bl3/2015/1']
+
+
+def test_plan_requests_skips_stored_matchdays(tmp_path):
+    store = match_store.MatchStore(str(tmp_path), legacy_csv=None)
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    with fake_openligadb.offline(api, store):
+        crawler.crawl_openligadb(crawler.plan_requests([1, 2019],
+                                                       [34, 2019]).urls,
+                                 store)
+        crawler.crawl_openligadb(crawler.plan_requests([1, 2020],
+                                                       [3, 2020]).urls,
+                                 store)
+    assert crawler.plan_requests([1, 2019], [34, 2019], store).urls == []
+    plan = crawler.plan_requests([30, 2019], [5, 2020], store)
+    assert plan.urls == ['https://api.openligadb.de/getmatchdata/bl1/2020/'
+                         + str(day) for day in [4, 5]]
+    assert len(plan) == 2
+
+
 @pytest.mark.parametrize(
     "start, end, expected",
     [
-        (crawler.get_current_date(), crawler.get_current_date(), False),
+        (CURRENT_DATE, CURRENT_DATE, False),
         ([12, 2012], [12, 2012], False),
     ])
-def test_data_exists(start, end, expected):
+def test_data_exists(start, end, expected, fake_api):
     url = crawler.curate_urls(start, end)
     result = crawler.data_not_exist(url)
     assert result == expected
@@ -103,13 +189,393 @@ def test_data_exists(start, end, expected):
 @pytest.mark.parametrize(
     "start, end, expected",
     [
-        (crawler.get_current_date(), crawler.get_current_date(), True),
+        (CURRENT_DATE, CURRENT_DATE, True),
         ([12, 2012], [12, 2012], True),
-        ([crawler.get_current_date()[0] + 1, crawler.get_current_date()[1]],
-         [crawler.get_current_date()[0] + 1, crawler.get_current_date()[1]],
+        ([CURRENT_DATE[0] + 1, CURRENT_DATE[1]],
+         [CURRENT_DATE[0] + 1, CURRENT_DATE[1]],
          False)
     ])
 def matches_exists(start, end, expected):
     url = crawler.curate_urls(start, end)
     result = crawler.data_not_exist(url)
     assert result == expected
+
+
+class DelayedSession:
+    """Stand-in session that answers later urls faster."""
+
+    def get(self, url, headers=None, timeout=None):
+        day = int(url.rsplit('/', 1)[1])
+        time.sleep((7 - day) * 0.01)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(
+            [{'matchDateTime': '2014-08-22T20:30:00',
+              'group': {'groupOrderID': day},
+              'team1': {'teamName': 'Home ' + str(day)},
+              'team2': {'teamName': 'Guest ' + str(day)},
+              'matchResults': [{'pointsTeam1': 1, 'pointsTeam2': 0}],
+              'matchIsFinished': True}]).encode()
+        return response
+
+
+def test_crawl_openligadb_keeps_url_order(tmp_path):
+    # parallel downloads finish in reversed order
+    urls = ['https://api.openligadb.de/getmatchdata/bl1/2014/'
+            + str(day) for day in range(1, 7)]
+    previous = http_client.set_session(DelayedSession())
+    try:
+        store = match_store.MatchStore(str(tmp_path), legacy_csv=None)
+        crawler.crawl_openligadb(urls, store, workers=6)
+    finally:
+        http_client.set_session(previous)
+
+    data = store.read()
+    assert list(data['matchday']) == [1, 2, 3, 4, 5, 6]
+    assert (data['season'] == 2014).all()
+
+
+class SeasonSession:
+    """Stand-in session that knows a season with 3 matchdays."""
+
+    def __init__(self, season):
+        self.season = season
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requested.append(url)
+        games = []
+        if url.endswith('/' + str(self.season)):
+            for day, finished in [(1, True), (2, True), (3, False)]:
+                games.append({'matchDateTimeUTC': '2099-01-0'
+                                                  + str(day) + 'T14:30:00Z',
+                              'group': {'groupOrderID': day},
+                              'matchIsFinished': finished})
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(games).encode()
+        return response
+
+
+@pytest.mark.parametrize("season_offset", [0, 1])
+def test_get_current_date_single_request(season_offset, monkeypatch):
+    # forget the remembered date of other tests and restore it afterwards
+    monkeypatch.setattr(crawler, '_current_dates', {})
+    season = datetime.date.today().year - season_offset
+    session = SeasonSession(season)
+    previous = http_client.set_session(session)
+    try:
+        assert crawler.get_current_date(refresh=True) == [2, season]
+        # one request for the season (plus the empty current year)
+        assert len(session.requested) == 1 + season_offset
+        # remembered until the match of matchday 3 is over
+        assert crawler.get_current_date() == [2, season]
+        assert len(session.requested) == 1 + season_offset
+    finally:
+        http_client.set_session(previous)
+
+
+def test_parse_matches_builds_typed_frames():
+    urls = ['https://api.openligadb.de/getmatchdata/bl1/2014',
+            'https://api.openligadb.de/getmatchdata/bl1/2015/34']
+    finished_game = {'matchDateTime': '2014-08-22T20:30:00',
+                     'group': {'groupOrderID': 1},
+                     'team1': {'teamName': 'FC Bayern München'},
+                     'team2': {'teamName': 'VfL Wolfsburg'},
+                     'matchResults': [{'pointsTeam1': 2, 'pointsTeam2': 1}],
+                     'matchIsFinished': True}
+    unfinished_game = dict(finished_game, matchResults=[],
+                           matchIsFinished=False,
+                           group={'groupOrderID': 34})
+    responses = [[finished_game] * 2500, [unfinished_game] * 9]
+
+    matches, unfinished = crawler.parse_matches(urls, responses)
+
+    assert len(matches) == 2500
+    assert len(unfinished) == 9
+    assert list(matches.columns) == crawler.COLUMNS
+    assert ptypes.is_datetime64_any_dtype(matches['date_time'])
+    assert all(ptypes.is_integer_dtype(matches[col])
+               for col in ['matchday', 'home_score', 'guest_score',
+                           'season'])
+    assert (matches['season'] == 2014).all()
+    assert (unfinished['season'] == 2015).all()
+    assert (unfinished['home_score'] == -1).all()
+
+
+def test_sync_matches_downloads_only_changed_matchdays(fake_api):
+    store = match_store.get_store()
+    first = crawler.sync_matches()
+    assert first['changed'] == list(range(1, 25))
+    assert len(store.read_season(2020)) == 198
+
+    # the api corrects a result of matchday 22
+    game = fake_api.payloads['/getmatchdata/bl1/2020/22'][0]
+    game['matchResults'][0]['pointsTeam1'] += 1
+    game['lastUpdateDateTime'] = '2021-02-27T10:00:00'
+    requests_before = len(fake_api.requests)
+
+    second = crawler.sync_matches()
+    # settled matchdays are not even checked
+    assert second['checked'] == [22, 23, 24]
+    assert second['changed'] == [22]
+    assert len(fake_api.requests) - requests_before == 4
+    season = store.read_season(2020)
+    assert len(season) == 198
+    corrected = season[(season['home_team'] == game['team1']['teamName'])
+                       & (season['guest_team']
+                          == game['team2']['teamName'])]
+    assert list(corrected['home_score']) \
+        == [game['matchResults'][0]['pointsTeam1']]
+
+
+@pytest.mark.parametrize("writer", ['fetch_unfinished', 'sync_matches',
+                                    'matchday_poller'])
+def test_past_seasons_are_crawled_after_current_matches(fake_api, writer):
+    store = match_store.get_store()
+    if writer == 'fetch_unfinished':
+        crawler.fetch_data([0, 0], [0, 0])
+    elif writer == 'sync_matches':
+        crawler.sync_matches()
+    else:
+        # the last match of matchday 23 ends while it is watched
+        game = fake_api.payloads['/getmatchdata/bl1/2020/23'][-1]
+        game['matchIsFinished'] = False
+        poller = crawler.MatchdayPoller(2020, 23, store=store)
+        poller.poll()
+        game['matchIsFinished'] = True
+        game['lastUpdateDateTime'] = '2021-02-27T22:00:00'
+        poller.poll()
+    assert store.seasons() == [2020]
+
+    assert len(crawler.fetch_data([1, 2012], [34, 2013])) == 2 * 306
+
+
+def test_crawling_twice_stores_no_duplicates(fake_api):
+    store = match_store.get_store()
+    urls = crawler.curate_urls([30, 2019], [2, 2020])
+    crawler.crawl_openligadb(urls, store)
+    rows = store.manifest()['rows']
+    crawler.crawl_openligadb(urls, store)
+    assert store.manifest()['rows'] == rows == 7 * 9
+
+
+def test_unfinished_matches_are_cached_until_kickoff():
+    today = datetime.datetime(2021, 3, 1, 12)
+    matches = pd.DataFrame({
+        'date_time': pd.to_datetime(['2021-02-27 15:30', '2021-03-06 15:30',
+                                     '2021-03-06 18:30']),
+        'matchday': [1, 2, 2],
+        'home_team': ['Hertha BSC', 'Hamburger SV', 'Werder Bremen'],
+        'home_score': [1, -1, -1],
+        'guest_score': [0, -1, -1],
+        'guest_team': ['SC Freiburg', 'Hertha BSC', 'SC Freiburg'],
+        'season': [2020, 2020, 2020],
+    }, columns=match_store.COLUMNS)
+    api = fake_openligadb.FakeOpenligaDB.from_frame(matches, today=today)
+    with fake_openligadb.offline(api):
+        unfinished = crawler.fetch_data([0, 0], [0, 0])
+        assert list(unfinished['home_team']) == ['Hamburger SV',
+                                                 'Werder Bremen']
+        requests_before = len(api.requests)
+        # long after the ttl, but before the kickoff of the next match
+        assert crawler.fetch_data([0, 0], [0, 0]).equals(unfinished)
+        assert len(api.requests) == requests_before
+        crawler.fetch_data([0, 0], [0, 0], force_refresh=True)
+        assert len(api.requests) > requests_before
+
+
+@pytest.mark.parametrize(
+    "kickoffs, expected",
+    [  # 15:30 in Berlin is 14:30 UTC in winter
+        (['2021-03-06 15:30', '2021-03-06 18:30'],
+         datetime.datetime(2021, 3, 6, 14, 30)),
+        # running match
+        (['2021-03-01 12:30'], datetime.datetime(2021, 3, 1, 12, 5)),
+        # postponed match without new date
+        (['2021-01-01 15:30'], datetime.datetime(2021, 3, 2, 12)),
+        ([], datetime.datetime(2021, 3, 2, 12)),
+    ])
+def test_fixtures_expiry(kickoffs, expected):
+    unfinished = pd.DataFrame({'date_time': pd.to_datetime(kickoffs)})
+    now = datetime.datetime(2021, 3, 1, 12)
+    assert crawler._fixtures_expiry(unfinished, now) == expected
+
+
+def test_matchday_poller_sends_only_real_changes(tmp_path):
+    matches = pd.DataFrame({
+        'date_time': pd.to_datetime(['2021-02-27 15:30', '2021-03-06 15:30',
+                                     '2021-03-06 15:30']),
+        'matchday': [1, 2, 2],
+        'home_team': ['Hertha BSC', 'Hamburger SV', 'Werder Bremen'],
+        'home_score': [1, -1, -1],
+        'guest_score': [0, -1, -1],
+        'guest_team': ['SC Freiburg', 'Hertha BSC', 'SC Freiburg'],
+        'season': [2020, 2020, 2020],
+    }, columns=match_store.COLUMNS)
+    api = fake_openligadb.FakeOpenligaDB.from_frame(
+        matches, today=datetime.datetime(2021, 3, 6, 15))
+    store = match_store.MatchStore(str(tmp_path), legacy_csv=None)
+    received = []
+    with fake_openligadb.offline(api):
+        poller = crawler.MatchdayPoller(interval=0, store=store)
+        poller.subscribe(received.append)
+        assert poller.poll() == []
+        assert (poller.season, poller.matchday) == (2020, 2)
+        assert poller.poll() == []
+        assert poller.downloads == 1
+
+        game = api.payloads['/getmatchdata/bl1/2020/2'][0]
+        game['goals'] = [{'scoreTeam1': 1, 'scoreTeam2': 0}]
+        game['lastUpdateDateTime'] = '2021-03-06T15:40:00'
+        updates = poller.poll()
+        assert [update.kind for update in updates] == [
+            crawler.SCORE_CHANGED]
+        assert updates[0].home_team == 'Hamburger SV'
+        assert (updates[0].score, updates[0].previous_score) \
+            == ((1, 0), (0, 0))
+
+        game['matchIsFinished'] = True
+        game['matchResults'] = [{'pointsTeam1': 1, 'pointsTeam2': 0}]
+        game['lastUpdateDateTime'] = '2021-03-06T17:25:00'
+        poller.run(max_polls=poller.polls + 2)
+    assert [update.kind for update in received] == [
+        crawler.SCORE_CHANGED, crawler.MATCH_FINISHED]
+    assert poller.downloads == 3
+    stored = store.read_season(2020)
+    assert list(stored['home_team']) == ['Hamburger SV']
+    assert list(stored['home_score']) == [1]
+
+
+def test_matchday_poller_runs_in_background():
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    with fake_openligadb.offline(api):
+        poller = crawler.MatchdayPoller(2020, 23, interval=0.01)
+        poller.start()
+        time.sleep(0.1)
+        poller.stop()
+    assert poller.polls > 1
+    assert poller.downloads == 1
+
+
+def test_matchday_poller_survives_failed_polls():
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    # the first poll fails with every retry, the api recovers after it
+    api.fail_urls['https://api.openligadb.de/getlastchangedate/bl1/2020/23'] \
+        = http_client.RETRIES + 1
+    with fake_openligadb.offline(api):
+        poller = crawler.MatchdayPoller(2020, 23, interval=0)
+        with pytest.warns(Warning, match='polling matchday 23 failed'):
+            poller.run(max_polls=3)
+    assert poller.polls == 3
+    assert poller.errors == 1
+    assert poller.downloads == 1
+
+
+@pytest.mark.parametrize(
+    "league, start_date, end_date, expected_warnings",
+    [
+        ('bl1', [1, 2010], [34, 2010], 0),
+        ('bl1', [1, 2010], [38, 2010], 1),
+        ('bl3', [1, 2010], [38, 2010], 0),
+        ('bl3', [1, 2006], [38, 2010], 1),
+        ('dfb', [1, 2010], [7, 2010], 1),
+    ])
+def test_incorrect_dates_per_league(league, start_date, end_date,
+                                    expected_warnings, recwarn):
+    crawler.incorrect_dates(start_date, end_date, 2020, league)
+    assert len(recwarn) == expected_warnings
+
+
+def test_fetch_leagues_keeps_leagues_apart():
+    legacy = pd.read_csv(match_store.LEGACY_CSV)
+    legacy['date_time'] = pd.to_datetime(legacy['date_time'])
+    api = fake_openligadb.FakeOpenligaDB.from_frame(
+        legacy, today=datetime.datetime(2021, 2, 27, 20, 30))
+    # a second league with the teams renamed
+    second = legacy[legacy['season'] >= 2019].copy()
+    second['home_team'] = second['home_team'] + ' II'
+    second['guest_team'] = second['guest_team'] + ' II'
+    api.add_matches(second, 'bl2')
+    with fake_openligadb.offline(api):
+        frames = crawler.fetch_leagues([1, 2019], [34, 2019],
+                                       ['bl1', 'bl2'])
+        bl2_store = match_store.get_store('bl2')
+        # only the requested range is crawled
+        assert bl2_store.seasons() == [2019]
+        assert all(name.endswith(' II') for name in bl2_store.teams.names)
+        assert not any(name.endswith(' II')
+                       for name in match_store.get_store().teams.names)
+    assert len(frames['bl1']) == len(frames['bl2']) == 306
+    assert frames['bl2']['home_team'].str.endswith(' II').all()
+    assert any('/getmatchdata/bl2/' in url for url in api.requests)
+
+
+def test_failed_crawl_keeps_progress(tmp_path):
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    store = match_store.MatchStore(str(tmp_path), legacy_csv=None)
+    failing = 'https://api.openligadb.de/getmatchdata/bl1/2019/3'
+    api.fail_urls[failing] = http_client.RETRIES + 1
+    with fake_openligadb.offline(api, store):
+        with pytest.raises(crawler.CrawlError) as error:
+            crawler.crawl_openligadb(
+                crawler.plan_requests([1, 2019], [5, 2019], store).urls,
+                store)
+        assert list(error.value.failed) == [failing]
+        assert sorted(store.matchday_counts(2019)) == [1, 2, 4, 5]
+
+        # crawling again only costs the failed url
+        api.requests.clear()
+        crawler.crawl_openligadb(
+            crawler.plan_requests([1, 2019], [5, 2019], store).urls, store)
+    assert api.requests == [failing]
+    assert store.matchday_counts(2019) == {day: 9 for day in range(1, 6)}
+
+
+def test_iter_matches_streams_seasons(tmp_path):
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    store = match_store.MatchStore(str(tmp_path), legacy_csv=None)
+    with fake_openligadb.offline(api, store):
+        chunks = crawler.iter_matches([30, 2016], [5, 2019], workers=1)
+        first = next(chunks)
+        # later seasons are not downloaded before they are needed
+        assert not any(url.endswith(('/2018', '/2019'))
+                       for url in api.requests)
+        chunks = [first] + list(chunks)
+        data = crawler.fetch_data([30, 2016], [5, 2019])
+    assert [chunk['season'].unique().tolist() for chunk in chunks] \
+        == [[2016], [2017], [2018], [2019]]
+    assert list(chunks[0]['matchday'].unique()) == [30, 31, 32, 33, 34]
+    assert list(chunks[-1]['matchday'].unique()) == [1, 2, 3, 4, 5]
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks).reset_index(drop=True),
+        data.reset_index(drop=True))
+
+
+def test_earlier_seasons_are_crawled_after_iter_matches(tmp_path):
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    store = match_store.MatchStore(str(tmp_path), legacy_csv=None)
+    with fake_openligadb.offline(api, store):
+        assert len(list(crawler.iter_matches([1, 2015], [34, 2016]))) == 2
+        assert len(crawler.fetch_data([1, 2012], [34, 2013])) == 2 * 306
+        chunks = list(crawler.iter_matches([1, 2010], [34, 2011]))
+    assert [len(chunk) for chunk in chunks] == [306, 306]
+
+
+def test_iter_matches_yields_seasons_before_a_failure(tmp_path):
+    api = fake_openligadb.FakeOpenligaDB.from_legacy_csv()
+    store = match_store.MatchStore(str(tmp_path), legacy_csv=None)
+    failing = 'https://api.openligadb.de/getmatchdata/bl1/2018'
+    api.fail_urls[failing] = http_client.RETRIES + 1
+    seasons = []
+    with fake_openligadb.offline(api, store):
+        with pytest.raises(crawler.CrawlError):
+            for chunk in crawler.iter_matches([1, 2016], [34, 2019]):
+                seasons.append(chunk['season'].iloc[0])
+        assert seasons == [2016, 2017]
+        assert store.seasons() == [2016, 2017]
+
+        # the seasons after the failed one are in the response cache
+        api.requests.clear()
+        assert len(list(crawler.iter_matches([1, 2016], [34, 2019]))) == 4
+    assert api.requests == [failing]
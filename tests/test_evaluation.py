@@ -169,7 +169,7 @@ def test_compare(modelname1, modelname2,
       10, 2019, 2019),
      ])
 def test_timespan(modelnames,
-                  testset_size, start_year, end_year, capfd):
+                  testset_size, start_year, end_year, capfd, fake_api):
     result = prediction_evaluation.ModelByTimespan(modelnames,
                                                    testset_size,
                                                    start_year, end_year)
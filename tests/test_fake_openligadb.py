@@ -0,0 +1,118 @@
+"""
+This file is used for testing the offline stand-in of the OpenLigaDB api
+"""
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+import requests
+
+from bl_predictor import crawler
+from bl_predictor import fake_openligadb
+from bl_predictor import http_client
+from bl_predictor import match_store
+
+URL = 'https://api.openligadb.de/getmatchdata/bl1/'
+
+
+def matches_frame():
+    return pd.DataFrame({
+        'date_time': pd.to_datetime(['2014-08-22 20:30', '2014-08-23 15:30',
+                                     '2014-08-29 20:30']),
+        'matchday': [1, 1, 2],
+        'home_team': ['FC Bayern München', 'Hertha BSC', 'Hamburger SV'],
+        'home_score': [2, 3, -1],
+        'guest_score': [1, 1, -1],
+        'guest_team': ['VfL Wolfsburg', 'Werder Bremen', 'SC Paderborn 07'],
+        'season': [2014, 2014, 2014],
+    }, columns=match_store.COLUMNS)
+
+
+@pytest.fixture
+def api():
+    return fake_openligadb.FakeOpenligaDB.from_frame(
+        matches_frame(), today=datetime.datetime(2014, 8, 24))
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        (URL + '2014', 3),
+        (URL + '2014/1', 2),
+        (URL + '2014/2', 1),
+        (URL + '2014/3', 0),
+        (URL + '2015', 0),
+    ])
+def test_serves_matchdata(api, url, expected):
+    response = api.session().get(url)
+    assert response.status_code == 200
+    assert len(response.json()) == expected
+
+
+def test_match_json(api):
+    first, second = api.session().get(URL + '2014/1').json()
+    assert first['team1']['teamName'] == 'FC Bayern München'
+    assert first['matchResults'][0]['pointsTeam1'] == 2
+    assert first['matchIsFinished']
+    assert first['matchID'] != second['matchID']
+    unfinished = api.session().get(URL + '2014/2').json()[0]
+    assert not unfinished['matchIsFinished']
+    assert unfinished['matchResults'] == []
+
+
+def test_etag_and_last_change(api):
+    session = api.session()
+    response = session.get(URL + '2014/1')
+    etag = response.headers['ETag']
+    assert session.get(URL + '2014/1', headers={
+        'If-None-Match': etag}).status_code == 304
+    last_change = session.get('https://api.openligadb.de/getlastchangedate/'
+                              'bl1/2014/1').json()
+    assert last_change == '2014-08-23T17:30:00'
+
+
+def test_errors_latency_and_padding(api):
+    api.fail_urls[URL + '2014/1'] = 1
+    api.latency = 0.02
+    api.padding = 100
+    session = api.session()
+    assert session.get(URL + '2014/1').status_code == 503
+    response = session.get(URL + '2014/1')
+    assert response.status_code == 200
+    assert len(response.content) > 100
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(session.get, [URL + '2014'] * 4))
+    assert api.max_in_flight > 1
+    assert len(api.requests) == 6
+
+
+def test_error_rate():
+    api = fake_openligadb.FakeOpenligaDB({}, error_rate=1.0, seed=1)
+    with pytest.raises(requests.HTTPError):
+        with fake_openligadb.offline(api):
+            http_client.get_json(URL + '2014')
+
+
+def test_record_and_replay(api, tmp_path):
+    previous = http_client.set_session(api.session())
+    try:
+        fake_openligadb.record([URL + '2014', URL + '2014/1'], str(tmp_path))
+    finally:
+        http_client.set_session(previous)
+    replay = fake_openligadb.FakeOpenligaDB.from_fixtures(str(tmp_path))
+    assert replay.session().get(URL + '2014/1').json() \
+        == api.session().get(URL + '2014/1').json()
+    assert replay.session().get(URL + '2014/2').json() == []
+
+
+def test_offline_crawl(api):
+    previous_stores = match_store._stores
+    with fake_openligadb.offline(api) as offline_api:
+        assert crawler.get_current_date() == [1, 2014]
+        data = crawler.fetch_data([1, 2014], [1, 2014])
+        unfinished = crawler.fetch_data([0, 0], [0, 0])
+    assert offline_api is api
+    assert list(data['home_team']) == ['FC Bayern München', 'Hertha BSC']
+    assert list(unfinished['home_score']) == [-1]
+    assert match_store._stores is previous_stores
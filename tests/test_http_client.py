@@ -0,0 +1,209 @@
+"""
+This file is used for testing the shared HTTP client of the crawler
+"""
+import json
+
+import pytest
+import requests
+
+from bl_predictor import http_client
+
+
+class RecordingSession:
+    """Stand-in session that answers every url with the same json."""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requested.append((url, timeout))
+        response = requests.Response()
+        response.status_code = self.status_code
+        response._content = json.dumps(self.payload).encode()
+        return response
+
+
+@pytest.fixture
+def session():
+    stand_in = RecordingSession([{'matchIsFinished': True}])
+    previous = http_client.set_session(stand_in)
+    yield stand_in
+    http_client.set_session(previous)
+
+
+def test_shared_session_is_reused():
+    previous = http_client.set_session(None)
+    try:
+        first = http_client.get_session()
+        assert isinstance(first, requests.Session)
+        assert http_client.get_session() is first
+        assert 'gzip' in first.headers['Accept-Encoding']
+    finally:
+        http_client.set_session(previous)
+
+
+@pytest.mark.parametrize("pool_size", [1, 4, 16])
+def test_create_session_pool_size(pool_size):
+    adapter = http_client.create_session(pool_size).get_adapter(
+        'https://api.openligadb.de')
+    assert adapter._pool_maxsize == pool_size
+
+
+def test_get_json_uses_stand_in(session):
+    url = 'https://api.openligadb.de/getmatchdata/bl1/2014/1'
+    assert http_client.get_json(url) == [{'matchIsFinished': True}]
+    assert session.requested == [(url, http_client.TIMEOUT)]
+
+
+def test_get_json_raises_on_error_status(session):
+    session.status_code = 503
+    with pytest.raises(requests.HTTPError):
+        http_client.get_json('https://api.openligadb.de/getmatchdata/bl1')
+
+
+class FlakySession(RecordingSession):
+    """Stand-in session that fails the first requests."""
+
+    def __init__(self, failures, error=None, status_code=503):
+        super().__init__([{'matchIsFinished': True}])
+        self.failures = failures
+        self.error = error
+        self.failure_status = status_code
+
+    def get(self, url, headers=None, timeout=None):
+        response = super().get(url, headers, timeout)
+        if len(self.requested) > self.failures:
+            return response
+        if self.error is not None:
+            raise self.error
+        response.status_code = self.failure_status
+        return response
+
+
+@pytest.mark.parametrize(
+    "error, status_code",
+    [
+        (None, 503),
+        (None, 429),
+        (requests.ConnectionError('reset'), 200),
+        (requests.Timeout('slow'), 200),
+    ])
+def test_failed_requests_are_retried(error, status_code, no_backoff):
+    session = FlakySession(http_client.RETRIES, error, status_code)
+    previous = http_client.set_session(session)
+    try:
+        assert http_client.get_json(
+            'https://api.openligadb.de/getmatchdata/bl1/2014') \
+            == [{'matchIsFinished': True}]
+    finally:
+        http_client.set_session(previous)
+    assert len(session.requested) == http_client.RETRIES + 1
+    assert len(no_backoff) == http_client.RETRIES
+
+
+def test_client_errors_are_not_retried(session):
+    session.status_code = 404
+    with pytest.raises(requests.HTTPError):
+        http_client.get_json('https://api.openligadb.de/getmatchdata/bl1')
+    assert len(session.requested) == 1
+
+
+@pytest.mark.parametrize("attempt", [0, 1, 2, 5, 10])
+def test_backoff_is_jittered_and_capped(attempt):
+    delays = [http_client.backoff_delay(attempt) for _ in range(50)]
+    limit = min(http_client.BACKOFF_MAX, http_client.BACKOFF * 2 ** attempt)
+    assert all(0 <= delay <= limit for delay in delays)
+    assert len(set(delays)) > 1
+    assert http_client.backoff_delay(attempt, '3') == 3
+
+
+def test_rate_limiter_keeps_the_rate():
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    limiter = http_client.RateLimiter(rate=2, burst=3,
+                                      clock=lambda: now[0], sleep=sleep)
+    for _ in range(7):
+        limiter.acquire()
+    # the burst is free, then one request every half second
+    assert waits == [0.5] * 4
+    assert now[0] == 2.0
+    now[0] += 10
+    assert limiter.acquire() == 0
+    assert http_client.RateLimiter(rate=None).acquire() == 0
+
+
+def test_circuit_breaker_opens_and_recovers():
+    now = [0.0]
+    breaker = http_client.CircuitBreaker(threshold=2, timeout=30,
+                                         clock=lambda: now[0])
+    url = 'https://api.openligadb.de/getmatchdata/bl1/2014'
+    breaker.record_failure()
+    breaker.before_request(url)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(http_client.CircuitOpenError):
+        breaker.before_request(url)
+    now[0] = 30
+    assert breaker.state == 'half-open'
+    # a single trial request, it fails
+    breaker.before_request(url)
+    with pytest.raises(http_client.CircuitOpenError):
+        breaker.before_request(url)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    now[0] = 60
+    breaker.before_request(url)
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    breaker.before_request(url)
+
+
+def test_open_breaker_fails_fast(session):
+    session.status_code = 503
+    url = 'https://api.openligadb.de/getmatchdata/bl1'
+    with pytest.raises(requests.HTTPError):
+        http_client.get_json(url)
+    assert len(session.requested) == http_client.RETRIES + 1
+    # the breaker opens while retrying
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.get_json(url)
+    assert len(session.requested) == http_client.BREAKER_THRESHOLD
+    with pytest.raises(http_client.CircuitOpenError):
+        http_client.get_json(url)
+    assert len(session.requested) == http_client.BREAKER_THRESHOLD
+    assert http_client.get_circuit_breaker().state == 'open'
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        requests.exceptions.ChunkedEncodingError('cut off'),
+        requests.TooManyRedirects('loop'),
+        requests.exceptions.InvalidURL('bad'),
+    ])
+def test_failed_trial_request_reopens_breaker(error, monkeypatch):
+    now = [0]
+    breaker = http_client.CircuitBreaker(threshold=1, timeout=30,
+                                         clock=lambda: now[0])
+    breaker.record_failure()
+    session = FlakySession(1, error)
+    previous = http_client.set_session(session)
+    monkeypatch.setattr(http_client, '_breaker', breaker)
+    url = 'https://api.openligadb.de/getmatchdata/bl1'
+    try:
+        now[0] = 30
+        with pytest.raises(type(error)):
+            http_client.get_json(url)
+        assert breaker.state == 'open'
+        now[0] = 60
+        assert http_client.get_json(url) == [{'matchIsFinished': True}]
+    finally:
+        http_client.set_session(previous)
+    assert breaker.state == 'closed'
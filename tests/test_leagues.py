@@ -0,0 +1,25 @@
+"""
+This file is used for testing the leagues known to the crawler
+"""
+import pytest
+
+from bl_predictor import leagues
+
+
+@pytest.mark.parametrize(
+    "shortcut, matchdays",
+    [
+        ('bl1', 34),
+        ('bl2', 34),
+        ('bl3', 38),
+        ('dfb', 6),
+    ])
+def test_get_league(shortcut, matchdays):
+    league = leagues.get_league(shortcut)
+    assert league.shortcut == shortcut
+    assert league.matchdays == matchdays
+
+
+def test_unknown_league():
+    with pytest.raises(ValueError, match='bl9'):
+        leagues.get_league('bl9')
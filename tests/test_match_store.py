@@ -0,0 +1,340 @@
+"""
+This file is used for testing the season partitioned match store
+"""
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pandas.api.types as ptypes
+import pytest
+
+from bl_predictor import match_store
+
+LEGACY_ROWS = """date_time,matchday,home_team,home_score,guest_score,guest_team,season
+2012-08-24T20:30:00,1,BV Borussia Dortmund 09,2,1,Werder Bremen,2012
+2012-08-25T15:30:00,2,Hamburger SV,0,1,1. FC Nürnberg,2012
+2013-08-09T20:30:00,1,FC Bayern München,3,1,Borussia Mönchengladbach,2013
+2014-08-22T20:30:00,1,FC Bayern München,2,1,VfL Wolfsburg,2014
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    legacy_csv = os.path.join(tmp_path, 'crawled_data.csv')
+    with open(legacy_csv, 'w', encoding='utf-8') as csv_file:
+        csv_file.write(LEGACY_ROWS)
+    return match_store.MatchStore(os.path.join(tmp_path, 'store'),
+                                  legacy_csv)
+
+
+def test_legacy_csv_is_migrated(store):
+    assert store.seasons() == [2012, 2013, 2014]
+    assert os.path.exists(store.season_path(2013))
+    assert store.last_date() == [1, 2014]
+
+
+def test_last_date_before_migration_reads_csv_end(store, monkeypatch):
+    monkeypatch.setattr(pd, 'read_csv', None)
+    assert store.last_date() == [1, 2014]
+    assert store._stored_seasons() == []
+
+
+def test_concurrent_migration_stores_matches_once(store):
+    threads = [threading.Thread(target=store.seasons) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.manifest()['rows'] == 4
+
+
+def test_migration_of_another_process_stores_matches_once(store,
+                                                          monkeypatch):
+    store.seasons()
+    # a second process that saw the empty store before the first wrote
+    other = match_store.MatchStore(store.directory, store.legacy_csv)
+    monkeypatch.setattr(other, '_needs_migration', lambda: True)
+    other._migrate()
+    assert len(other.read()) == 4
+    assert other.manifest()['rows'] == 4
+
+
+@pytest.mark.parametrize(
+    "first_season, last_season, expected_rows",
+    [
+        (None, None, 4),
+        (2012, 2012, 2),
+        (2013, 2014, 2),
+        (2015, 2016, 0),
+    ])
+def test_read_seasons(store, first_season, last_season, expected_rows):
+    data = store.read(first_season, last_season)
+    assert list(data.columns) == match_store.COLUMNS
+    assert len(data) == expected_rows
+    assert ptypes.is_datetime64_any_dtype(data['date_time'])
+    assert all(ptypes.is_integer_dtype(data[col])
+               for col in ['matchday', 'home_score', 'guest_score',
+                           'season'])
+    assert all(ptypes.is_string_dtype(data[col])
+               for col in ['home_team', 'guest_team'])
+
+
+def test_append_keeps_order_and_names(store):
+    store.append(pd.DataFrame({
+        'date_time': pd.to_datetime(['2014-08-23T15:30:00']),
+        'matchday': [1],
+        'home_team': ['1. FC Nürnberg'],
+        'home_score': [0],
+        'guest_score': [4],
+        'guest_team': ['Hamburger SV'],
+        'season': [2014],
+    }, columns=match_store.COLUMNS))
+
+    season = store.read_season(2014)
+    assert list(season['home_team']) == ['FC Bayern München',
+                                         '1. FC Nürnberg']
+    assert list(season['guest_score']) == [1, 4]
+    assert season['date_time'].iloc[-1] == pd.Timestamp('2014-08-23 15:30')
+
+
+def test_empty_store(tmp_path):
+    store = match_store.MatchStore(str(tmp_path), legacy_csv=None)
+    assert store.seasons() == []
+    assert store.last_date() is None
+    assert store.read().empty
+
+
+def test_seasons_are_loaded_once(store):
+    store.read(2012, 2014)
+    store.read(2012, 2014)
+    store.read_season(2013)
+    info = store.cache_info()
+    assert info['misses'] == 3
+    assert info['hits'] == 4
+    assert info['seasons'] == 3
+
+
+def test_changed_season_is_loaded_again(store):
+    first = store.read_season(2014)
+    first['home_score'] = 99  # copies do not change the loaded matches
+    store.append(store.read_season(2014).tail(1))
+    misses = store.cache_info()['misses']
+
+    season = store.read_season(2014)
+    assert len(season) == 2
+    assert (season['home_score'] != 99).all()
+    assert store.cache_info()['misses'] == misses + 1
+
+
+def test_shared_store():
+    assert match_store.get_store() is match_store.get_store()
+    assert match_store.get_store().directory \
+        == match_store.DEFAULT_DIRECTORY
+
+
+def test_manifest_tracks_appends(store):
+    manifest = store.manifest()
+    assert manifest['last_date'] == [1, 2014]
+    assert manifest['rows'] == 4
+    assert manifest['seasons']['2012']['rows'] == 2
+    old_hash = manifest['hash']
+
+    store.append(pd.DataFrame({
+        'date_time': pd.to_datetime(['2015-08-14T20:30:00']),
+        'matchday': [1],
+        'home_team': ['FC Bayern München'],
+        'home_score': [5],
+        'guest_score': [0],
+        'guest_team': ['Hamburger SV'],
+        'season': [2015],
+    }, columns=match_store.COLUMNS))
+
+    manifest = store.manifest()
+    assert store.last_date() == [1, 2015]
+    assert manifest['rows'] == 5
+    assert manifest['hash'] != old_hash
+
+
+def test_missing_manifest_is_rebuilt(store):
+    manifest = store.manifest()
+    os.remove(os.path.join(store.directory, match_store.MANIFEST))
+    assert store.manifest() == manifest
+
+
+@pytest.mark.parametrize(
+    "start, end, expected_dates",
+    [
+        ([1, 2012], [34, 2014], [[1, 2012], [2, 2012], [1, 2013],
+                                 [1, 2014]]),
+        ([2, 2012], [1, 2013], [[2, 2012], [1, 2013]]),
+        ([1, 2012], [1, 2012], [[1, 2012]]),
+        ([3, 2012], [34, 2012], []),
+        ([1, 2016], [34, 2018], []),
+    ])
+def test_read_range(store, start, end, expected_dates):
+    data = store.read_range(start, end)
+    assert [[day, season] for day, season
+            in zip(data['matchday'], data['season'])] == expected_dates
+
+
+def test_read_range_loads_only_its_seasons(store):
+    store.seasons()
+    store.clear_cache()
+    assert len(store.read_range([1, 2013], [34, 2013])) == 1
+    assert store.cache_info() == {'hits': 0, 'misses': 1, 'seasons': 1}
+    # a change of another season does not load the range again
+    store.append(store.read_season(2014).assign(season=2015))
+    store.read_range([1, 2013], [34, 2013])
+    assert store.cache_info()['hits'] == 1
+
+
+def test_seasons_are_sorted_by_matchday(store):
+    # a postponed match of matchday 1 that was played after matchday 2
+    store.append(pd.DataFrame({
+        'date_time': pd.to_datetime(['2012-09-26T20:00:00']),
+        'matchday': [1],
+        'home_team': ['Hamburger SV'],
+        'home_score': [1],
+        'guest_score': [1],
+        'guest_team': ['Werder Bremen'],
+        'season': [2012],
+    }, columns=match_store.COLUMNS))
+    assert list(store.read_season(2012)['matchday']) == [1, 1, 2]
+    assert len(store.read_range([1, 2012], [1, 2012])) == 2
+
+
+def test_team_ids_are_stable(store):
+    store.seasons()
+    names = store.teams.names
+    assert len(names) == 7
+    reopened = match_store.MatchStore(store.directory, legacy_csv=None)
+    assert reopened.teams.names == names
+    assert list(reopened.read_season(2014)['guest_team']) == [
+        'VfL Wolfsburg']
+
+
+@pytest.mark.parametrize(
+    "match_id, home_team, expected_rows",
+    [  # same teams as the legacy match without ID: replaced
+        (1, 'FC Bayern München', 1),
+        # other teams: added
+        (2, 'Hertha BSC', 2),
+    ])
+def test_upsert_replaces_stored_matches(store, match_id, home_team,
+                                        expected_rows):
+    corrected = pd.DataFrame({
+        'date_time': pd.to_datetime(['2014-08-22T20:30:00']),
+        'matchday': [1],
+        'home_team': [home_team],
+        'home_score': [3],
+        'guest_score': [1],
+        'guest_team': ['VfL Wolfsburg'],
+        'season': [2014],
+        'match_id': [match_id],
+        'last_update': pd.to_datetime(['2014-08-22T22:30:00']),
+    })
+    store.upsert(corrected)
+    # again with the same matchID, e.g. a rescheduled match
+    store.upsert(corrected.assign(date_time=pd.to_datetime(
+        ['2014-09-23T20:00:00'])))
+
+    season = store.read_season(2014)
+    assert list(season.columns) == match_store.COLUMNS
+    assert len(season) == expected_rows
+    assert season['home_score'].iloc[-1] == 3
+    assert season['date_time'].iloc[-1] == pd.Timestamp('2014-09-23 20:00')
+    assert store.manifest()['rows'] == 3 + expected_rows
+    stored = store.read_season_ids(2014)
+    assert stored['match_id'].iloc[-1] == match_id
+
+
+def test_sync_state(store):
+    assert store.sync_state() == {}
+    store.save_sync_state(2014, {'1': {'last_change': 'x',
+                                       'settled': True}})
+    assert store.sync_state() == {'2014': {'1': {'last_change': 'x',
+                                                 'settled': True}}}
+
+
+@pytest.mark.parametrize(
+    "season, expected",
+    [
+        (2012, {1: 1, 2: 1}),
+        (2014, {1: 1}),
+        (2016, {}),
+    ])
+def test_matchday_counts(store, season, expected):
+    assert store.matchday_counts(season) == expected
+
+
+def test_every_league_has_its_own_store():
+    assert match_store.league_directory('bl1') \
+        == match_store.DEFAULT_DIRECTORY
+    assert match_store.league_directory('bl2') \
+        == match_store.DEFAULT_DIRECTORY + '_bl2'
+    assert not match_store.league_directory('bl2').startswith(
+        match_store.DEFAULT_DIRECTORY + os.sep)
+    assert match_store.get_store('bl2') is match_store.get_store('bl2')
+    assert match_store.get_store('bl2') is not match_store.get_store()
+    assert match_store.get_store('bl2').legacy_csv is None
+    with pytest.raises(ValueError):
+        match_store.get_store('bl9')
+
+
+def test_match_array_layout(store):
+    array = store.match_array()
+    assert isinstance(array, np.memmap)
+    assert array.dtype == match_store.MATCH_DTYPE
+    assert array.dtype.itemsize == 17
+    assert list(array['season']) == [2012, 2012, 2013, 2014]
+    assert list(array['home_score']) == [2, 0, 3, 2]
+    assert array['kickoff'][0] \
+        == pd.Timestamp('2012-08-24T20:30:00').value
+    assert list(store.teams.decode(array['guest_team'][:1])) \
+        == ['Werder Bremen']
+    with pytest.raises(ValueError):
+        array['home_score'][0] = 5
+    pd.testing.assert_frame_equal(
+        match_store.array_to_df(array, store.teams), store.read())
+
+
+def test_match_array_is_exported_on_change(store):
+    path = store.array_path()
+    store.match_array()
+    modified = os.stat(path).st_mtime_ns
+    store.match_array()
+    assert os.stat(path).st_mtime_ns == modified
+
+    store.append(store.read_season(2014).assign(season=2015))
+    assert len(store.match_array()) == 5
+    assert store.array_path() != path
+    assert not os.path.exists(path)
+
+
+def test_match_array_is_shared_with_processes(store):
+    path = store.array_path()
+    store.match_array()
+    goals = subprocess.run(
+        [sys.executable, '-c',
+         'import sys\n'
+         'from bl_predictor import match_store\n'
+         'array = match_store.open_array(sys.argv[1])\n'
+         'print(int(array["home_score"].sum()))', path],
+        check=True, capture_output=True, text=True).stdout
+    assert int(goals) == 7
+
+
+def test_to_array_rejects_unknown_teams(store):
+    with pytest.raises(ValueError, match='Hertha BSC'):
+        match_store.to_array(store.read().assign(home_team='Hertha BSC'),
+                             store.teams)
+
+
+def test_open_array_checks_layout(tmp_path):
+    path = os.path.join(tmp_path, 'other.npy')
+    np.save(path, np.zeros(3))
+    with pytest.raises(ValueError):
+        match_store.open_array(path)
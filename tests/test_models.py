@@ -1,6 +1,10 @@
 """
 This file is used for testing models in a variety of cases
 """
+import os
+import subprocess
+import sys
+
 import pandas as pd
 import pytest
 
@@ -73,11 +77,11 @@ draw_train = pd.DataFrame([
                                                      'DataFrame for errors'),
         # PoissonModel tests
         ("PoissonModel", norm_train, 'A', 'B', 'A: 57.6%'),
-        ("PoissonModel", norm_train, 'B', 'A', 'B: 80.3%'),
+        ("PoissonModel", norm_train, 'B', 'A', 'B: 80.4%'),
         ("PoissonModel", norm_train, 'A', 'C', 'C: 66.4%'),
-        ("PoissonModel", norm_train, 'C', 'A', 'C: 95.9%'),
+        ("PoissonModel", norm_train, 'C', 'A', 'C: 96.1%'),
         ("PoissonModel", norm_train, 'B', 'C', 'C: 64.0%'),
-        ("PoissonModel", norm_train, 'C', 'B', 'C: 96.2%'),
+        ("PoissonModel", norm_train, 'C', 'B', 'C: 96.7%'),
         ("PoissonModel", too_many_columns, 'A', 'B', 'B: 51.7%'),
         ("PoissonModel", draw_train, 'B', 'A', 'Draw: 22.3%'),
         ("PoissonModel", nonsense_matches, 'B', 'C', 'Prediction failed. '
@@ -94,11 +98,11 @@ draw_train = pd.DataFrame([
                                                    'errors'),
         # BettingPoissonModel tests
         ("BettingPoissonModel", norm_train, 'A', 'B', 'A: 57.6%'),
-        ("BettingPoissonModel", norm_train, 'B', 'A', 'B: 80.3%'),
+        ("BettingPoissonModel", norm_train, 'B', 'A', 'B: 80.4%'),
         ("BettingPoissonModel", norm_train, 'A', 'C', 'C: 66.4%'),
-        ("BettingPoissonModel", norm_train, 'C', 'A', 'C: 95.9%'),
+        ("BettingPoissonModel", norm_train, 'C', 'A', 'C: 96.1%'),
         ("BettingPoissonModel", norm_train, 'B', 'C', 'C: 64.0%'),
-        ("BettingPoissonModel", norm_train, 'C', 'B', 'C: 96.2%'),
+        ("BettingPoissonModel", norm_train, 'C', 'B', 'C: 96.7%'),
         ("BettingPoissonModel", too_many_columns, 'A', 'B', 'B: 51.7%'),
         ("BettingPoissonModel", draw_train, 'B', 'A', 'Draw: 22.3%'),
         ("BettingPoissonModel", nonsense_matches, 'B', 'C',
@@ -114,3 +118,211 @@ def test_predict_winner(model, trainset, home_team, guest_team, expected):
     trained_model = getattr(models, model)(trainset)
     winner = trained_model.predict_winner
     assert winner(home_team, guest_team) == expected
+
+
+def winner_string(row):
+    """Formats a row of predict_many like predict_winner does."""
+    if row['prediction'] is None:
+        return None
+    probability = {row['home_team']: row['home_win'],
+                   row['guest_team']: row['guest_win'],
+                   'Draw': row['draw']}[row['prediction']]
+    return row['prediction'] + ": " + "{:.1%}".format(probability)
+
+
+@pytest.mark.parametrize("model", ["PoissonModel", "BettingPoissonModel",
+                                   "FrequencyModel"])
+@pytest.mark.parametrize("trainset", [norm_train, draw_train,
+                                      too_many_columns, nonsense_matches])
+def test_predict_many_agrees_with_predict_winner(model, trainset):
+    trained_model = getattr(models, model)(trainset)
+    teams = ['A', 'B', 'C', 'D']
+    fixtures = pd.DataFrame(
+        [[home, guest] for home in teams for guest in teams if home != guest],
+        columns=['home_team', 'guest_team'])
+    predictions = trained_model.predict_many(fixtures)
+    assert list(predictions.columns) == ['home_team', 'guest_team',
+                                         'home_win', 'draw', 'guest_win',
+                                         'prediction']
+    assert predictions['home_win'].dtype == 'float64'
+    for (_, fixture), (_, row) in zip(fixtures.iterrows(),
+                                      predictions.iterrows()):
+        if row['prediction'] is None:
+            continue
+        assert winner_string(row) == trained_model.predict_winner(
+            fixture['home_team'], fixture['guest_team'])
+    # D never played
+    assert predictions.loc[predictions['home_team'] == 'D',
+                           'prediction'].isna().all()
+
+
+def test_predict_many_of_many_teams():
+    # pair keys of 300 teams do not fit the int16 team IDs
+    names = ['Team %d' % number for number in range(300)]
+    trainset = pd.DataFrame({
+        'home_team': names,
+        'home_score': [number % 3 for number in range(300)],
+        'guest_score': [1] * 300,
+        'guest_team': names[-1:] + names[:-1],
+    })
+    trained_model = models.FrequencyModel(trainset)
+    fixtures = trainset[['home_team', 'guest_team']]
+    predictions = trained_model.predict_many(fixtures)
+    assert predictions['prediction'].notna().all()
+    for (_, fixture), prediction in zip(fixtures.iterrows(),
+                                        predictions['prediction']):
+        assert trained_model.predict_winner(
+            fixture['home_team'], fixture['guest_team']).startswith(
+                prediction + ':')
+
+
+@pytest.mark.parametrize(
+    "model, trainset",
+    [
+        ("PoissonModel", empty_data),
+        ("BettingPoissonModel", missing_column),
+        ("FrequencyModel", missing_column),
+        ("FrequencyModel", empty_data),
+    ])
+def test_predict_many_without_training(model, trainset):
+    fixtures = pd.DataFrame({'home_team': ['A'], 'guest_team': ['B']},
+                            index=[7])
+    predictions = getattr(models, model)(trainset).predict_many(fixtures)
+    assert list(predictions.index) == [7]
+    assert predictions[models.OUTCOME_COLUMNS].isna().all(axis=None)
+    assert predictions['prediction'].isna().all()
+
+
+@pytest.mark.parametrize("model", ["PoissonModel", "BettingPoissonModel"])
+@pytest.mark.parametrize("trainset", [norm_train, draw_train,
+                                      too_many_columns])
+def test_outcome_table(model, trainset):
+    simulated = getattr(models, model)(trainset)
+    tabled = getattr(models, model)(trainset, outcome_table=True)
+    assert simulated.outcome_table is None
+    teams = tabled.poisson_model.teams
+    assert tabled.outcome_table.shape == (len(teams), len(teams), 3)
+    for home_team in teams:
+        for guest_team in teams:
+            if home_team != guest_team:
+                assert tabled.predict_winner(home_team, guest_team) \
+                    == simulated.predict_winner(home_team, guest_team)
+    fixtures = pd.DataFrame({'home_team': ['A', 'B', 'D'],
+                             'guest_team': ['B', 'A', 'A']})
+    pd.testing.assert_frame_equal(tabled.predict_many(fixtures),
+                                  simulated.predict_many(fixtures))
+
+
+def test_outcome_table_without_training():
+    model = models.PoissonModel(empty_data, outcome_table=True)
+    assert model.outcome_table is None
+    assert model.predict_winner('A', 'B') \
+        == 'Prediction failed. Check training DataFrame for errors'
+
+
+@pytest.mark.parametrize("model", ["PoissonModel", "BettingPoissonModel",
+                                   "FrequencyModel"])
+def test_save_and_load(model, tmp_path):
+    path = os.path.join(tmp_path, 'model.npz')
+    trained_model = getattr(models, model)(norm_train)
+    trained_model.save(path)
+    loaded = getattr(models, model).load(path)
+    assert type(models.load_model(path)) is type(trained_model)
+    assert loaded.train_info == trained_model.train_info
+    assert loaded.train_info['matches'] == 6
+    teams = ['A', 'B', 'C']
+    for home_team in teams:
+        for guest_team in teams:
+            if home_team != guest_team:
+                assert loaded.predict_winner(home_team, guest_team) \
+                    == trained_model.predict_winner(home_team, guest_team)
+    if model != "FrequencyModel":
+        pd.testing.assert_frame_equal(loaded.team_ranking_df,
+                                      trained_model.team_ranking_df)
+
+
+@pytest.mark.parametrize("model", ["PoissonModel", "BettingPoissonModel",
+                                   "FrequencyModel"])
+def test_renamed_team_is_one_team(model, monkeypatch, tmp_path):
+    from bl_predictor import match_store
+    monkeypatch.setattr(match_store.get_team_dictionary(), 'aliases',
+                        {'Old A': 'A'})
+    renamed = norm_train.assign(home_team=['Old A', 'A', 'C', 'B', 'B',
+                                           'A'])
+    trained_model = getattr(models, model)(renamed)
+    path = os.path.join(tmp_path, 'model.npz')
+    trained_model.save(path)
+    fixtures = pd.DataFrame({'home_team': ['Old A', 'B'],
+                             'guest_team': ['B', 'Old A']},
+                            columns=['home_team', 'guest_team'])
+    for predicting_model in [trained_model,
+                             getattr(models, model).load(path)]:
+        assert predicting_model.predict_winner('Old A', 'B').replace(
+            'Old A', 'A') == trained_model.predict_winner('A', 'B')
+        pd.testing.assert_frame_equal(
+            predicting_model.predict_many(fixtures)[models.OUTCOME_COLUMNS],
+            trained_model.predict_many(fixtures.replace('Old A', 'A'))[
+                models.OUTCOME_COLUMNS])
+    if model != "FrequencyModel":
+        assert sorted(trained_model.poisson_model.teams) == ['A', 'B', 'C']
+
+
+def test_outcome_table_is_saved(tmp_path):
+    path = os.path.join(tmp_path, 'model.npz')
+    models.PoissonModel(norm_train, outcome_table=True).save(path)
+    loaded = models.PoissonModel.load(path)
+    assert loaded.outcome_table.shape == (3, 3, 3)
+    assert loaded.predict_winner('A', 'B') == 'A: 57.6%'
+
+
+def test_train_info():
+    trainset = norm_train.assign(season=[2019, 2019, 2020, 2020, 2020,
+                                         2020],
+                                 matchday=[33, 34, 1, 2, 2, 3])
+    info = models.PoissonModel(trainset).train_info
+    assert info['first_date'] == [33, 2019]
+    assert info['last_date'] == [3, 2020]
+    assert info['data_hash'] \
+        == models.PoissonModel(trainset.copy()).train_info['data_hash']
+    assert info['data_hash'] != models.PoissonModel(
+        trainset.assign(home_score=0)).train_info['data_hash']
+
+
+@pytest.mark.parametrize(
+    "save_as, load_as",
+    [
+        ("PoissonModel", "BettingPoissonModel"),
+        ("FrequencyModel", "PoissonModel"),
+    ])
+def test_load_other_model(save_as, load_as, tmp_path):
+    path = os.path.join(tmp_path, 'model.npz')
+    getattr(models, save_as)(norm_train).save(path)
+    with pytest.raises(ValueError, match=save_as):
+        getattr(models, load_as).load(path)
+
+
+@pytest.mark.parametrize(
+    "model, trainset",
+    [
+        ("PoissonModel", empty_data),
+        ("FrequencyModel", missing_column),
+    ])
+def test_save_untrained_model(model, trainset, tmp_path):
+    with pytest.raises(ValueError):
+        getattr(models, model)(trainset).save(
+            os.path.join(tmp_path, 'model.npz'))
+
+
+def test_loaded_model_needs_no_scipy(tmp_path):
+    path = os.path.join(tmp_path, 'model.npz')
+    models.PoissonModel(norm_train).save(path)
+    imported = subprocess.run(
+        [sys.executable, '-c',
+         'import sys\n'
+         'from bl_predictor import models\n'
+         'model = models.load_model(sys.argv[1])\n'
+         'print(model.predict_winner("A", "B"))\n'
+         'print(sorted(name for name in ("scipy", "statsmodels", "patsy")\n'
+         '             if name in sys.modules))', path],
+        check=True, capture_output=True, text=True).stdout.splitlines()
+    assert imported == ['A: 57.6%', '[]']
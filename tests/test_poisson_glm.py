@@ -0,0 +1,112 @@
+"""
+This file is used for testing the sparse Poisson regression of the models
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+import statsmodels.formula.api as smf
+
+from bl_predictor import match_store
+from bl_predictor import poisson_glm
+
+norm_train = pd.DataFrame([
+    ['A', 0, 3, 'B'],
+    ['A', 1, 1, 'C'],
+    ['C', 4, 0, 'A'],
+    ['B', 0, 3, 'C'],
+    ['B', 1, 1, 'C'],
+    ['A', 4, 0, 'B'],
+], columns=[
+    'home_team', 'home_score', 'guest_score', 'guest_team'])
+
+# only two teams: the design matrix is singular
+two_teams = pd.DataFrame([
+    ['B', 1, 1, 'A'],
+    ['B', 1, 1, 'A'],
+    ['A', 3, 3, 'B'],
+    ['A', 2, 2, 'B'],
+], columns=[
+    'home_team', 'home_score', 'guest_score', 'guest_team'])
+
+
+def statsmodels_fit(trainset):
+    goal_model_data = pd.concat([
+        trainset[['home_team', 'guest_team', 'home_score']].assign(
+            home=1).rename(columns={'home_team': 'team',
+                                    'guest_team': 'opponent',
+                                    'home_score': 'goals'}),
+        trainset[['guest_team', 'home_team', 'guest_score']].assign(
+            home=0).rename(columns={'guest_team': 'team',
+                                    'home_team': 'opponent',
+                                    'guest_score': 'goals'})])
+    return smf.glm(formula="goals ~ home + team + opponent",
+                   data=goal_model_data,
+                   family=sm.families.Poisson()).fit()
+
+
+@pytest.mark.filterwarnings('ignore::UserWarning')
+@pytest.mark.parametrize(
+    "trainset",
+    [
+        norm_train,
+        two_teams,
+        pd.read_csv(match_store.LEGACY_CSV),
+    ])
+def test_same_params_as_statsmodels(trainset):
+    expected = statsmodels_fit(trainset)
+    model = poisson_glm.fit(trainset)
+    assert model.converged
+    assert list(model.params.index) == list(expected.params.index)
+    np.testing.assert_allclose(model.params, expected.params, atol=1e-7)
+
+    exog = pd.DataFrame({'team': trainset['guest_team'],
+                         'opponent': trainset['home_team'],
+                         'home': 0})
+    np.testing.assert_allclose(model.predict(exog), expected.predict(exog))
+
+
+def test_expected_goals():
+    model = poisson_glm.fit(norm_train)
+    params = model.params
+    np.testing.assert_allclose(
+        model.expected_goals(['A', 'C'], ['C', 'A'], [1, 0]),
+        np.exp([params['Intercept'] + params['opponent[T.C]']
+                + params['home'],
+                params['Intercept'] + params['team[T.C]']]))
+    with pytest.raises(ValueError, match='D'):
+        model.expected_goals(['D'], ['A'], [1])
+
+
+@pytest.mark.parametrize(
+    "trainset, error",
+    [
+        (norm_train.iloc[:0], ValueError),
+        (norm_train.assign(guest_score=-1), ValueError),
+        (norm_train.assign(home_score=np.nan), ValueError),
+        (norm_train.drop(columns='home_team'), KeyError),
+    ])
+def test_invalid_trainsets(trainset, error):
+    with pytest.raises(error):
+        poisson_glm.fit(trainset)
+
+
+@pytest.mark.parametrize("tol", [1e-4, 1e-10])
+def test_outcome_probabilities_match_skellam(tol):
+    from scipy.stats import skellam
+    home_goals = np.array([0.3, 1.5, 2.7, 4.2, 10.0, 60.0])
+    guest_goals = np.array([1.2, 1.1, 0.4, 0.05, 3.0, 55.0])
+    outcomes = poisson_glm.outcome_probabilities(home_goals, guest_goals,
+                                                 tol)
+    expected = np.stack([skellam.sf(0, home_goals, guest_goals),
+                         skellam.pmf(0, home_goals, guest_goals),
+                         skellam.cdf(-1, home_goals, guest_goals)], axis=1)
+    np.testing.assert_allclose(outcomes, expected, rtol=0, atol=tol)
+
+
+def test_outcome_probabilities_edge_cases():
+    outcomes = poisson_glm.outcome_probabilities([0.0, 2.0], [0.0, 0.0])
+    np.testing.assert_allclose(outcomes, [[0, 1, 0],
+                                          [1 - np.exp(-2), np.exp(-2), 0]],
+                               atol=1e-10)
+    assert poisson_glm.outcome_probabilities([], []).shape == (0, 3)
@@ -0,0 +1,135 @@
+"""
+This file is used for testing the on-disk response cache
+"""
+import datetime
+import json
+import time
+
+import pytest
+import requests
+
+from bl_predictor import http_client
+from bl_predictor import response_cache
+
+DAY_URL = 'https://api.openligadb.de/getmatchdata/bl1/2020/5'
+SEASON_URL = 'https://api.openligadb.de/getmatchdata/bl1/2012'
+# revalidate on every call
+NO_TTL = {kind: 0 for kind in response_cache.DEFAULT_TTLS}
+
+
+class ApiStandIn:
+    """Stand-in session that answers like the api and counts requests."""
+
+    def __init__(self):
+        self.payload = [{'matchID': 1}]
+        self.last_change = '2020-10-24T17:22:31.51'
+        self.etag = '"v1"'
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        headers = headers or {}
+        self.requests.append(url)
+        response = requests.Response()
+        response.status_code = 200
+        if '/getlastchangedate/' in url:
+            response._content = json.dumps(self.last_change).encode()
+        elif headers.get('If-None-Match') == self.etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.headers['ETag'] = self.etag
+            response._content = json.dumps(self.payload).encode()
+        return response
+
+
+@pytest.fixture
+def api():
+    stand_in = ApiStandIn()
+    previous = http_client.set_session(stand_in)
+    yield stand_in
+    http_client.set_session(previous)
+
+
+@pytest.mark.parametrize(
+    "url, today, expected",
+    [
+        (DAY_URL, datetime.date(2021, 2, 27), 'current_season'),
+        (DAY_URL, datetime.date(2021, 7, 1), 'finished_season'),
+        (SEASON_URL, datetime.date(2021, 2, 27), 'finished_season'),
+        ('https://api.openligadb.de/getlastchangedate/bl1/2020/5',
+         datetime.date(2021, 2, 27), 'other'),
+    ])
+def test_url_kind(url, today, expected):
+    assert response_cache.url_kind(url, today) == expected
+
+
+def test_fresh_entry_is_served_without_request(api, tmp_path):
+    cache = response_cache.ResponseCache(str(tmp_path))
+    assert cache.get_json(DAY_URL) == [{'matchID': 1}]
+    assert cache.get_json(DAY_URL) == [{'matchID': 1}]
+    assert api.requests == [DAY_URL]
+
+
+def test_unchanged_matchday_is_revalidated_by_last_change(api, tmp_path):
+    cache = response_cache.ResponseCache(str(tmp_path),
+                                         ttls=NO_TTL)
+    cache.get_json(DAY_URL)
+    # the first revalidation learns the last change date via etag
+    cache.get_json(DAY_URL)
+    del api.requests[:]
+    assert cache.get_json(DAY_URL) == [{'matchID': 1}]
+    assert api.requests == [response_cache.last_change_url(DAY_URL)]
+
+
+def test_changed_matchday_is_downloaded_again(api, tmp_path):
+    cache = response_cache.ResponseCache(str(tmp_path),
+                                         ttls=NO_TTL)
+    cache.get_json(DAY_URL)
+    api.payload = [{'matchID': 2}]
+    api.last_change = '2020-10-25T10:00:00'
+    api.etag = '"v2"'
+    assert cache.get_json(DAY_URL) == [{'matchID': 2}]
+
+
+def test_season_is_revalidated_by_etag(api, tmp_path):
+    cache = response_cache.ResponseCache(str(tmp_path),
+                                         ttls=NO_TTL)
+    cache.get_json(SEASON_URL)
+    assert cache.get_json(SEASON_URL) == [{'matchID': 1}]
+    assert api.requests == [SEASON_URL, SEASON_URL]
+
+
+def test_least_recently_used_entries_are_evicted(api, tmp_path):
+    cache = response_cache.ResponseCache(str(tmp_path), max_bytes=40)
+    for day in range(1, 6):
+        cache.get_json('https://api.openligadb.de/getmatchdata/bl1/2020/'
+                       + str(day))
+    assert 0 < cache.size() <= 40
+    cache.clear()
+    assert cache.size() == 0
+
+
+@pytest.mark.parametrize(
+    "expires_in, expected_requests",
+    [
+        (3600, 1),  # longer than the ttl: still served from disk
+        (-1, 2),  # expired: revalidated (by etag)
+    ])
+def test_expiry_replaces_ttl(api, tmp_path, expires_in, expected_requests):
+    cache = response_cache.ResponseCache(str(tmp_path), ttls=NO_TTL)
+    cache.get_json(SEASON_URL)
+    assert cache.set_expiry(SEASON_URL, time.time() + expires_in)
+    assert cache.get_json(SEASON_URL) == [{'matchID': 1}]
+    assert len(api.requests) == expected_requests
+    assert not cache.set_expiry(DAY_URL, time.time())
+
+
+def test_refresh_revalidates_fresh_entry(api, tmp_path):
+    cache = response_cache.ResponseCache(str(tmp_path))
+    cache.get_json(SEASON_URL)
+    cache.set_expiry(SEASON_URL, time.time() + 3600)
+    assert cache.get_json(SEASON_URL, refresh=True) == [{'matchID': 1}]
+    assert api.requests == [SEASON_URL, SEASON_URL]
+    # the revalidation ends the expiry, the ttl applies again
+    cache.get_json(SEASON_URL)
+    assert len(api.requests) == 2
@@ -0,0 +1,63 @@
+"""
+This file is used for testing the team dictionary
+"""
+import os
+
+import numpy as np
+import pytest
+
+from bl_predictor import teams
+
+
+@pytest.fixture
+def dictionary():
+    return teams.TeamDictionary(
+        ['Hamburger SV', 'Werder Bremen', 'FC Bayern München'],
+        aliases={'Bayern Munich': 'FC Bayern München'})
+
+
+@pytest.mark.parametrize(
+    "names, expected_ids",
+    [
+        (['Werder Bremen', 'Hamburger SV', 'Werder Bremen'], [1, 0, 1]),
+        (['Bayern Munich', 'FC Bayern München'], [2, 2]),
+        (['Hannover 96', 'Hamburger SV'], [-1, 0]),
+        ([], []),
+    ])
+def test_encode(dictionary, names, expected_ids):
+    ids = dictionary.encode(names)
+    assert ids.dtype == np.int16
+    assert list(ids) == expected_ids
+
+
+def test_encode_add_keeps_existing_ids(dictionary):
+    assert list(dictionary.encode(['Hannover 96', 'Werder Bremen'],
+                                  add=True)) == [3, 1]
+    assert dictionary.names[3] == 'Hannover 96'
+
+
+def test_decode(dictionary):
+    assert list(dictionary.decode(np.array([2, 0], dtype='int16'))) == [
+        'FC Bayern München', 'Hamburger SV']
+
+
+def test_decode_rejects_unknown_ids(dictionary):
+    with pytest.raises(ValueError):
+        dictionary.decode(np.array([0, -1], dtype='int16'))
+
+
+def test_extended_does_not_change_dictionary(dictionary):
+    extended = dictionary.extended(['A', 'B'])
+    assert extended.id_of('B') == 4
+    assert 'B' not in dictionary
+    assert len(dictionary) == 3
+
+
+def test_save_and_load(dictionary, tmp_path):
+    path = os.path.join(tmp_path, 'teams.json')
+    dictionary.save(path)
+    loaded = teams.TeamDictionary.load(path)
+    assert loaded.names == dictionary.names
+    assert loaded.id_of('Bayern Munich') == 2
+    assert len(teams.TeamDictionary.load(
+        os.path.join(tmp_path, 'missing.json'))) == 0